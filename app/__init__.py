@@ -20,7 +20,11 @@
 from flask import Flask
 import logging
 
+from app.cache import ExpiringLRUCache
+from app.result_store import ResultStore
 from app.routes_gate_cutting import blp_gate_cutting
+from app.routes_results import blp_results
+from app.utils import create_process_pool
 from config import config
 from flask_smorest import Api
 from app.routes_wire_cutting import blp
@@ -31,10 +35,23 @@ def create_app(config_name):
     app.logger.setLevel(logging.DEBUG)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
+    app.extensions["cut_cache"] = ExpiringLRUCache(
+        app.config["CUT_CACHE_MAX_SIZE"], app.config["CUT_CACHE_TTL"]
+    )
+    app.extensions["cut_result_cache"] = ExpiringLRUCache(
+        app.config["CUT_RESULT_CACHE_MAX_SIZE"], app.config["CUT_RESULT_CACHE_TTL"]
+    )
+    app.extensions["result_store"] = ResultStore(
+        app.config["RESULT_DIRECTORY"], app.config["RESULT_TTL"]
+    )
+    app.extensions["reconstruction_pool"] = create_process_pool(
+        app.config["RECONSTRUCTION_WORKERS"]
+    )
 
     api = Api(app)
     api.register_blueprint(blp)
     api.register_blueprint(blp_gate_cutting)
+    api.register_blueprint(blp_results)
 
     @app.route("/")
     def heartbeat():
@@ -0,0 +1,91 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import io
+import json
+
+import argschema.fields
+import numpy as np
+from webargs.flaskparser import FlaskParser
+
+# Multipart field holding the JSON encoded arguments besides the binary subcircuit results
+ARGUMENTS_FIELD = "json"
+
+# Multipart field holding one .npy file per subcircuit result, in the order of the results
+SUBCIRCUIT_RESULTS_FIELD = "subcircuit_results"
+
+# Readers of the header of the .npy format versions
+_READ_ARRAY_HEADER = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+def npy_frombuffer(buffer) -> np.ndarray:
+    """
+    Decode a .npy file without copying its data
+
+    Args:
+        buffer: The content of the .npy file
+
+    Returns:
+        A read-only array viewing the data in the buffer
+    """
+    header = io.BytesIO(buffer)
+    version = np.lib.format.read_magic(header)
+    read_array_header = _READ_ARRAY_HEADER.get(version)
+    if read_array_header is None:
+        raise ValueError(f"Version {version} of the .npy format is not supported")
+    shape, fortran_order, dtype = read_array_header(header)
+    if dtype.hasobject:
+        raise ValueError("Arrays of Python objects are not supported")
+    array = np.frombuffer(
+        buffer, dtype=dtype, count=int(np.prod(shape)), offset=header.tell()
+    )
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+class NumpyArray(argschema.fields.NumpyArray):
+    """:class:`argschema.fields.NumpyArray` which keeps already decoded arrays of the right type"""
+
+    def _deserialize(self, value, attr, obj, **kwargs):
+        if isinstance(value, np.ndarray):
+            return value.astype(self.dtype, copy=False)
+        return super()._deserialize(value, attr, obj, **kwargs)
+
+
+class BinaryArgumentsParser(FlaskParser):
+    """
+    Parser accepting the JSON body either as JSON or as multipart form with binary subcircuit results
+
+    A multipart request contains the arguments as JSON in the field ARGUMENTS_FIELD and the subcircuit
+    results as .npy files in the field SUBCIRCUIT_RESULTS_FIELD, which are decoded without copying.
+    """
+
+    def _raw_load_json(self, req):
+        if req.mimetype != "multipart/form-data":
+            return super()._raw_load_json(req)
+
+        arguments = json.loads(req.form.get(ARGUMENTS_FIELD, "{}"))
+        files = req.files.getlist(SUBCIRCUIT_RESULTS_FIELD)
+        if files:
+            arguments[SUBCIRCUIT_RESULTS_FIELD] = [
+                npy_frombuffer(file.read()) for file in files
+            ]
+        return arguments
@@ -0,0 +1,173 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ExpiringLRUCache:
+    """
+    Thread-safe cache holding at most ``max_size`` entries, each for at most ``ttl`` seconds
+
+    If the cache is full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int, ttl: float, timer=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self._timer():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._timer() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._evict_expired()
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def add(self, value) -> str:
+        """
+        Store a value under a new random key
+
+        Returns:
+            The key of the value
+        """
+        key = uuid.uuid4().hex
+        self.put(key, value)
+        return key
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired()
+            return len(self._entries)
+
+    def _evict_expired(self):
+        now = self._timer()
+        expired = [key for key, (expiry, _) in self._entries.items() if expiry <= now]
+        for key in expired:
+            del self._entries[key]
+
+
+def get_cached_cuts(input_dict, cut_cache):
+    """
+    Look up the cuts referenced by the cut_id of a combine request
+
+    Args:
+        input_dict: The combine request
+        cut_cache: The cache of the cuts, or None if caching is disabled
+
+    Returns:
+        The cached cuts, or None if they have to be taken from the request
+
+    Raises:
+        ValueError: If the cuts are neither cached nor contained in the request
+    """
+    cuts = None
+    if cut_cache is not None and input_dict.cut_id is not None:
+        cuts = cut_cache.get(input_dict.cut_id)
+    if cuts is None and input_dict.cuts is None:
+        raise ValueError(
+            f"The cuts for cut_id {input_dict.cut_id} are not available anymore and have to be provided."
+        )
+    return cuts
+
+
+def _canonical_param(param):
+    if isinstance(param, np.ndarray):
+        return (param.dtype.str, param.shape, param.tobytes())
+    try:
+        return repr(complex(param))
+    except TypeError:
+        return str(param)
+
+
+def circuit_fingerprint(circuit) -> str:
+    """
+    Hash a circuit independently of the formatting it was submitted in
+
+    Two circuits have the same fingerprint if they have the same registers and apply the same
+    operations with the same parameters to the same qubit and clbit indices in the same order. The
+    register names are part of the fingerprint, as the cuts refer to the qubits of the circuit.
+    """
+    registers = tuple(
+        (register.name, register.size) for register in circuit.qregs + circuit.cregs
+    )
+    instructions = []
+    for instruction in circuit.data:
+        operation = instruction.operation
+        instructions.append(
+            (
+                operation.name,
+                tuple(_canonical_param(param) for param in operation.params),
+                tuple(circuit.find_bit(qubit).index for qubit in instruction.qubits),
+                tuple(circuit.find_bit(clbit).index for clbit in instruction.clbits),
+                repr(getattr(operation, "condition", None)),
+            )
+        )
+    return hashlib.sha256(
+        repr((circuit.num_qubits, circuit.num_clbits, registers, instructions)).encode()
+    ).hexdigest()
+
+
+def cut_request_key(circuit, cutting_request) -> str:
+    """
+    Key of the cut computed for a circuit with the cutting parameters of a request
+
+    The format of the circuit is not part of the key, as the cut is only formatted for the response.
+    """
+    parameters = (
+        cutting_request.method,
+        cutting_request.max_subcircuit_width,
+        cutting_request.max_cuts,
+        tuple(cutting_request.num_subcircuits),
+        None
+        if cutting_request.subcircuit_vertices is None
+        else tuple(map(tuple, cutting_request.subcircuit_vertices)),
+        None
+        if cutting_request.observables is None
+        else tuple(cutting_request.observables),
+        cutting_request.solver_time_limit,
+        cutting_request.mip_gap,
+        cutting_request.objective,
+        cutting_request.solver,
+        cutting_request.warm_start,
+    )
+    return hashlib.sha256(
+        repr((circuit_fingerprint(circuit), parameters)).encode()
+    ).hexdigest()
@@ -20,41 +20,97 @@ from collections import defaultdict
 
 import numpy as np
 from circuit_knitting.cutting import partition_problem, generate_cutting_experiments
+from circuit_knitting.cutting.cutting_decomposition import decompose_observables
 from qiskit.quantum_info import PauliList
 
-from app.gate_cutting_reconstruct_distribution import reconstruct_distribution
+from app.cache import cut_request_key, get_cached_cuts
+from app.gate_cutting_reconstruct_distribution import (
+    prune_distribution,
+    reconstruct_distribution_factorized,
+    reconstruct_distribution_parallel,
+    reconstruct_distribution_pruned,
+    reconstruct_distribution_vectorized,
+)
+from app.gate_cutting_reconstruct_expectation_values import (
+    reconstruct_expectation_values,
+)
+from app.model.request_combine_expectation_values import (
+    CombineExpectationValuesRequest,
+)
 from app.model.request_combine_results import CombineResultsRequest
 from app.model.request_cut_circuits import CutCircuitsRequest
+from app.model.response_combine_expectation_values import (
+    CombineExpectationValuesResponse,
+)
 from app.model.response_combine_results import CombineResultsResponse
 from app.model.response_gate_cut_circuits import GateCutCircuitsResponse
 from app.partition import get_partitions, get_partition_labels
-from app.utils import counts_to_array
-from app.wire_cutter import _get_circuit
+from app.utils import DEFAULT_MAX_CHUNK_SIZE, PRECISIONS, ScatterPlan
+from app.wire_cutter import _get_circuit, bind_parameters, validate_parameter_bindings
 
+# Up to this width, the distribution is reconstructed as a dense array by contracting shared factors
+MAX_DENSE_QUBITS = 28
 
-def gate_cut_circuit(cutting_request: CutCircuitsRequest):
+
+def gate_cut_circuit(
+    cutting_request: CutCircuitsRequest, cut_cache=None, cut_result_cache=None
+):
     circuit = _get_circuit(cutting_request)
+    if cutting_request.parameter_bindings is not None:
+        validate_parameter_bindings(circuit, cutting_request.parameter_bindings)
+
+    if cutting_request.method != "automatic_gate_cutting":
+        raise ValueError(f"{cutting_request.method} is an unkown cutting method.")
 
-    if cutting_request.method == "automatic_gate_cutting":
+    res = None
+    if cut_result_cache is not None:
+        key = cut_request_key(circuit, cutting_request)
+        res = cut_result_cache.get(key)
+    if res is None:
         res = automatic_gate_cut(
             circuit,
             num_subcircuits=cutting_request.num_subcircuits,
             max_subcircuit_width=cutting_request.max_subcircuit_width,
             max_cuts=cutting_request.max_cuts,
+            observables=cutting_request.observables,
+        )
+        if cut_result_cache is not None:
+            cut_result_cache.put(key, res)
+    res = dict(res)
+    if cutting_request.parameter_bindings is not None:
+        res["bound_individual_subcircuits"] = bind_parameters(
+            res["individual_subcircuits"], cutting_request.parameter_bindings
+        )
+
+    if cut_cache is not None:
+        res["cut_id"] = cut_cache.add(
+            {
+                "subcircuit_labels": res["subcircuit_labels"],
+                "coefficients": [(c, w.value) for c, w in res["coefficients"]],
+                "partition_labels": res["partition_labels"],
+                "observables": res["observables"],
+            }
         )
-    else:
-        raise ValueError(f"{cutting_request.method} is an unkown cutting method.")
 
     return GateCutCircuitsResponse(format=cutting_request.circuit_format, **res)
 
 
-def automatic_gate_cut(circuit, num_subcircuits, max_subcircuit_width, max_cuts):
+def automatic_gate_cut(
+    circuit, num_subcircuits, max_subcircuit_width, max_cuts, observables=None
+):
+    if observables is None:
+        observables = ["Z" * circuit.num_qubits]
+    if any(len(observable) != circuit.num_qubits for observable in observables):
+        raise ValueError(
+            f"All observables must act on the {circuit.num_qubits} qubits of the circuit."
+        )
+
     partitions, _ = get_partitions(circuit, num_subcircuits[0], max_subcircuit_width)
     partition_labels = get_partition_labels(partitions)
     partitioned_problem = partition_problem(
         circuit=circuit,
         partition_labels=partition_labels,
-        observables=PauliList(["Z" * circuit.num_qubits]),
+        observables=PauliList(observables),
     )
     subexperiments, coefficients = generate_cutting_experiments(
         circuits=partitioned_problem.subcircuits,
@@ -75,28 +131,185 @@ def automatic_gate_cut(circuit, num_subcircuits, max_subcircuit_width, max_cuts)
         "subcircuit_labels": subcircuit_labels,
         "coefficients": coefficients,
         "partition_labels": partition_labels,
+        "observables": observables,
     }
 
 
-def reconstruct_result(input_dict: CombineResultsRequest, quokka_format=False):
+def _get_cuts(input_dict, cut_cache):
+    cuts = get_cached_cuts(input_dict, cut_cache)
+    if cuts is None:
+        cuts = input_dict.cuts
+    return cuts
+
+
+def _group_subcircuit_results(cuts, subcircuit_results):
+    """
+    Group the results of the subcircuits by the label of their partition
+
+    Raises:
+        ValueError: If the number of results does not match the number of subcircuits of the cut
+    """
+    if len(subcircuit_results) != len(cuts["subcircuit_labels"]):
+        raise ValueError(
+            f"{len(subcircuit_results)} subcircuit results were provided, but the cut has "
+            f"{len(cuts['subcircuit_labels'])} subcircuits."
+        )
     subcircuit_results_dict = defaultdict(list)
-    for label, res in zip(
-        input_dict.cuts["subcircuit_labels"], input_dict.subcircuit_results
-    ):
+    for label, res in zip(cuts["subcircuit_labels"], subcircuit_results):
         subcircuit_results_dict[label].append(res)
+    return subcircuit_results_dict
+
+
+def _check_distribution_cut(cuts, subcircuit_results_dict):
+    """
+    Check that the probability distribution can be reconstructed from the subcircuits of a cut
+
+    This requires the subcircuits to measure all qubits in the computational basis, i.e., the cut must
+    have been made for the all-Z observable, which results in a single group of subexperiments.
+
+    Raises:
+        ValueError: If the cut was made for other observables
+    """
+    observables = cuts.get("observables")
+    if observables is not None and any(set(o) != {"Z"} for o in observables):
+        raise ValueError(
+            "The probability distribution can only be reconstructed for cuts made for the all-Z "
+            f"observable, but the cut was made for {observables}."
+        )
+    num_coefficients = len(cuts["coefficients"])
+    for label, results in subcircuit_results_dict.items():
+        if len(results) != num_coefficients:
+            raise ValueError(
+                f"The cut has {len(results)} subcircuits for partition {label} instead of one for "
+                f"each of the {num_coefficients} coefficients, so it was made for several groups "
+                "of observables."
+            )
+
+
+def reconstruct_result(
+    input_dict: CombineResultsRequest,
+    quokka_format=False,
+    max_chunk_size=DEFAULT_MAX_CHUNK_SIZE,
+    executor=None,
+    cut_cache=None,
+    result_store=None,
+):
+    if input_dict.persist and result_store is None:
+        raise ValueError("Persisting results is not enabled")
 
-    result = reconstruct_distribution(
-        subcircuit_results_dict,
-        input_dict.cuts["coefficients"],
-        input_dict.cuts["partition_labels"],
+    cuts = _get_cuts(input_dict, cut_cache)
+    subcircuit_results_dict = _group_subcircuit_results(
+        cuts, input_dict.subcircuit_results
     )
-    num_qubits = len(input_dict.cuts["partition_labels"])
+    _check_distribution_cut(cuts, subcircuit_results_dict)
 
-    if not quokka_format:
-        result = counts_to_array(result, num_qubits)
+    scatter_plan = ScatterPlan(cuts["partition_labels"])
+    dtype = PRECISIONS[input_dict.precision]
+    min_abs_probability = input_dict.min_abs_probability
+    top_k = input_dict.top_k
+    pruned = min_abs_probability is not None or top_k is not None
+    if pruned and scatter_plan.num_qubits <= MAX_DENSE_QUBITS:
+        result = reconstruct_distribution_pruned(
+            subcircuit_results_dict,
+            cuts["coefficients"],
+            cuts["partition_labels"],
+            min_abs_probability=min_abs_probability,
+            top_k=top_k,
+            max_chunk_size=max_chunk_size,
+            scatter_plan=scatter_plan,
+            dtype=dtype,
+        )
+    elif pruned or (quokka_format and scatter_plan.num_qubits > MAX_DENSE_QUBITS):
+        # above the threshold only the outcomes occurring in the results are accumulated
+        result = reconstruct_distribution_vectorized(
+            subcircuit_results_dict,
+            cuts["coefficients"],
+            cuts["partition_labels"],
+            sparse=True,
+            max_chunk_size=max_chunk_size,
+            scatter_plan=scatter_plan,
+        )
+        result = (result[0], result[1].astype(dtype))
     else:
-        result = {
-            "{0:b}".format(key).zfill(num_qubits): val for key, val in result.items()
-        }
+        # a persisted distribution is written to its memory-mapped file directly
+        result_id, out = None, None
+        if input_dict.persist:
+            result_id, out = result_store.create(2 ** scatter_plan.num_qubits, dtype)
+        if executor is not None:
+            result = reconstruct_distribution_parallel(
+                subcircuit_results_dict,
+                cuts["coefficients"],
+                cuts["partition_labels"],
+                executor=executor,
+                dtype=dtype,
+                out=out,
+            )
+        else:
+            result = reconstruct_distribution_factorized(
+                subcircuit_results_dict,
+                cuts["coefficients"],
+                cuts["partition_labels"],
+                scatter_plan=scatter_plan,
+                dtype=dtype,
+                out=out,
+            )
+        if quokka_format and not input_dict.persist:
+            indices = np.flatnonzero(result)
+            result = (indices, result[indices])
+
+    if pruned and scatter_plan.num_qubits > MAX_DENSE_QUBITS:
+        # partial sums of the interleaved accumulation must not be pruned, so prune the merged result
+        result = prune_distribution(*result, min_abs_probability, top_k)
+
+    if input_dict.persist:
+        if isinstance(result, tuple):
+            result_id = result_store.save_sparse(*result, 2 ** scatter_plan.num_qubits)
+        else:
+            result.flush()
+        return CombineResultsResponse(result=None, result_id=result_id)
+
+    if quokka_format:
+        indices, values = result
+        result = dict(zip(scatter_plan.to_bitstrings(indices), values.tolist()))
+    elif pruned:
+        # the pruned entries are returned as pairs of outcome index and probability
+        indices, values = result
+        order = np.argsort(indices)
+        return CombineResultsResponse(
+            result=values[order], indices=indices[order].tolist()
+        )
 
     return CombineResultsResponse(result=result)
+
+
+def reconstruct_expectation_values_result(
+    input_dict: CombineExpectationValuesRequest, cut_cache=None
+):
+    cuts = _get_cuts(input_dict, cut_cache)
+    subcircuit_results_dict = _group_subcircuit_results(
+        cuts, input_dict.subcircuit_results
+    )
+
+    # the observables determine the subexperiments, so those the circuit was cut for are used
+    observables = cuts.get("observables")
+    if observables is None:
+        observables = input_dict.observables
+    elif input_dict.observables is not None and list(input_dict.observables) != list(
+        observables
+    ):
+        raise ValueError(
+            f"The observables {input_dict.observables} differ from the observables {observables} "
+            "the circuit was cut for."
+        )
+    if observables is None:
+        raise ValueError("The observables the circuit was cut for have to be provided.")
+
+    subobservables = decompose_observables(
+        PauliList(observables), cuts["partition_labels"]
+    )
+    expectation_values = reconstruct_expectation_values(
+        subcircuit_results_dict, cuts["coefficients"], subobservables
+    )
+    return CombineExpectationValuesResponse(
+        expectation_values=expectation_values.tolist()
+    )
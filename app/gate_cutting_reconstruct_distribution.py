@@ -19,8 +19,9 @@
 
 from __future__ import annotations
 
+import itertools
 import math
-from collections import defaultdict, Counter
+from collections import defaultdict
 from typing import Hashable, Sequence
 
 import numpy as np
@@ -30,9 +31,15 @@ from circuit_knitting.utils.bitwise import bit_count
 from qiskit.primitives import SamplerResult
 
 from app.utils import (
-    product_dicts,
-    shift_bits_by_index,
-    find_character_in_string,
+    DEFAULT_MAX_CHUNK_SIZE,
+    PARALLEL_NUM_PARTS,
+    CompensatedSum,
+    ScatterPlan,
+    accumulate_product_dicts,
+    counts_to_indices,
+    merge_sparse,
+    parallel_sum,
+    split_evenly,
 )
 
 
@@ -60,10 +67,294 @@ def _process_outcome_distribution(
     return qpd_factor, meas_outcomes
 
 
+def _parity(values: np.ndarray) -> np.ndarray:
+    """
+    Compute the parity of the set bits of every element of an unsigned integer array
+
+    Args:
+        values: Array of unsigned 64 bit integers
+
+    Returns:
+        An array containing 0 for an even and 1 for an odd number of set bits
+    """
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        values ^= values >> np.uint64(shift)
+    return values & np.uint64(1)
+
+
+def _process_outcome_distribution_array(
+    num_meas_bits: int, quasi_probs: dict
+) -> tuple[np.typing.NDArray[np.int64], np.typing.NDArray[np.float64]]:
+    """
+    Process all outcomes of a QPD experiment at once
+
+    Args:
+        num_meas_bits: The number of measured qubits in the result
+        quasi_probs: The quasi-probability distribution of the experiment
+
+    Returns:
+        A tuple with the distinct measurement outcomes and their QPD-signed quasi-probabilities
+    """
+    outcomes, values = counts_to_indices(quasi_probs)
+    outcomes = outcomes.astype(np.uint64)
+    meas_outcomes = outcomes & np.uint64((1 << num_meas_bits) - 1)
+    qpd_outcomes = outcomes >> np.uint64(num_meas_bits)
+
+    # qpd_factor will be -1 or +1, depending on the overall parity of qpd
+    # measurements.
+    qpd_factor = 1.0 - 2.0 * _parity(qpd_outcomes)
+
+    # Different QPD outcomes may share the same measurement outcome
+    meas_outcomes, inverse = np.unique(meas_outcomes, return_inverse=True)
+    signed_quasi_probs = np.bincount(
+        inverse, weights=qpd_factor * values, minlength=len(meas_outcomes)
+    )
+    return meas_outcomes.astype(np.int64), signed_quasi_probs
+
+
+def _iter_outer_product_chunks(label_arrays, max_chunk_size):
+    """
+    Lazily compute the outer product of the outcome arrays of several partitions
+
+    The product of the leading partitions is materialized as long as it does not exceed
+    max_chunk_size entries, the remaining partitions are iterated one outcome at a time.
+
+    Args:
+        label_arrays: A list of (global indices, values) tuples, one per partition
+        max_chunk_size: Maximum number of entries of a yielded chunk, unless a single
+            partition already has more outcomes
+
+    Yields:
+        Tuples of global indices and the product of the corresponding values
+    """
+    indices, values = label_arrays[0]
+    split = 1
+    while (
+        split < len(label_arrays)
+        and len(indices) * len(label_arrays[split][0]) <= max_chunk_size
+    ):
+        label_indices, label_values = label_arrays[split]
+        indices = (indices[:, None] | label_indices[None, :]).ravel()
+        values = (values[:, None] * label_values[None, :]).ravel()
+        split += 1
+
+    suffix = label_arrays[split:]
+    for combination in itertools.product(*[range(len(idx)) for idx, _ in suffix]):
+        suffix_index = 0
+        suffix_value = 1.0
+        for (label_indices, label_values), j in zip(suffix, combination):
+            suffix_index |= int(label_indices[j])
+            suffix_value *= label_values[j]
+        for start in range(0, len(indices), max_chunk_size):
+            stop = start + max_chunk_size
+            yield indices[start:stop] | suffix_index, values[start:stop] * suffix_value
+
+
+def _deduplicated_factors(results, num_meas_bits, num_coefficients, dtype=np.float64):
+    """
+    Convert the results of a partition into dense local quasi-distributions and deduplicate them
+
+    Args:
+        results: The quasi-distributions of the partition, one per coefficient
+        num_meas_bits: The number of measured qubits of the partition
+        num_coefficients: The number of coefficients
+        dtype: The floating-point type of the factors
+
+    Returns:
+        A tuple with the list of distinct dense factors and the factor index of every coefficient
+    """
+    factors = []
+    factor_ids = np.zeros(num_coefficients, dtype=np.int64)
+    seen = {}
+    for i in range(num_coefficients):
+        meas_outcomes, signed_quasi_probs = _process_outcome_distribution_array(
+            num_meas_bits, results[i]
+        )
+        factor = np.zeros(2 ** num_meas_bits, dtype=dtype)
+        factor[meas_outcomes] = signed_quasi_probs
+        factor_id = seen.setdefault(factor.tobytes(), len(factors))
+        if factor_id == len(factors):
+            factors.append(factor)
+        factor_ids[i] = factor_id
+    return factors, factor_ids
+
+
+def _contract_factors(weights, factor_ids, factors):
+    """
+    Compute the sum of the weighted Kronecker products of the partition factors
+
+    The coefficients are grouped by the factor of the first partition, so that every distinct
+    factor of the first partition is multiplied only once with the contracted remainder. The
+    computation is carried out in the floating-point type of the factors, adding up the products by
+    compensated summation in float32.
+
+    Args:
+        weights: The coefficient of every term
+        factor_ids: Array of shape (number of terms, number of partitions) containing the
+            factor index of every partition for every term
+        factors: The list of distinct factors of every partition
+
+    Returns:
+        The contracted vector in the Kronecker order of the partitions
+    """
+    dtype = factors[0][0].dtype
+    if len(factors) == 1:
+        summed_weights = np.bincount(
+            factor_ids[:, 0], weights=weights, minlength=len(factors[0])
+        )
+        return summed_weights.astype(dtype) @ np.array(factors[0])
+
+    if dtype == np.float32:
+        total = CompensatedSum()
+        for factor_id in np.unique(factor_ids[:, 0]):
+            mask = factor_ids[:, 0] == factor_id
+            rest = _contract_factors(weights[mask], factor_ids[mask, 1:], factors[1:])
+            total.add(np.outer(factors[0][factor_id], rest))
+        return total.result.ravel()
+
+    rest_size = math.prod(len(label_factors[0]) for label_factors in factors[1:])
+    result = np.zeros((len(factors[0][0]), rest_size))
+    for factor_id in np.unique(factor_ids[:, 0]):
+        mask = factor_ids[:, 0] == factor_id
+        rest = _contract_factors(weights[mask], factor_ids[mask, 1:], factors[1:])
+        result += factors[0][factor_id][:, None] * rest[None, :]
+    return result.ravel()
+
+
+def _iter_factorized_blocks(
+    weights, factor_ids, factors, label_order, scatter_plan, max_chunk_size
+):
+    """
+    Contract the partition factors block by block along the outcomes of the first partition
+
+    Args:
+        weights: The coefficient of every term
+        factor_ids: The factor index of every partition for every term, see :func:`_contract_factors`
+        factors: The list of distinct factors of every partition
+        label_order: The labels of the partitions in the order of factors
+        scatter_plan: Mapping of partition outcomes to global outcomes
+        max_chunk_size: Maximum size of a block, unless the remaining partitions already have
+            more outcomes
+
+    Yields:
+        Tuples of global outcome indices and the corresponding probabilities
+    """
+    first_indices = scatter_plan.scatter(
+        label_order[0], np.arange(len(factors[0][0]), dtype=np.int64)
+    )
+    if len(factors) == 1:
+        result = _contract_factors(weights, factor_ids, factors)
+        for start in range(0, len(result), max_chunk_size):
+            stop = start + max_chunk_size
+            yield first_indices[start:stop], result[start:stop]
+        return
+
+    rest_indices = np.zeros(1, dtype=np.int64)
+    for label, label_factors in zip(label_order[1:], factors[1:]):
+        label_indices = scatter_plan.scatter(
+            label, np.arange(len(label_factors[0]), dtype=np.int64)
+        )
+        rest_indices = (rest_indices[:, None] | label_indices[None, :]).ravel()
+
+    first_factor_ids = np.unique(factor_ids[:, 0])
+    first_factors = np.stack([factors[0][i] for i in first_factor_ids], axis=1)
+    rest = np.stack(
+        [
+            _contract_factors(
+                weights[factor_ids[:, 0] == i],
+                factor_ids[factor_ids[:, 0] == i, 1:],
+                factors[1:],
+            )
+            for i in first_factor_ids
+        ]
+    )
+
+    rows = max(1, max_chunk_size // len(rest_indices))
+    for start in range(0, len(first_indices), rows):
+        stop = start + rows
+        block = first_factors[start:stop] @ rest
+        yield (
+            first_indices[start:stop, None] | rest_indices[None, :]
+        ).ravel(), block.ravel()
+
+
+def _factorize(results, coefficients, scatter_plan, dtype=np.float64):
+    """
+    Deduplicate the partition results and order the partitions for the contraction
+
+    Args:
+        results: The results from running the cutting subexperiments
+        coefficients: The coefficients of the subexperiments
+        scatter_plan: Mapping of partition outcomes to global outcomes
+        dtype: The floating-point type of the factors
+
+    Returns:
+        A tuple with the coefficient values, the factor indices of shape (number of coefficients,
+        number of partitions), the distinct factors of every partition and the order of the partitions
+    """
+    results = _results_per_label(results, scatter_plan.labels, len(coefficients))
+
+    factors = {}
+    factor_ids = {}
+    for label in scatter_plan.labels:
+        factors[label], factor_ids[label] = _deduplicated_factors(
+            results[label],
+            scatter_plan.num_local_qubits[label],
+            len(coefficients),
+            dtype=dtype,
+        )
+
+    # partitions with few distinct factors are contracted first
+    label_order = sorted(scatter_plan.labels, key=lambda label: len(factors[label]))
+    weights = np.array([coeff[0] for coeff in coefficients], dtype=np.float64)
+    return (
+        weights,
+        np.stack([factor_ids[label] for label in label_order], axis=1),
+        [factors[label] for label in label_order],
+        label_order,
+    )
+
+
+def prune_distribution(indices, values, min_abs_probability=None, top_k=None):
+    """
+    Drop insignificant entries of a sparse distribution
+
+    Args:
+        indices: The outcome indices
+        values: The corresponding probabilities
+        min_abs_probability: Entries with a smaller absolute value are dropped
+        top_k: Only the ``top_k`` entries with the largest absolute value are kept
+
+    Returns:
+        A tuple of the remaining indices and values
+    """
+    if min_abs_probability is not None:
+        mask = np.abs(values) >= min_abs_probability
+        indices, values = indices[mask], values[mask]
+    if top_k is not None and len(values) > top_k:
+        keep = np.argpartition(-np.abs(values), top_k - 1)[:top_k]
+        indices, values = indices[keep], values[keep]
+    return indices, values
+
+
+def _results_per_label(results, labels, num_coefficients):
+    if isinstance(results, dict) and isinstance(
+        results[next(iter(labels))], SamplerResult
+    ):
+        results = {
+            label: [results[label].quasi_dists[i] for i in range(num_coefficients)]
+            for label in labels
+        }
+    return results
+
+
 def reconstruct_distribution(
     results: dict[Hashable, SamplerResult] | dict[Hashable, list],
     coefficients: Sequence[tuple[float, WeightType]],
     partition_labels: str,
+    max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE,
+    scatter_plan: ScatterPlan | None = None,
 ) -> dict[int, float]:
     r"""
     Reconstruct the probability distribution from the results of the sub-experiments.
@@ -92,28 +383,23 @@ def reconstruct_distribution(
 
         partition_labels: Describing the cut of the circuit
 
+        max_chunk_size: Maximum number of combinations of partition outcomes held in memory at once
+
+        scatter_plan: Precomputed mapping of partition outcomes to global outcomes, built from
+            ``partition_labels`` if not provided
+
 
     Returns:
         The probability distribution as dict
     """
     result_dict = defaultdict(float)
 
-    labels = {*partition_labels}
-
-    qubits = Counter(partition_labels)
-
-    label_index_lists = {
-        label: list(find_character_in_string(partition_labels, label))
-        for label in labels
-    }
+    if scatter_plan is None:
+        scatter_plan = ScatterPlan(partition_labels)
+    labels = scatter_plan.labels
+    qubits = scatter_plan.num_local_qubits
 
-    if isinstance(results, dict) and isinstance(
-        results[next(iter(labels))], SamplerResult
-    ):
-        results = {
-            label: [results[label].quasi_dists[i] for i in range(len(coefficients))]
-            for label in labels
-        }
+    results = _results_per_label(results, labels, len(coefficients))
 
     # Reconstruct the probability distribution
     for i, coeff in enumerate(coefficients):
@@ -127,14 +413,242 @@ def reconstruct_distribution(
                 qpd_factor, meas_outcomes = _process_outcome_distribution(
                     qubits[label], outcome
                 )
-                coeff_result_dict[label][meas_outcomes] += qpd_factor * quasi_prob
+                combined_meas = scatter_plan.scatter_int(label, meas_outcomes)
+                coeff_result_dict[label][combined_meas] += qpd_factor * quasi_prob
 
-        for meas_keys, quasi_prob_vals in product_dicts(
-            *list(coeff_result_dict.values())
-        ).items():
-            combined_meas = 0
-            for meas, label in zip(meas_keys, coeff_result_dict.keys()):
-                combined_meas += shift_bits_by_index(meas, label_index_lists[label])
-            result_dict[combined_meas] += coeff[0] * math.prod(quasi_prob_vals)
+        accumulate_product_dicts(
+            result_dict,
+            *coeff_result_dict.values(),
+            weight=coeff[0],
+            max_chunk_size=max_chunk_size,
+        )
 
     return result_dict
+
+
+def reconstruct_distribution_vectorized(
+    results: dict[Hashable, SamplerResult] | dict[Hashable, list],
+    coefficients: Sequence[tuple[float, WeightType]],
+    partition_labels: str,
+    sparse: bool = False,
+    max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE,
+    scatter_plan: ScatterPlan | None = None,
+) -> np.typing.NDArray[np.float64] | tuple[
+    np.typing.NDArray[np.int64], np.typing.NDArray[np.float64]
+]:
+    r"""
+    Reconstruct the probability distribution from the results of the sub-experiments using NumPy arrays.
+
+    In contrast to :func:`reconstruct_distribution`, the outcomes of every partition are held as arrays of
+    outcome indices and QPD-signed quasi-probabilities. The contribution of each coefficient is computed as
+    the outer product of these arrays and scattered into a global accumulator.
+
+    Args:
+        results: The results from running the cutting subexperiments, see :func:`reconstruct_distribution`
+        coefficients: A sequence containing the coefficient associated with each unique subexperiment,
+            see :func:`reconstruct_distribution`
+        partition_labels: Describing the cut of the circuit
+        sparse: If ``True``, the result is accumulated only for the outcomes occurring in the results
+            instead of a dense array of length :math:`2^n`
+        max_chunk_size: Maximum number of combinations of partition outcomes held in memory at once.
+            In sparse mode, the buffered contributions are merged whenever they exceed this size.
+        scatter_plan: Precomputed mapping of partition outcomes to global outcomes, built from
+            ``partition_labels`` if not provided
+
+    Returns:
+        The probability distribution as dense array or, if ``sparse`` is set, as a tuple of
+        outcome indices and the corresponding probabilities
+    """
+    if scatter_plan is None:
+        scatter_plan = ScatterPlan(partition_labels)
+    num_qubits = scatter_plan.num_qubits
+    labels = scatter_plan.labels
+    qubits = scatter_plan.num_local_qubits
+
+    results = _results_per_label(results, labels, len(coefficients))
+
+    if sparse:
+        indices_list = [np.zeros(0, dtype=np.int64)]
+        values_list = [np.zeros(0)]
+        num_buffered = 0
+    else:
+        result = np.zeros(2 ** num_qubits)
+
+    for i, coeff in enumerate(coefficients):
+        label_arrays = []
+        for label in labels:
+            meas_outcomes, signed_quasi_probs = _process_outcome_distribution_array(
+                qubits[label], results[label][i]
+            )
+            label_indices = scatter_plan.scatter(label, meas_outcomes)
+            label_arrays.append((label_indices, signed_quasi_probs))
+
+        # the global indices of a single coefficient are unique
+        for global_indices, quasi_prob_vals in _iter_outer_product_chunks(
+            label_arrays, max_chunk_size
+        ):
+            if sparse:
+                indices_list.append(global_indices)
+                values_list.append(coeff[0] * quasi_prob_vals)
+                num_buffered += len(global_indices)
+                if num_buffered > max_chunk_size:
+                    merged_indices, merged_values = merge_sparse(
+                        indices_list, values_list
+                    )
+                    indices_list, values_list = [merged_indices], [merged_values]
+                    num_buffered = 0
+            else:
+                result[global_indices] += coeff[0] * quasi_prob_vals
+
+    if not sparse:
+        return result
+
+    return merge_sparse(indices_list, values_list)
+
+
+def reconstruct_distribution_factorized(
+    results: dict[Hashable, SamplerResult] | dict[Hashable, list],
+    coefficients: Sequence[tuple[float, WeightType]],
+    partition_labels: str,
+    scatter_plan: ScatterPlan | None = None,
+    dtype: np.typing.DTypeLike = np.float64,
+    out: np.typing.NDArray[np.floating] | None = None,
+) -> np.typing.NDArray[np.floating]:
+    r"""
+    Reconstruct the probability distribution by contracting shared factors of the coefficients.
+
+    The term of each coefficient is the Kronecker product of the quasi-distributions of all partitions.
+    Identical quasi-distributions of a partition are deduplicated and the terms are contracted
+    partition by partition, so that the cost scales with the number of distinct factors instead of
+    the number of coefficients times the size of the output.
+
+    Args:
+        results: The results from running the cutting subexperiments, see :func:`reconstruct_distribution`
+        coefficients: A sequence containing the coefficient associated with each unique subexperiment,
+            see :func:`reconstruct_distribution`
+        partition_labels: Describing the cut of the circuit
+        scatter_plan: Precomputed mapping of partition outcomes to global outcomes, built from
+            ``partition_labels`` if not provided
+        dtype: The floating-point type of the reconstruction, float32 results are added up by
+            compensated summation
+        out: Array the distribution is written to, e.g. a memory-mapped file, a new one if None
+
+    Returns:
+        The probability distribution as dense array
+    """
+    if scatter_plan is None:
+        scatter_plan = ScatterPlan(partition_labels)
+    weights, factor_ids, factors, label_order = _factorize(
+        results, coefficients, scatter_plan, dtype=dtype
+    )
+    result = _contract_factors(weights, factor_ids, factors)
+    return scatter_plan.kron_to_global(result, label_order, out=out)
+
+
+def reconstruct_distribution_parallel(
+    results: dict[Hashable, SamplerResult] | dict[Hashable, list],
+    coefficients: Sequence[tuple[float, WeightType]],
+    partition_labels: str,
+    executor=None,
+    num_parts: int = PARALLEL_NUM_PARTS,
+    dtype: np.typing.DTypeLike = np.float64,
+    out: np.typing.NDArray[np.floating] | None = None,
+) -> np.typing.NDArray[np.floating]:
+    r"""
+    Reconstruct the probability distribution in a process pool.
+
+    The coefficients are split into ``num_parts`` contiguous parts, which are contracted by
+    :func:`reconstruct_distribution_factorized` in the worker processes. The partial distributions
+    are added in the order of the parts, so the result does not depend on the number of workers. It
+    may differ in the last bits from contracting all coefficients at once.
+
+    Args:
+        results: The results from running the cutting subexperiments, see :func:`reconstruct_distribution`
+        coefficients: A sequence containing the coefficient associated with each unique subexperiment,
+            see :func:`reconstruct_distribution`
+        partition_labels: Describing the cut of the circuit
+        executor: The process pool, the parts are contracted in the current process if it is None
+        num_parts: The number of parts the coefficients are split into
+        dtype: The floating-point type of the reconstruction, float32 partial distributions are
+            added up by compensated summation
+        out: Array the partial distributions are added up in, e.g. a memory-mapped file, a new one
+            if None
+
+    Returns:
+        The probability distribution as dense array
+    """
+    labels = sorted(set(partition_labels))
+    results = _results_per_label(results, labels, len(coefficients))
+    args_list = [
+        (
+            {label: [results[label][i] for i in part] for label in labels},
+            [coefficients[i] for i in part],
+            partition_labels,
+            None,
+            dtype,
+        )
+        for part in split_evenly(len(coefficients), num_parts)
+    ]
+    return parallel_sum(
+        reconstruct_distribution_factorized,
+        args_list,
+        executor,
+        compensated=np.dtype(dtype) == np.float32,
+        out=out,
+    )
+
+
+def reconstruct_distribution_pruned(
+    results: dict[Hashable, SamplerResult] | dict[Hashable, list],
+    coefficients: Sequence[tuple[float, WeightType]],
+    partition_labels: str,
+    min_abs_probability: float | None = None,
+    top_k: int | None = None,
+    max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE,
+    scatter_plan: ScatterPlan | None = None,
+    dtype: np.typing.DTypeLike = np.float64,
+) -> tuple[np.typing.NDArray[np.int64], np.typing.NDArray[np.floating]]:
+    r"""
+    Reconstruct only the significant part of the probability distribution.
+
+    The distribution is contracted as in :func:`reconstruct_distribution_factorized`, but block by block
+    along the outcomes of the first partition. Every block is pruned right away, so that only the entries
+    passing the threshold, or at most ``top_k`` entries, are held in memory.
+
+    Args:
+        results: The results from running the cutting subexperiments, see :func:`reconstruct_distribution`
+        coefficients: A sequence containing the coefficient associated with each unique subexperiment,
+            see :func:`reconstruct_distribution`
+        partition_labels: Describing the cut of the circuit
+        min_abs_probability: Entries with a smaller absolute value are dropped
+        top_k: Only the ``top_k`` entries with the largest absolute value are kept
+        max_chunk_size: Maximum size of a block
+        scatter_plan: Precomputed mapping of partition outcomes to global outcomes, built from
+            ``partition_labels`` if not provided
+        dtype: The floating-point type of the reconstruction
+
+    Returns:
+        A tuple of the kept outcome indices in ascending order and the corresponding probabilities
+    """
+    if scatter_plan is None:
+        scatter_plan = ScatterPlan(partition_labels)
+    weights, factor_ids, factors, label_order = _factorize(
+        results, coefficients, scatter_plan, dtype=dtype
+    )
+
+    indices = np.zeros(0, dtype=np.int64)
+    values = np.zeros(0, dtype=dtype)
+    for block_indices, block_values in _iter_factorized_blocks(
+        weights, factor_ids, factors, label_order, scatter_plan, max_chunk_size
+    ):
+        block_indices, block_values = prune_distribution(
+            block_indices, block_values, min_abs_probability, top_k
+        )
+        indices, values = prune_distribution(
+            np.concatenate([indices, block_indices]),
+            np.concatenate([values, block_values]),
+            top_k=top_k,
+        )
+
+    order = np.argsort(indices)
+    return indices[order], values[order]
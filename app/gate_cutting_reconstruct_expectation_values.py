@@ -0,0 +1,106 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+from __future__ import annotations
+
+from typing import Hashable, Sequence
+
+import numpy as np
+from circuit_knitting.cutting.qpd import WeightType
+from circuit_knitting.utils.observable_grouping import ObservableCollection
+from qiskit.primitives import SamplerResult
+from qiskit.quantum_info import PauliList
+
+from app.gate_cutting_reconstruct_distribution import (
+    _parity,
+    _process_outcome_distribution_array,
+)
+
+
+def _subsystem_expectation_values(
+    results: list, subobservables: PauliList, num_coefficients: int
+) -> np.typing.NDArray[np.float64]:
+    """
+    Compute the expectation values of the subobservables of a partition for every coefficient
+
+    Args:
+        results: The quasi-distributions of the partition, one per coefficient and commuting group
+        subobservables: The subobservables of the partition
+        num_coefficients: The number of coefficients
+
+    Returns:
+        Array of shape (number of coefficients, number of subobservables)
+    """
+    collection = ObservableCollection(subobservables)
+    groups = collection.groups
+    masks = [
+        np.array(group.pauli_bitmasks, dtype=np.uint64)[None, :] for group in groups
+    ]
+
+    expvals = np.zeros((num_coefficients, len(subobservables)))
+    for i in range(num_coefficients):
+        group_expvals = []
+        for k, group in enumerate(groups):
+            meas_outcomes, signed_quasi_probs = _process_outcome_distribution_array(
+                len(group.pauli_indices), results[i * len(groups) + k]
+            )
+            signs = 1.0 - 2.0 * _parity(
+                meas_outcomes.astype(np.uint64)[:, None] & masks[k]
+            )
+            group_expvals.append(signed_quasi_probs @ signs)
+        for j, subobservable in enumerate(subobservables):
+            expvals[i, j] = np.mean(
+                [group_expvals[m][n] for m, n in collection.lookup[subobservable]]
+            )
+    return expvals
+
+
+def reconstruct_expectation_values(
+    results: dict[Hashable, SamplerResult] | dict[Hashable, list],
+    coefficients: Sequence[tuple[float, WeightType]],
+    subobservables: dict[Hashable, PauliList],
+) -> np.typing.NDArray[np.float64]:
+    r"""
+    Reconstruct the expectation values of several observables from the results of the subexperiments.
+
+    In contrast to :func:`circuit_knitting.cutting.reconstruct_expectation_values`, every quasi-distribution
+    is processed once as an array for all observables of its commuting group, and the coefficients are
+    combined with a single matrix product.
+
+    Args:
+        results: The results from running the cutting subexperiments, either a dict mapping the partition
+            labels to a :class:`~qiskit.primitives.SamplerResult` or to a list of quasi-distributions ordered
+            as returned by :func:`circuit_knitting.cutting.generate_cutting_experiments`
+        coefficients: A sequence containing the coefficient associated with each unique subexperiment
+        subobservables: Dictionary mapping the partition labels to the subobservables of the partition
+
+    Returns:
+        An array containing the expectation value of every observable
+    """
+    terms = np.ones((len(coefficients), len(next(iter(subobservables.values())))))
+    for label, observables in subobservables.items():
+        label_results = results[label]
+        if isinstance(label_results, SamplerResult):
+            label_results = label_results.quasi_dists
+        terms *= _subsystem_expectation_values(
+            label_results, observables, len(coefficients)
+        )
+
+    weights = np.array([coeff[0] for coeff in coefficients], dtype=np.float64)
+    return weights @ terms
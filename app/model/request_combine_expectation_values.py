@@ -0,0 +1,49 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import marshmallow as ma
+
+
+class CombineExpectationValuesRequest:
+    def __init__(
+        self,
+        subcircuit_results,
+        observables=None,
+        circuit=None,
+        cuts=None,
+        cut_id=None,
+        circuit_format="openqasm2",
+    ):
+        self.circuit = circuit
+        self.subcircuit_results = subcircuit_results
+        self.cuts = cuts
+        self.cut_id = cut_id
+        self.observables = observables
+        self.circuit_format = circuit_format
+
+
+class CombineExpectationValuesRequestSchema(ma.Schema):
+    circuit = ma.fields.Str(required=False)
+    subcircuit_results = ma.fields.List(
+        ma.fields.Dict(keys=ma.fields.Str(), values=ma.fields.Float()), required=True
+    )
+    cuts = ma.fields.Dict(required=False)
+    cut_id = ma.fields.Str(required=False)
+    observables = ma.fields.List(ma.fields.Str(), required=False)
+    circuit_format = ma.fields.String(required=False)
@@ -18,45 +18,94 @@
 # ******************************************************************************
 
 import marshmallow as ma
+from marshmallow.validate import OneOf, Range
 import numpy as np
-import argschema
+
+from app.binary_format import NumpyArray
 
 
 class CombineResultsRequest:
     def __init__(
         self,
-        circuit,
         subcircuit_results,
-        cuts,
+        circuit=None,
+        cuts=None,
+        cut_id=None,
         circuit_format="openqasm2",
         unnormalized_results=False,
         shot_scaling_factor=None,
+        min_abs_probability=None,
+        top_k=None,
+        precision="float64",
+        sparse=False,
+        stream=None,
+        dynamic_definition=False,
+        dd_max_active_qubits=10,
+        dd_recursion_depth=1,
+        persist=False,
     ):
         self.circuit = circuit
         self.subcircuit_results = subcircuit_results
         self.cuts = cuts
+        self.cut_id = cut_id
         self.circuit_format = circuit_format
         self.unnormalized_results = unnormalized_results
         self.shot_scaling_factor = shot_scaling_factor
+        self.min_abs_probability = min_abs_probability
+        self.top_k = top_k
+        self.precision = precision
+        self.sparse = sparse
+        self.stream = stream
+        self.dynamic_definition = dynamic_definition
+        self.dd_max_active_qubits = dd_max_active_qubits
+        self.dd_recursion_depth = dd_recursion_depth
+        self.persist = persist
 
 
 class CombineResultsRequestSchema(ma.Schema):
-    circuit = ma.fields.Str(required=True)
-    subcircuit_results = ma.fields.List(
-        argschema.fields.NumpyArray(dtype=np.float), required=True
-    )
-    cuts = ma.fields.Dict(required=True)
+    circuit = ma.fields.Str(required=False)
+    subcircuit_results = ma.fields.List(NumpyArray(dtype=np.float), required=True)
+    cuts = ma.fields.Dict(required=False)
+    cut_id = ma.fields.Str(required=False)
     circuit_format = ma.fields.String(required=False)
     unnormalized_results = ma.fields.Boolean(required=False)
     shot_scaling_factor = ma.fields.Int(required=False)
+    precision = ma.fields.String(required=False, validate=OneOf(["float64", "float32"]))
+    sparse = ma.fields.Boolean(required=False)
+    stream = ma.fields.String(required=False, validate=OneOf(["json", "npy"]))
+    dynamic_definition = ma.fields.Boolean(required=False)
+    dd_max_active_qubits = ma.fields.Int(required=False, validate=Range(min=1))
+    dd_recursion_depth = ma.fields.Int(required=False, validate=Range(min=1))
+    persist = ma.fields.Boolean(required=False)
 
 
 class CombineResultsRequestQuokkaSchema(ma.Schema):
-    circuit = ma.fields.Str(required=True)
+    circuit = ma.fields.Str(required=False)
     subcircuit_results = ma.fields.List(
         ma.fields.Dict(keys=ma.fields.Str(), values=ma.fields.Float()), required=True
     )
-    cuts = ma.fields.Dict(required=True)
+    cuts = ma.fields.Dict(required=False)
+    cut_id = ma.fields.Str(required=False)
     circuit_format = ma.fields.String(required=False)
     unnormalized_results = ma.fields.Boolean(required=False)
     shot_scaling_factor = ma.fields.Int(required=False)
+    precision = ma.fields.String(required=False, validate=OneOf(["float64", "float32"]))
+    sparse = ma.fields.Boolean(required=False)
+    stream = ma.fields.String(required=False, validate=OneOf(["json", "npy"]))
+    dynamic_definition = ma.fields.Boolean(required=False)
+    dd_max_active_qubits = ma.fields.Int(required=False, validate=Range(min=1))
+    dd_recursion_depth = ma.fields.Int(required=False, validate=Range(min=1))
+    persist = ma.fields.Boolean(required=False)
+
+
+class CombineResultsRequestGateCuttingSchema(CombineResultsRequestQuokkaSchema):
+    class Meta:
+        exclude = (
+            "sparse",
+            "dynamic_definition",
+            "dd_max_active_qubits",
+            "dd_recursion_depth",
+        )
+
+    min_abs_probability = ma.fields.Float(required=False, validate=Range(min=0))
+    top_k = ma.fields.Int(required=False, validate=Range(min=1))
@@ -18,6 +18,7 @@
 # ******************************************************************************
 
 import marshmallow as ma
+from marshmallow.validate import OneOf, Range
 import numpy as np
 import argschema
 
@@ -32,6 +33,14 @@ class CutCircuitsRequest:
         max_num_subcircuits=None,
         subcircuit_vertices=None,
         circuit_format="openqasm2",
+        observables=None,
+        parameter_bindings=None,
+        solver_time_limit=None,
+        mip_gap=None,
+        objective="classical_cost",
+        parallel_search=False,
+        solver="cplex",
+        warm_start=False,
     ):
         self.circuit = circuit
         self.method = method
@@ -44,6 +53,14 @@ class CutCircuitsRequest:
         )
         self.subcircuit_vertices = subcircuit_vertices
         self.circuit_format = circuit_format.lower()
+        self.observables = observables
+        self.parameter_bindings = parameter_bindings
+        self.solver_time_limit = solver_time_limit
+        self.mip_gap = mip_gap
+        self.objective = objective
+        self.parallel_search = parallel_search
+        self.solver = solver
+        self.warm_start = warm_start
 
 
 class CutCircuitsRequestSchema(ma.Schema):
@@ -54,3 +71,17 @@ class CutCircuitsRequestSchema(ma.Schema):
     max_num_subcircuits = ma.fields.Int(required=False)
     subcircuit_vertices = ma.fields.List(ma.fields.List(ma.fields.Int), required=False)
     circuit_format = ma.fields.String(required=False)
+    observables = ma.fields.List(ma.fields.Str(), required=False)
+    parameter_bindings = ma.fields.List(
+        ma.fields.Dict(keys=ma.fields.Str(), values=ma.fields.Float()), required=False
+    )
+    solver_time_limit = ma.fields.Float(
+        required=False, validate=Range(min=0, min_inclusive=False)
+    )
+    mip_gap = ma.fields.Float(required=False, validate=Range(min=0, max=1))
+    objective = ma.fields.Str(
+        required=False, validate=OneOf(["classical_cost", "num_instances", "num_cuts"])
+    )
+    parallel_search = ma.fields.Boolean(required=False)
+    solver = ma.fields.Str(required=False, validate=OneOf(["cplex", "highs"]))
+    warm_start = ma.fields.Boolean(required=False)
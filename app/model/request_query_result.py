@@ -0,0 +1,38 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import marshmallow as ma
+from marshmallow.validate import Range
+
+
+class QueryResultSliceSchema(ma.Schema):
+    start = ma.fields.Int(required=False, validate=Range(min=0))
+    stop = ma.fields.Int(required=False, validate=Range(min=0))
+
+
+class QueryResultTopKSchema(ma.Schema):
+    k = ma.fields.Int(required=True, validate=Range(min=1))
+
+
+class QueryResultSparseSchema(ma.Schema):
+    min_abs_probability = ma.fields.Float(required=True, validate=Range(min=0))
+
+
+class QueryResultMarginalSchema(ma.Schema):
+    qubits = ma.fields.List(ma.fields.Int(), required=True)
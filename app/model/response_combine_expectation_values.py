@@ -0,0 +1,36 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import marshmallow as ma
+
+
+class CombineExpectationValuesResponse:
+    def __init__(self, expectation_values):
+        super().__init__()
+        self.expectation_values = expectation_values
+
+    def to_json(self):
+        json_execution_response = {
+            "expectation_values": self.expectation_values,
+        }
+        return json_execution_response
+
+
+class CombineExpectationValuesResponseSchema(ma.Schema):
+    expectation_values = ma.fields.List(ma.fields.Float())
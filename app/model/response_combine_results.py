@@ -23,20 +23,31 @@ import numpy as np
 
 
 class CombineResultsResponse:
-    def __init__(self, result):
+    def __init__(self, result, bins=None, result_id=None, indices=None):
         super().__init__()
         self.result = result
+        self.bins = bins
+        self.result_id = result_id
+        self.indices = indices
 
     def to_json(self):
         json_execution_response = {
             "result": self.result,
+            "bins": self.bins,
+            "result_id": self.result_id,
+            "indices": self.indices,
         }
         return json_execution_response
 
 
 class CombineResultsResponseSchema(ma.Schema):
     result = argschema.fields.NumpyArray(dtype=np.float)
+    bins = ma.fields.Dict(keys=ma.fields.Str(), values=ma.fields.Float())
+    result_id = ma.fields.Str()
+    indices = ma.fields.List(ma.fields.Int())
 
 
 class CombineResultsResponseQuokkaSchema(ma.Schema):
     result = ma.fields.Dict(keys=ma.fields.Str(), values=ma.fields.Float())
+    bins = ma.fields.Dict(keys=ma.fields.Str(), values=ma.fields.Float())
+    result_id = ma.fields.Str()
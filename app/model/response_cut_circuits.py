@@ -25,6 +25,17 @@ import marshmallow as ma
 from qiskit import qasm3, qasm2
 
 
+def serialize_circuits(circuits, format):
+    if format == "openqasm2":
+        return [qasm2.dumps(circ) for circ in circuits]
+    if format == "openqasm3":
+        return [qasm3.dumps(circ) for circ in circuits]
+    if format == "qiskit":
+        return [
+            codecs.encode(pickle.dumps(circ), "base64").decode() for circ in circuits
+        ]
+
+
 class CutCircuitsResponse:
     def __init__(
         self,
@@ -37,28 +48,18 @@ class CutCircuitsResponse:
         format,
         individual_subcircuits,
         init_meas_subcircuit_map,
+        cut_id=None,
+        bound_individual_subcircuits=None,
+        solver_status=None,
+        mip_gap=None,
     ):
         super().__init__()
+        self.cut_id = cut_id
+        self.solver_status = solver_status
+        self.mip_gap = mip_gap
         self.max_subcircuit_width = max_subcircuit_width
-        if format == "openqasm2":
-            self.subcircuits = [qasm2.dumps(circ) for circ in subcircuits]
-            self.individual_subcircuits = [
-                qasm2.dumps(circ) for circ in individual_subcircuits
-            ]
-        elif format == "openqasm3":
-            self.subcircuits = [qasm3.dumps(circ) for circ in subcircuits]
-            self.individual_subcircuits = [
-                qasm3.dumps(circ) for circ in individual_subcircuits
-            ]
-        elif format == "qiskit":
-            self.subcircuits = [
-                codecs.encode(pickle.dumps(circ), "base64").decode()
-                for circ in subcircuits
-            ]
-            self.individual_subcircuits = [
-                codecs.encode(pickle.dumps(circ), "base64").decode()
-                for circ in individual_subcircuits
-            ]
+        self.subcircuits = serialize_circuits(subcircuits, format)
+        self.individual_subcircuits = serialize_circuits(individual_subcircuits, format)
         self.complete_path_map = jsonpickle.encode(complete_path_map, keys=True)
         self.num_cuts = num_cuts
         self.counter = counter
@@ -66,20 +67,33 @@ class CutCircuitsResponse:
         self.init_meas_subcircuit_map = jsonpickle.encode(
             init_meas_subcircuit_map, keys=True
         )
+        self.bound_individual_subcircuits = (
+            None
+            if bound_individual_subcircuits is None
+            else [
+                serialize_circuits(circuits, format)
+                for circuits in bound_individual_subcircuits
+            ]
+        )
 
     def to_json(self):
         json_execution_response = {
+            "cut_id": self.cut_id,
             "max_subcircuit_width": self.max_subcircuit_width,
             "subcircuits": self.subcircuits,
             "complete_path_map": self.complete_path_map,
             "num_cuts": self.num_cuts,
             "counter": self.counter,
             "classical_cost": self.classical_cost,
+            "bound_individual_subcircuits": self.bound_individual_subcircuits,
+            "solver_status": self.solver_status,
+            "mip_gap": self.mip_gap,
         }
         return json_execution_response
 
 
 class CutCircuitsResponseSchema(ma.Schema):
+    cut_id = ma.fields.Str()
     max_subcircuit_width = ma.fields.Int()
     subcircuits = ma.fields.List(ma.fields.Str())
     complete_path_map = ma.fields.Str()
@@ -91,3 +105,6 @@ class CutCircuitsResponseSchema(ma.Schema):
     classical_cost = ma.fields.Int()
     individual_subcircuits = ma.fields.List(ma.fields.Str())
     init_meas_subcircuit_map = ma.fields.Str()
+    bound_individual_subcircuits = ma.fields.List(ma.fields.List(ma.fields.Str()))
+    solver_status = ma.fields.Str()
+    mip_gap = ma.fields.Float()
@@ -17,11 +17,9 @@
 #  limitations under the License.
 # ******************************************************************************
 
-import codecs
-import pickle
-
 import marshmallow as ma
-from qiskit import qasm3, qasm2
+
+from app.model.response_cut_circuits import serialize_circuits
 
 
 class GateCutCircuitsResponse:
@@ -32,39 +30,46 @@ class GateCutCircuitsResponse:
         subcircuit_labels,
         coefficients,
         partition_labels,
+        observables,
+        cut_id=None,
+        bound_individual_subcircuits=None,
     ):
         super().__init__()
-        if format == "openqasm2":
-            self.individual_subcircuits = [
-                qasm2.dumps(circ) for circ in individual_subcircuits
-            ]
-        elif format == "openqasm3":
-            self.individual_subcircuits = [
-                qasm3.dumps(circ) for circ in individual_subcircuits
-            ]
-        elif format == "qiskit":
-            self.individual_subcircuits = [
-                codecs.encode(pickle.dumps(circ), "base64").decode()
-                for circ in individual_subcircuits
-            ]
+        self.cut_id = cut_id
+        self.individual_subcircuits = serialize_circuits(individual_subcircuits, format)
 
         self.subcircuit_labels = subcircuit_labels
         self.coefficients = [(c, w.value) for c, w in coefficients]
         self.partition_labels = partition_labels
+        self.observables = observables
+        self.bound_individual_subcircuits = (
+            None
+            if bound_individual_subcircuits is None
+            else [
+                serialize_circuits(circuits, format)
+                for circuits in bound_individual_subcircuits
+            ]
+        )
 
     def to_json(self):
         json_execution_response = {
+            "cut_id": self.cut_id,
             "individual_subcircuits": self.individual_subcircuits,
             "subcircuit_labels": self.subcircuit_labels,
             "coefficients": self.coefficients,
             "partition_labels": self.partition_labels,
+            "observables": self.observables,
+            "bound_individual_subcircuits": self.bound_individual_subcircuits,
         }
         return json_execution_response
 
 
 class GateCutCircuitsResponseSchema(ma.Schema):
+    cut_id = ma.fields.Str()
     max_subcircuit_width = ma.fields.Int()
     individual_subcircuits = ma.fields.List(ma.fields.Str())
     subcircuit_labels = ma.fields.List(ma.fields.Str())
     coefficients = ma.fields.List(ma.fields.Tuple((ma.fields.Float, ma.fields.Int)))
     partition_labels = ma.fields.Str()
+    observables = ma.fields.List(ma.fields.Str())
+    bound_individual_subcircuits = ma.fields.List(ma.fields.List(ma.fields.Str()))
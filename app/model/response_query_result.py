@@ -0,0 +1,56 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import argschema.fields
+import marshmallow as ma
+import numpy as np
+
+
+class QueryResultResponse:
+    def __init__(self, result_id, result, num_qubits, start=None, qubits=None):
+        super().__init__()
+        self.result_id = result_id
+        self.result = result
+        self.num_qubits = num_qubits
+        self.start = start
+        self.qubits = qubits
+
+    def to_json(self):
+        json_execution_response = {
+            "result_id": self.result_id,
+            "result": self.result,
+            "num_qubits": self.num_qubits,
+            "start": self.start,
+            "qubits": self.qubits,
+        }
+        return json_execution_response
+
+
+class QueryResultArrayResponseSchema(ma.Schema):
+    result_id = ma.fields.Str()
+    result = argschema.fields.NumpyArray(dtype=np.float)
+    num_qubits = ma.fields.Int()
+    start = ma.fields.Int()
+    qubits = ma.fields.List(ma.fields.Int())
+
+
+class QueryResultCountsResponseSchema(ma.Schema):
+    result_id = ma.fields.Str()
+    result = ma.fields.Dict(keys=ma.fields.Str(), values=ma.fields.Float())
+    num_qubits = ma.fields.Int()
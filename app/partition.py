@@ -68,6 +68,39 @@ def get_partitions(circuit_or_dag, num_partitions, max_partition_size):
     return partitions, partition_sizes
 
 
+def partition_graph(num_nodes, edges, num_partitions, epsilon=0.03, seed=0):
+    """
+    Partition a graph into blocks of about equal size minimizing the number of edges between them
+
+    Args:
+        num_nodes: The number of nodes
+        edges: The edges as pairs of node indices
+        num_partitions: The number of blocks
+        epsilon: The allowed imbalance of the block sizes
+        seed: The seed of KaHyPar
+
+    Returns:
+        The block of every node
+    """
+    hypergraph = kahypar.Hypergraph(
+        num_nodes,
+        len(edges),
+        [2 * i for i in range(len(edges) + 1)],
+        [node for edge in edges for node in edge],
+        num_partitions,
+        [1] * len(edges),
+        [1] * num_nodes,
+    )
+    context = kahypar.Context()
+    context.loadINIconfiguration(PATH_KAHYPAR_CONFIG)
+    context.setK(num_partitions)
+    context.setEpsilon(epsilon)
+    context.setSeed(seed)
+    context.suppressOutput(True)
+    kahypar.partition(hypergraph, context)
+    return [hypergraph.blockID(node) for node in range(num_nodes)]
+
+
 def get_two_dummy_partitions(circuit: QuantumCircuit):
     n = circuit.num_qubits
     partitions = {}
@@ -0,0 +1,231 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import os
+import re
+import time
+import uuid
+
+import numpy as np
+
+from app.utils import DEFAULT_MAX_CHUNK_SIZE, indices_to_bitstrings
+
+_RESULT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ResultStore:
+    """
+    Stores reconstructed distributions as ``.npy`` files that are memory-mapped when they are queried
+
+    Queries only read the parts of a distribution they need, so distributions larger than the
+    memory of the service can be inspected without loading them. Distributions are kept for at most
+    ``ttl`` seconds after they were stored, expired ones are deleted whenever a new one is stored.
+    """
+
+    def __init__(self, directory: str, ttl: float = None, timer=time.time):
+        self.directory = directory
+        self.ttl = ttl
+        self._timer = timer
+
+    def create(self, size: int, dtype=np.float64):
+        """
+        Create a zero-initialized distribution to be filled by the caller
+
+        Returns:
+            A tuple of the result_id and the writable memory map of the distribution
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.delete_expired()
+        result_id = uuid.uuid4().hex
+        array = np.lib.format.open_memmap(
+            self._path(result_id), mode="w+", dtype=dtype, shape=(size,)
+        )
+        return result_id, array
+
+    def save(self, array: np.ndarray) -> str:
+        """
+        Store a dense distribution
+
+        Returns:
+            The result_id of the distribution
+        """
+        result_id, stored = self.create(len(array), array.dtype)
+        stored[:] = array
+        stored.flush()
+        return result_id
+
+    def save_sparse(self, indices: np.ndarray, values: np.ndarray, size: int) -> str:
+        """
+        Store a sparse distribution densely, all outcomes that are not given are zero
+
+        Returns:
+            The result_id of the distribution
+        """
+        result_id, stored = self.create(size, values.dtype)
+        stored[indices] = values
+        stored.flush()
+        return result_id
+
+    def load(self, result_id: str) -> np.ndarray:
+        """
+        Memory-map a stored distribution read-only
+
+        Raises:
+            KeyError: If there is no distribution with the given result_id
+        """
+        if not _RESULT_ID.match(result_id):
+            raise KeyError(result_id)
+        path = self._path(result_id)
+        try:
+            if self._expired(path):
+                os.remove(path)
+                raise KeyError(result_id)
+            return np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            raise KeyError(result_id) from None
+
+    def delete(self, result_id: str):
+        """
+        Delete a stored distribution
+
+        Raises:
+            KeyError: If there is no distribution with the given result_id
+        """
+        if not _RESULT_ID.match(result_id):
+            raise KeyError(result_id)
+        try:
+            os.remove(self._path(result_id))
+        except FileNotFoundError:
+            raise KeyError(result_id) from None
+
+    def delete_expired(self):
+        """
+        Delete the stored distributions that are older than the ttl
+        """
+        if self.ttl is None or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            result_id, extension = os.path.splitext(name)
+            if extension != ".npy" or not _RESULT_ID.match(result_id):
+                continue
+            path = self._path(result_id)
+            try:
+                if self._expired(path):
+                    os.remove(path)
+            except FileNotFoundError:
+                # deleted concurrently
+                pass
+
+    def _expired(self, path: str) -> bool:
+        return (
+            self.ttl is not None and os.path.getmtime(path) + self.ttl <= self._timer()
+        )
+
+    def _path(self, result_id: str) -> str:
+        return os.path.join(self.directory, result_id + ".npy")
+
+
+def num_qubits_of(array: np.ndarray) -> int:
+    return int(len(array)).bit_length() - 1
+
+
+def top_k(array: np.ndarray, k: int, chunk_size: int = DEFAULT_MAX_CHUNK_SIZE):
+    """
+    Find the ``k`` outcomes with the largest absolute probability, reading one chunk at a time
+
+    Returns:
+        A tuple of the indices and values, ordered by decreasing absolute value
+    """
+    indices = np.empty(0, dtype=np.int64)
+    values = np.empty(0, dtype=array.dtype)
+    for start in range(0, len(array), chunk_size):
+        chunk = np.asarray(array[start : start + chunk_size])
+        indices = np.concatenate([indices, np.arange(start, start + len(chunk))])
+        values = np.concatenate([values, chunk])
+        if len(values) > k:
+            keep = np.argpartition(-np.abs(values), k - 1)[:k]
+            indices, values = indices[keep], values[keep]
+    order = np.argsort(-np.abs(values), kind="stable")
+    return indices[order], values[order]
+
+
+def threshold(
+    array: np.ndarray,
+    min_abs_probability: float,
+    chunk_size: int = DEFAULT_MAX_CHUNK_SIZE,
+    max_count: int = None,
+):
+    """
+    Find the outcomes whose absolute probability is at least ``min_abs_probability``
+
+    Returns:
+        A tuple of the ascending indices and their values
+
+    Raises:
+        ValueError: If more than ``max_count`` outcomes are found
+    """
+    indices = []
+    values = []
+    count = 0
+    for start in range(0, len(array), chunk_size):
+        chunk = np.asarray(array[start : start + chunk_size])
+        keep = np.flatnonzero(np.abs(chunk) >= min_abs_probability)
+        count += len(keep)
+        if max_count is not None and count > max_count:
+            raise ValueError(
+                f"More than {max_count} outcomes have an absolute probability of at least "
+                f"{min_abs_probability}"
+            )
+        indices.append(keep + start)
+        values.append(chunk[keep])
+    if not indices:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=array.dtype)
+    return np.concatenate(indices), np.concatenate(values)
+
+
+def marginal(array: np.ndarray, qubits, chunk_size: int = DEFAULT_MAX_CHUNK_SIZE):
+    """
+    Marginalize a distribution onto the given qubits
+
+    Bit ``i`` of an outcome index is the measurement of qubit ``i``. Bit ``j`` of an index of the
+    marginal distribution is the measurement of ``qubits[j]``.
+
+    Raises:
+        ValueError: If a qubit is out of range or given multiple times
+    """
+    num_qubits = num_qubits_of(array)
+    if len(set(qubits)) != len(qubits) or any(q < 0 or q >= num_qubits for q in qubits):
+        raise ValueError(
+            f"The qubits must be distinct and between 0 and {num_qubits - 1}"
+        )
+    result = np.zeros(2 ** len(qubits), dtype=np.float64)
+    for start in range(0, len(array), chunk_size):
+        chunk = np.asarray(array[start : start + chunk_size])
+        outcomes = np.arange(start, start + len(chunk), dtype=np.int64)
+        marginal_indices = np.zeros(len(chunk), dtype=np.int64)
+        for j, qubit in enumerate(qubits):
+            marginal_indices |= ((outcomes >> qubit) & 1) << j
+        result += np.bincount(marginal_indices, chunk, minlength=len(result))
+    return result.astype(array.dtype, copy=False)
+
+
+def to_counts(array: np.ndarray, indices: np.ndarray, values: np.ndarray) -> dict:
+    return dict(
+        zip(indices_to_bitstrings(indices, num_qubits_of(array)), values.tolist())
+    )
@@ -18,17 +18,29 @@
 # ******************************************************************************
 
 
+from flask import current_app
 from flask_smorest import Blueprint
 
 from app import gate_cutter
+from app.model.request_combine_expectation_values import (
+    CombineExpectationValuesRequest,
+    CombineExpectationValuesRequestSchema,
+)
 from app.model.request_combine_results import (
-    CombineResultsRequestQuokkaSchema,
+    CombineResultsRequestGateCuttingSchema,
     CombineResultsRequest,
 )
 from app.model.request_cut_circuits import CutCircuitsRequestSchema, CutCircuitsRequest
 
-from app.model.response_combine_results import CombineResultsResponseQuokkaSchema
+from app.model.response_combine_expectation_values import (
+    CombineExpectationValuesResponseSchema,
+)
+from app.model.response_combine_results import (
+    CombineResultsResponseQuokkaSchema,
+    CombineResultsResponseSchema,
+)
 from app.model.response_gate_cut_circuits import GateCutCircuitsResponseSchema
+from app.streaming import stream_result
 
 blp_gate_cutting = Blueprint(
     "gate-cutting",
@@ -52,14 +64,18 @@ blp_gate_cutting = Blueprint(
 @blp_gate_cutting.response(200, GateCutCircuitsResponseSchema)
 def gate_cut_circuit(json: dict):
     print("request", json)
-    result = gate_cutter.gate_cut_circuit(CutCircuitsRequest(**json))
+    result = gate_cutter.gate_cut_circuit(
+        CutCircuitsRequest(**json),
+        cut_cache=current_app.extensions["cut_cache"],
+        cut_result_cache=current_app.extensions["cut_result_cache"],
+    )
     print("result", result)
     return result
 
 
 @blp_gate_cutting.route("/gate-cutting/combineResultsQuokka", methods=["POST"])
 @blp_gate_cutting.arguments(
-    CombineResultsRequestQuokkaSchema,
+    CombineResultsRequestGateCuttingSchema,
     example={
         "circuit": 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[6];\nry(3.65201816844744) q[0];\nry(1.86914714247146) q[1];\ncx q[0],q[1];\nry(4.29668327383582) q[0];\nry(3.78320230781079) q[2];\ncx q[1],q[2];\nry(3.9348411572113) q[1];\nry(2.56591926281996) q[3];\ncx q[2],q[3];\nry(3.98698245166312) q[2];\nry(2.77957484387872) q[4];\ncx q[3],q[4];\nry(2.77046779740946) q[3];\nry(4.34760986661033) q[5];\ncx q[4],q[5];\nry(1.67983539831451) q[4];\nry(4.89050090588416) q[5];\n',
         "subcircuit_results": [
@@ -242,6 +258,46 @@ def gate_cut_circuit(json: dict):
 def combine_results(json: dict):
     """Recombine the results of the subcircuits from the gate cut."""
     print("request combine", json)
-    return gate_cutter.reconstruct_result(
-        CombineResultsRequest(**json), quokka_format=True
+    input_dict = CombineResultsRequest(**json)
+    result = gate_cutter.reconstruct_result(
+        input_dict,
+        quokka_format=True,
+        max_chunk_size=current_app.config["RECONSTRUCTION_MAX_CHUNK_SIZE"],
+        executor=current_app.extensions["reconstruction_pool"],
+        cut_cache=current_app.extensions["cut_cache"],
+        result_store=current_app.extensions["result_store"],
+    )
+    return stream_result(
+        result, input_dict.stream, current_app.config["RESPONSE_CHUNK_SIZE"]
+    )
+
+
+@blp_gate_cutting.route("/gate-cutting/combineResults", methods=["POST"])
+@blp_gate_cutting.arguments(CombineResultsRequestGateCuttingSchema)
+@blp_gate_cutting.response(200, CombineResultsResponseSchema)
+def combine_results_array(json: dict):
+    """Recombine the results of the subcircuits from the gate cut into a probability array."""
+    print("request combine", json)
+    input_dict = CombineResultsRequest(**json)
+    result = gate_cutter.reconstruct_result(
+        input_dict,
+        max_chunk_size=current_app.config["RECONSTRUCTION_MAX_CHUNK_SIZE"],
+        executor=current_app.extensions["reconstruction_pool"],
+        cut_cache=current_app.extensions["cut_cache"],
+        result_store=current_app.extensions["result_store"],
+    )
+    return stream_result(
+        result, input_dict.stream, current_app.config["RESPONSE_CHUNK_SIZE"]
+    )
+
+
+@blp_gate_cutting.route("/gate-cutting/combineExpectationValues", methods=["POST"])
+@blp_gate_cutting.arguments(CombineExpectationValuesRequestSchema)
+@blp_gate_cutting.response(200, CombineExpectationValuesResponseSchema)
+def combine_expectation_values(json: dict):
+    """Reconstruct the expectation values of the observables from the results of the subcircuits."""
+    print("request combine expectation values", json)
+    return gate_cutter.reconstruct_expectation_values_result(
+        CombineExpectationValuesRequest(**json),
+        cut_cache=current_app.extensions["cut_cache"],
     )
@@ -0,0 +1,138 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import numpy as np
+from flask import current_app
+from flask_smorest import Blueprint, abort
+
+from app import result_store
+from app.model.request_query_result import (
+    QueryResultSliceSchema,
+    QueryResultTopKSchema,
+    QueryResultSparseSchema,
+    QueryResultMarginalSchema,
+)
+from app.model.response_query_result import (
+    QueryResultArrayResponseSchema,
+    QueryResultCountsResponseSchema,
+    QueryResultResponse,
+)
+
+blp_results = Blueprint(
+    "results",
+    __name__,
+    description="Query reconstructed distributions that were persisted with persist=true",
+)
+
+
+def _load(result_id):
+    try:
+        return current_app.extensions["result_store"].load(result_id)
+    except KeyError:
+        abort(404, message=f"There is no result with result_id {result_id}")
+
+
+@blp_results.route("/results/<result_id>/slice", methods=["GET"])
+@blp_results.arguments(QueryResultSliceSchema, location="query")
+@blp_results.response(200, QueryResultArrayResponseSchema)
+def query_slice(query: dict, result_id):
+    """Get the probabilities of the outcomes with indices in [start, stop), a limited number at once."""
+    array = _load(result_id)
+    start = query.get("start", 0)
+    stop = query.get("stop", len(array))
+    max_size = current_app.config["RESULT_SLICE_MAX_SIZE"]
+    if min(stop, len(array)) - start > max_size:
+        abort(
+            400,
+            message=f"A slice can contain at most {max_size} probabilities, query it in parts",
+        )
+    return QueryResultResponse(
+        result_id,
+        np.array(array[start:stop]),
+        result_store.num_qubits_of(array),
+        start=min(start, len(array)),
+    )
+
+
+@blp_results.route("/results/<result_id>/top-k", methods=["GET"])
+@blp_results.arguments(QueryResultTopKSchema, location="query")
+@blp_results.response(200, QueryResultCountsResponseSchema)
+def query_top_k(query: dict, result_id):
+    """Get the k outcomes with the largest absolute probability, a limited number at once."""
+    max_size = current_app.config["RESULT_SLICE_MAX_SIZE"]
+    if query["k"] > max_size:
+        abort(400, message=f"At most {max_size} outcomes can be queried at once")
+    array = _load(result_id)
+    indices, values = result_store.top_k(
+        array, query["k"], current_app.config["RECONSTRUCTION_MAX_CHUNK_SIZE"]
+    )
+    return QueryResultResponse(
+        result_id,
+        result_store.to_counts(array, indices, values),
+        result_store.num_qubits_of(array),
+    )
+
+
+@blp_results.route("/results/<result_id>/sparse", methods=["GET"])
+@blp_results.arguments(QueryResultSparseSchema, location="query")
+@blp_results.response(200, QueryResultCountsResponseSchema)
+def query_sparse(query: dict, result_id):
+    """Get the outcomes whose absolute probability is at least min_abs_probability, a limited number at once."""
+    array = _load(result_id)
+    try:
+        indices, values = result_store.threshold(
+            array,
+            query["min_abs_probability"],
+            current_app.config["RECONSTRUCTION_MAX_CHUNK_SIZE"],
+            max_count=current_app.config["RESULT_SLICE_MAX_SIZE"],
+        )
+    except ValueError as e:
+        abort(400, message=f"{e}, raise min_abs_probability")
+    return QueryResultResponse(
+        result_id,
+        result_store.to_counts(array, indices, values),
+        result_store.num_qubits_of(array),
+    )
+
+
+@blp_results.route("/results/<result_id>/marginal", methods=["GET"])
+@blp_results.arguments(QueryResultMarginalSchema, location="query")
+@blp_results.response(200, QueryResultArrayResponseSchema)
+def query_marginal(query: dict, result_id):
+    """Get the marginal distribution of the given qubits, bit j of an index belongs to qubits[j]."""
+    array = _load(result_id)
+    try:
+        result = result_store.marginal(
+            array, query["qubits"], current_app.config["RECONSTRUCTION_MAX_CHUNK_SIZE"]
+        )
+    except ValueError as e:
+        abort(422, message=str(e))
+    return QueryResultResponse(
+        result_id, result, result_store.num_qubits_of(array), qubits=query["qubits"]
+    )
+
+
+@blp_results.route("/results/<result_id>", methods=["DELETE"])
+@blp_results.response(204)
+def delete_result(result_id):
+    """Delete a persisted distribution."""
+    try:
+        current_app.extensions["result_store"].delete(result_id)
+    except KeyError:
+        abort(404, message=f"There is no result with result_id {result_id}")
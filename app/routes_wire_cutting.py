@@ -17,9 +17,11 @@
 #  limitations under the License.
 # ******************************************************************************
 
+from flask import current_app
 from flask_smorest import Blueprint
 
 from app import wire_cutter
+from app.binary_format import BinaryArgumentsParser
 from app.model.request_combine_results import (
     CombineResultsRequestSchema,
     CombineResultsRequest,
@@ -32,12 +34,15 @@ from app.model.response_combine_results import (
     CombineResultsResponseQuokkaSchema,
 )
 from app.model.response_cut_circuits import CutCircuitsResponseSchema
+from app.streaming import stream_result
 
 blp = Blueprint(
     "wire-cutting",
     __name__,
     description="Use wire-cutting to cut a quantum circuit",
 )
+# the subcircuit results of /combineResults can be sent as .npy files in a multipart request
+blp.ARGUMENTS_PARSER = BinaryArgumentsParser()
 
 
 @blp.route("/cutCircuits", methods=["POST"])
@@ -56,7 +61,12 @@ blp = Blueprint(
 def cut_circuit(json: dict):
     """Execute a given quantum circuit on a specified quantum computer."""
     print("request", json)
-    result = wire_cutter.cut_circuit(CutCircuitsRequest(**json))
+    result = wire_cutter.cut_circuit(
+        CutCircuitsRequest(**json),
+        cut_cache=current_app.extensions["cut_cache"],
+        cut_result_cache=current_app.extensions["cut_result_cache"],
+        num_workers=current_app.config["CUT_SEARCH_WORKERS"],
+    )
     print("result", result)
     return result
 
@@ -769,7 +779,17 @@ def cut_circuit(json: dict):
 def combine_results(json: dict):
     """Execute a given quantum circuit on a specified quantum computer."""
     print("request combine", json)
-    return wire_cutter.reconstruct_result(CombineResultsRequest(**json))
+    input_dict = CombineResultsRequest(**json)
+    result = wire_cutter.reconstruct_result(
+        input_dict,
+        max_chunk_size=current_app.config["RECONSTRUCTION_MAX_CHUNK_SIZE"],
+        executor=current_app.extensions["reconstruction_pool"],
+        cut_cache=current_app.extensions["cut_cache"],
+        result_store=current_app.extensions["result_store"],
+    )
+    return stream_result(
+        result, input_dict.stream, current_app.config["RESPONSE_CHUNK_SIZE"]
+    )
 
 
 @blp.route("/combineResultsQuokka", methods=["POST"])
@@ -1457,6 +1477,15 @@ def combine_results(json: dict):
 def combine_results_quokka(json: dict):
     """Execute a given quantum circuit on a specified quantum computer."""
     print("request combinequokka", json)
-    return wire_cutter.reconstruct_result(
-        CombineResultsRequest(**json), quokka_format=True
+    input_dict = CombineResultsRequest(**json)
+    result = wire_cutter.reconstruct_result(
+        input_dict,
+        quokka_format=True,
+        max_chunk_size=current_app.config["RECONSTRUCTION_MAX_CHUNK_SIZE"],
+        executor=current_app.extensions["reconstruction_pool"],
+        cut_cache=current_app.extensions["cut_cache"],
+        result_store=current_app.extensions["result_store"],
+    )
+    return stream_result(
+        result, input_dict.stream, current_app.config["RESPONSE_CHUNK_SIZE"]
     )
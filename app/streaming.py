@@ -0,0 +1,101 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import io
+import itertools
+import json
+
+import numpy as np
+from flask import Response
+
+from app.model.response_combine_results import CombineResultsResponse
+
+# Formats in which a reconstructed distribution can be streamed
+STREAM_FORMATS = ("json", "npy")
+
+
+def _iter_json_array(array: np.ndarray, chunk_size: int):
+    yield '{"result": ['
+    for start in range(0, len(array), chunk_size):
+        if start > 0:
+            yield ", "
+        yield json.dumps(array[start : start + chunk_size].tolist())[1:-1]
+    yield "]}"
+
+
+def _iter_json_dict(result: dict, chunk_size: int):
+    yield '{"result": {'
+    items = iter(result.items())
+    first = True
+    while True:
+        chunk = dict(itertools.islice(items, chunk_size))
+        if not chunk:
+            break
+        if not first:
+            yield ", "
+        yield json.dumps(chunk)[1:-1]
+        first = False
+    yield "}}"
+
+
+def _iter_npy(array: np.ndarray, chunk_size: int):
+    array = np.ascontiguousarray(array)
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, np.lib.format.header_data_from_array_1_0(array)
+    )
+    yield header.getvalue()
+    for start in range(0, len(array), chunk_size):
+        yield array[start : start + chunk_size].tobytes()
+
+
+def stream_result(response: CombineResultsResponse, stream_format, chunk_size: int):
+    """
+    Stream a reconstructed distribution in chunks instead of serializing it at once
+
+    Only ``chunk_size`` entries are converted at a time, so the memory needed by the response does not
+    depend on the size of the distribution. In the "json" format, the body has the same structure as the
+    serialized response. In the "npy" format, the body is a NumPy ``.npy`` file of the dense array.
+    Pruned results, given as pairs of outcome indices and probabilities, are returned unchanged.
+
+    Args:
+        response: The response of the reconstruction
+        stream_format: "json", "npy" or None to return the response unchanged
+        chunk_size: The number of entries converted at a time
+
+    Returns:
+        A streamed response or the given response, if nothing has to be streamed
+    """
+    if stream_format is None or response.result is None or response.indices is not None:
+        return response
+
+    result = response.result
+    if stream_format == "npy":
+        if isinstance(result, dict):
+            raise ValueError("The npy format requires a probability array result")
+        return Response(
+            _iter_npy(result, chunk_size),
+            mimetype="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=result.npy"},
+        )
+    if isinstance(result, dict):
+        return Response(
+            _iter_json_dict(result, chunk_size), mimetype="application/json"
+        )
+    return Response(_iter_json_array(result, chunk_size), mimetype="application/json")
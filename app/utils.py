@@ -17,40 +17,317 @@
 #  limitations under the License.
 # ******************************************************************************
 
-from typing import Dict
+import itertools
+import math
+import multiprocessing as mp
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
 
 import numpy as np
 from qiskit.primitives import SamplerResult
 
+# Default number of entries of a partial Cartesian product that are materialized at once
+DEFAULT_MAX_CHUNK_SIZE = 2 ** 22
+
+# Floating-point types a reconstruction can be carried out in
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+# Number of parts the work of a parallel reconstruction is split into, independent of the number of
+# workers so that the result does not depend on it
+PARALLEL_NUM_PARTS = 64
+
+
+def create_process_pool(num_workers: int):
+    """
+    Create a pool of worker processes to be reused by all reconstructions of the app
+
+    The workers are started on first use and kept alive, so the imports of a spawned process are only
+    paid once per worker instead of once per request.
+
+    Args:
+        num_workers: The number of worker processes
+
+    Returns:
+        The pool, or None if ``num_workers`` is 1 and the reconstructions run in the request process
+    """
+    if num_workers <= 1:
+        return None
+    # spawn, as forking a process with running threads is unsafe
+    return ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=mp.get_context("spawn")
+    )
+
 
 def array_to_counts(array: np.ndarray) -> Dict:
     bit_length = int(np.log2(len(array)))
-    format_str = "{0:0" + str(bit_length) + "b}"
-    return {format_str.format(i): v for i, v in enumerate(array) if v != 0}
-
-
-def counts_to_array(counts_dict: Dict, n_qubits: int) -> np.ndarray:
-    array = np.zeros(2 ** n_qubits)
-    for key, value in counts_dict.items():
-        if isinstance(key, int):
-            pass
-        elif isinstance(key, str):
-            if key.startswith("0x"):
-                key = int(key, 16)
-            elif key.startswith("0") or key.startswith("1"):
-                key = int(key, 2)
+    indices = np.flatnonzero(array)
+    return dict(
+        zip(indices_to_bitstrings(indices, bit_length), array[indices].tolist())
+    )
+
+
+def indices_to_bitstrings(indices: np.ndarray, num_bits: int) -> List[str]:
+    """
+    Format integer outcomes as zero-padded bitstrings
+
+    Args:
+        indices: Array of non-negative integers
+        num_bits: The length of the bitstrings
+
+    Returns:
+        The list of bitstrings, most significant bit first
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if num_bits == 0:
+        return ["" for _ in range(len(indices))]
+    shifts = np.arange(num_bits - 1, -1, -1, dtype=np.int64)
+    chars = (((indices[:, None] >> shifts) & 1) + ord("0")).astype(np.uint8)
+    return chars.view(f"S{num_bits}").ravel().astype(str).tolist()
+
+
+def counts_to_array(counts_dict: Dict, n_qubits: int, dtype=np.float64) -> np.ndarray:
+    array = np.zeros(2 ** n_qubits, dtype=dtype)
+    indices, values = counts_to_indices(counts_dict)
+    array[indices] = values
+    return array
+
+
+# Digit value of every ASCII character, -1 for characters that are no hexadecimal digit
+_DIGIT_VALUES = np.full(256, -1, dtype=np.int64)
+_DIGIT_VALUES[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+_DIGIT_VALUES[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+_DIGIT_VALUES[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+
+# Number of bits encoded by a digit of the bases of the string keys
+_BITS_PER_DIGIT = {2: 1, 16: 4}
+
+
+def counts_to_indices(counts_dict: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode all keys of a counts dictionary at once
+
+    Keys can be integers, bitstrings or hexadecimal strings starting with "0x". All string keys are
+    viewed as one byte matrix, grouped by their base and length, and each group is converted by a
+    single product with the powers of its base.
+
+    Args:
+        counts_dict: Dictionary mapping outcomes to counts or probabilities
+
+    Returns:
+        A tuple of the integer outcomes and the corresponding values, in the order of the dictionary
+    """
+    values = np.fromiter(counts_dict.values(), dtype=np.float64, count=len(counts_dict))
+    keys = list(counts_dict.keys())
+    if all(isinstance(key, str) for key in keys):
+        return _bitstrings_to_indices(keys), values
+
+    indices = np.zeros(len(keys), dtype=np.int64)
+    is_str = np.fromiter(
+        (isinstance(key, str) for key in keys), dtype=bool, count=len(keys)
+    )
+    for position in np.flatnonzero(~is_str):
+        if not isinstance(keys[position], (int, np.integer)):
+            raise TypeError("Type has to be either integer or string")
+    indices[~is_str] = [key for key in keys if not isinstance(key, str)]
+    if is_str.any():
+        indices[is_str] = _bitstrings_to_indices(
+            [key for key in keys if isinstance(key, str)]
+        )
+    return indices, values
+
+
+def _bitstrings_to_indices(keys: List[str]) -> np.ndarray:
+    if any(" " in key for key in keys):
+        keys = [key.replace(" ", "") for key in keys]
+    lengths = np.fromiter(map(len, keys), dtype=np.int64, count=len(keys))
+
+    indices = np.zeros(len(keys), dtype=np.int64)
+    for length in np.unique(lengths):
+        group = np.flatnonzero(lengths == length)
+        if len(group) == len(keys):
+            joined = "".join(keys)
+        else:
+            joined = "".join([keys[position] for position in group])
+        if length == 0 or not joined.isascii():
+            raise ValueError("String could not be decoded")
+        chars = np.frombuffer(joined.encode("ascii"), dtype=np.uint8).reshape(
+            len(group), length
+        )
+
+        is_hex = np.zeros(len(group), dtype=bool)
+        is_prefixed_bin = np.zeros(len(group), dtype=bool)
+        if length > 2:
+            is_hex = (chars[:, 0] == ord("0")) & (chars[:, 1] == ord("x"))
+            is_prefixed_bin = (chars[:, 0] == ord("0")) & (chars[:, 1] == ord("b"))
+        is_bin = ~(is_hex | is_prefixed_bin)
+
+        for base, offset, mask in (
+            (2, 0, is_bin),
+            (2, 2, is_prefixed_bin),
+            (16, 2, is_hex),
+        ):
+            if not mask.any():
+                continue
+            digits = chars[mask, offset:] if not mask.all() else chars[:, offset:]
+            if base == 2:
+                # characters below "0" wrap around to large values
+                digits = digits - np.uint8(ord("0"))
             else:
+                digits = _DIGIT_VALUES[digits]
+            if (digits >= base).any() or (base == 16 and (digits < 0).any()):
                 raise ValueError("String could not be decoded")
-        else:
-            raise TypeError("Type has to be either integer or string")
-        array[key] = value
-    return array
+            if (length - offset) * _BITS_PER_DIGIT[base] <= 63:
+                powers = base ** np.arange(length - offset - 1, -1, -1, dtype=np.int64)
+                indices[group[mask]] = digits @ powers
+                continue
+            # the product would overflow int64, so wide keys are decoded one by one
+            wide = [
+                int(row.tobytes(), base)
+                for row in (
+                    chars[mask, offset:] if not mask.all() else chars[:, offset:]
+                )
+            ]
+            if max(wide) >= 2 ** 63:
+                raise ValueError("Outcomes of more than 63 bits cannot be decoded")
+            indices[group[mask]] = wide
+    return indices
+
+
+def merge_sparse(
+    indices_list: Sequence[np.ndarray], values_list: Sequence[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate sparse vectors and add up the values of duplicate indices
+
+    Args:
+        indices_list: The index arrays of the sparse vectors
+        values_list: The corresponding value arrays
+
+    Returns:
+        A tuple of the sorted unique indices and the summed values
+    """
+    indices, inverse = np.unique(np.concatenate(indices_list), return_inverse=True)
+    values = np.bincount(
+        inverse, weights=np.concatenate(values_list), minlength=len(indices)
+    )
+    return indices, values
 
 
 def normalize_array(array: np.ndarray) -> np.ndarray:
     return array / np.sum(array)
 
 
+def split_evenly(num_items: int, num_parts: int) -> List[range]:
+    """
+    Split a number of items into contiguous parts whose sizes differ by at most one
+
+    Args:
+        num_items: The number of items
+        num_parts: The maximum number of parts
+
+    Returns:
+        The non-empty ranges of the parts in ascending order
+    """
+    count, remainder = divmod(num_items, num_parts)
+    parts = []
+    start = 0
+    for rank in range(num_parts):
+        stop = start + count + (1 if rank < remainder else 0)
+        if stop > start:
+            parts.append(range(start, stop))
+        start = stop
+    return parts
+
+
+class CompensatedSum:
+    """
+    Neumaier summation of arrays
+
+    The rounding error of every addition is accumulated in a separate array and added to the total in
+    the end, so the error of the sum does not grow with the number of summands. This keeps float32
+    accumulations about as accurate as their individual summands.
+    """
+
+    def __init__(self):
+        self._total = None
+        self._compensation = None
+
+    def add(self, value: np.ndarray):
+        if self._total is None:
+            self._total = np.array(value)
+            self._compensation = np.zeros_like(self._total)
+            return
+        total = self._total + value
+        self._compensation += np.where(
+            np.abs(self._total) >= np.abs(value),
+            (self._total - total) + value,
+            (value - total) + self._total,
+        )
+        self._total = total
+
+    @property
+    def result(self) -> np.ndarray:
+        if self._total is None:
+            return None
+        return self._total + self._compensation
+
+
+def parallel_sum(
+    func,
+    args_list: Sequence[tuple],
+    executor=None,
+    compensated: bool = False,
+    out: np.ndarray = None,
+):
+    """
+    Evaluate a function for every argument tuple in a process pool and sum up the partial results
+
+    The partial results are added in the order of ``args_list``, so the result is reproducible
+    regardless of the number of workers and the order in which the workers finish.
+
+    Args:
+        func: Picklable function returning an array
+        args_list: The argument tuples of the calls
+        executor: The pool the calls are evaluated in, they are evaluated in the current process if
+            it is None
+        compensated: Whether the partial results are added by :class:`CompensatedSum`
+        out: Array the partial results are added up in, e.g. a memory-mapped file, it is
+            overwritten. The sum is added up in the first partial result if None
+
+    Returns:
+        The sum of all partial results
+
+    Raises:
+        ValueError: If ``args_list`` is empty, as the shape of the sum is unknown then
+    """
+    if not args_list:
+        raise ValueError("There are no partial results to sum up")
+    if executor is None or len(args_list) <= 1:
+        partial_results = itertools.starmap(func, args_list)
+    else:
+        partial_results = executor.map(func, *zip(*args_list))
+
+    if compensated:
+        total = CompensatedSum()
+        for partial_result in partial_results:
+            total.add(partial_result)
+        if out is None:
+            return total.result
+        out[...] = total.result
+        return out
+
+    if out is not None:
+        out[...] = 0
+    result = out
+    for partial_result in partial_results:
+        if result is None:
+            result = partial_result
+        else:
+            result += partial_result
+    return result
+
+
 def sampler_result_to_array_dict(sampler_result: SamplerResult):
     result_array_dict = {}
     for idx, exp in enumerate(sampler_result.experiments):
@@ -80,21 +357,185 @@ def shift_bits_by_index(num, idx_list):
     return new_num << prev_index
 
 
-def product_dicts(*dicts):
-    # Base case: If there is only one dictionary, convert its values to lists
-    if len(dicts) == 1:
-        return {(key,): [value] for key, value in dicts[0].items()}
+def accumulate_product_dicts(
+    result_dict, *dicts, weight=1.0, max_chunk_size=DEFAULT_MAX_CHUNK_SIZE
+):
+    """
+    Fold the Cartesian product of the dictionaries into result_dict without materializing it.
+
+    For every combination of one item per dictionary, the sum of the keys is used as key of
+    result_dict and weight times the product of the values is added to it. The product of the
+    leading dictionaries is materialized as long as it does not exceed max_chunk_size entries,
+    the remaining dictionaries are iterated lazily.
+
+    Args:
+        result_dict: The dictionary the products are accumulated in, e.g. a defaultdict(float)
+        dicts: The dictionaries to build the product of
+        weight: Factor applied to every product
+        max_chunk_size: Maximum number of combinations held in memory at once
+
+    Returns:
+        The updated result_dict
+    """
+    if len(dicts) == 0:
+        return result_dict
+
+    chunk = list(dicts[0].items())
+    split = 1
+    while split < len(dicts) and len(chunk) * len(dicts[split]) <= max_chunk_size:
+        chunk = [
+            (chunk_key + key, chunk_val * val)
+            for chunk_key, chunk_val in chunk
+            for key, val in dicts[split].items()
+        ]
+        split += 1
+
+    for outer in itertools.product(*[d.items() for d in dicts[split:]]):
+        outer_key = sum(key for key, _ in outer)
+        outer_val = math.prod(val for _, val in outer)
+        for chunk_key, chunk_val in chunk:
+            result_dict[chunk_key + outer_key] += weight * (chunk_val * outer_val)
+
+    return result_dict
+
+
+def reorder_qubit_axes(
+    vector: np.ndarray, axis_qubits: Sequence[int], out: np.ndarray = None
+) -> np.ndarray:
+    """
+    Reorder a dense vector over qubits in an arbitrary order to the global outcome order
+
+    Args:
+        vector: Dense vector whose index bits belong to the qubits in axis_qubits, the first qubit
+            being the most significant bit
+        axis_qubits: The qubit of every index bit
+        out: Vector the result is written to, e.g. a memory-mapped file, a new one if None
+
+    Returns:
+        The dense vector indexed by the global outcome, qubit i being bit i
+    """
+    # merge neighbouring axes whose qubits are neighbours in the global order as well
+    runs = []
+    for qubit in axis_qubits:
+        if runs and runs[-1][0] - runs[-1][1] == qubit:
+            runs[-1][1] += 1
+        else:
+            runs.append([qubit, 1])
+    shape = [2 ** length for _, length in runs]
+    order = sorted(range(len(runs)), key=lambda i: runs[i][0], reverse=True)
+    reordered = vector.reshape(shape).transpose(order)
+    if out is None:
+        return reordered.ravel()
+    np.copyto(out.reshape(reordered.shape), reordered)
+    return out
+
+
+class ScatterPlan:
+    """
+    Precomputed mapping of the local outcomes of each partition to indices of the global outcome
+
+    The global qubit positions of the local qubits of a partition are given by the positions of its
+    label in partition_labels. For every chunk of chunk_bits local bits, a lookup table holds the
+    scattered global bits of all values of the chunk, so that mapping an outcome only requires one
+    lookup per chunk. The global index of a combination of partition outcomes is the bitwise OR of
+    their scattered indices.
+    """
+
+    def __init__(self, partition_labels: str, chunk_bits: int = 8):
+        self.partition_labels = partition_labels
+        self.num_qubits = len(partition_labels)
+        self.labels = sorted({*partition_labels})
+        self.num_local_qubits = Counter(partition_labels)
+        self.chunk_bits = chunk_bits
+        self._chunk_mask = (1 << chunk_bits) - 1
+        self.index_lists = {
+            label: list(find_character_in_string(partition_labels, label))
+            for label in self.labels
+        }
+        self._tables = {
+            label: self._build_tables(self.index_lists[label]) for label in self.labels
+        }
+        self._table_lists = {
+            label: [table.tolist() for table in tables]
+            for label, tables in self._tables.items()
+        }
+
+    def _build_tables(self, index_list: Sequence[int]) -> List[np.ndarray]:
+        tables = []
+        for start in range(0, len(index_list), self.chunk_bits):
+            chunk_index_list = index_list[start : start + self.chunk_bits]
+            chunk_values = np.arange(2 ** len(chunk_index_list), dtype=np.int64)
+            table = np.zeros(len(chunk_values), dtype=np.int64)
+            for bit, global_idx in enumerate(chunk_index_list):
+                table |= ((chunk_values >> bit) & 1) << global_idx
+            tables.append(table)
+        return tables
+
+    def scatter(self, label, local_outcomes: np.ndarray) -> np.ndarray:
+        """
+        Map an array of local outcomes of a partition to indices of the global outcome
+
+        Args:
+            label: The label of the partition
+            local_outcomes: Array of measurement outcomes of the partition
+
+        Returns:
+            Array of global outcome indices with all bits of other partitions set to zero
+        """
+        local_outcomes = np.asarray(local_outcomes, dtype=np.int64)
+        global_outcomes = np.zeros(local_outcomes.shape, dtype=np.int64)
+        for i, table in enumerate(self._tables[label]):
+            global_outcomes |= table[
+                (local_outcomes >> (i * self.chunk_bits)) & self._chunk_mask
+            ]
+        return global_outcomes
+
+    def scatter_int(self, label, local_outcome: int) -> int:
+        """
+        Map a single local outcome of a partition to an index of the global outcome
+
+        Args:
+            label: The label of the partition
+            local_outcome: Measurement outcome of the partition
+
+        Returns:
+            The global outcome index with all bits of other partitions set to zero
+        """
+        global_outcome = 0
+        for i, table in enumerate(self._table_lists[label]):
+            global_outcome |= table[
+                (local_outcome >> (i * self.chunk_bits)) & self._chunk_mask
+            ]
+        return global_outcome
+
+    def kron_to_global(
+        self, vector: np.ndarray, label_order: Sequence, out: np.ndarray = None
+    ) -> np.ndarray:
+        """
+        Reorder a dense vector from the Kronecker order of the partitions to the global outcome order
+
+        Args:
+            vector: Dense vector indexed by the concatenated local outcomes of the partitions,
+                the outcome of the first partition in label_order being the most significant
+            label_order: The order of the partitions in the Kronecker product
+            out: Vector the result is written to, a new one if None
+
+        Returns:
+            The dense vector indexed by the global outcome
+        """
+        axis_qubits = []
+        for label in label_order:
+            axis_qubits += reversed(self.index_lists[label])
+        return reorder_qubit_axes(vector, axis_qubits, out=out)
 
-    # Recursive case: Compute the product of n-1 dictionaries
-    dicts_except_last = dicts[:-1]
-    product_except_last = product_dicts(*dicts_except_last)
+    def to_bitstrings(self, global_outcomes: np.ndarray) -> List[str]:
+        """
+        Format global outcome indices as bitstrings of the full circuit width
 
-    # Get the last dictionary
-    last_dict = dicts[-1]
+        Args:
+            global_outcomes: Array of global outcome indices
 
-    # Compute the product of the last dictionary with the result from the previous step using dictionary comprehensions
-    return {
-        (*prod_key, key): prod_val + [val]
-        for prod_key, prod_val in product_except_last.items()
-        for key, val in last_dict.items()
-    }
+        Returns:
+            The list of bitstrings
+        """
+        return indices_to_bitstrings(global_outcomes, self.num_qubits)
@@ -0,0 +1,449 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import math
+import multiprocessing as mp
+import queue
+import time
+
+from circuit_knitting.cutting.cutqc.wire_cutting import (
+    _circuit_stripping,
+    _cost_estimate,
+    _cuts_parser,
+    _get_counter,
+    _get_pairs,
+    _read_circuit,
+    _subcircuits_parser,
+)
+
+from app.partition import partition_graph
+from app.wire_cut_solvers import SOLVERS
+
+# Time limit of each MIP solve in seconds if the search has no time limit, as hardcoded in
+# circuit-knitting-toolbox
+DEFAULT_SOLVER_TIME_LIMIT = 300
+
+OPTIMAL = "optimal"
+FEASIBLE = "feasible"
+
+# Quantities of a cut that can be minimized by the search over the numbers of subcircuits
+OBJECTIVES = ("classical_cost", "num_instances", "num_cuts")
+
+# Imbalances of the subcircuit sizes and seeds tried by the heuristic for every number of subcircuits
+HEURISTIC_EPSILONS = (0.03, 0.1, 0.3, 0.6)
+HEURISTIC_SEEDS = (0, 1)
+
+# Time a worker gets past the deadline to report the incumbent of its solver before it is killed
+_WORKER_GRACE_PERIOD = 10
+
+
+def _read_cut_graph(circuit):
+    n_vertices, edges, vertex_ids, id_vertices = _read_circuit(
+        circuit=_circuit_stripping(circuit=circuit)
+    )
+    return {
+        "n_vertices": n_vertices,
+        "edges": edges,
+        "vertex_ids": vertex_ids,
+        "id_vertices": id_vertices,
+    }
+
+
+def _num_components(graph) -> int:
+    parents = list(range(graph["n_vertices"]))
+
+    def find(v):
+        while parents[v] != v:
+            parents[v] = parents[parents[v]]
+            v = parents[v]
+        return v
+
+    for u, v in graph["edges"]:
+        parents[find(u)] = find(v)
+    return sum(1 for v in range(graph["n_vertices"]) if find(v) == v)
+
+
+def _solve_in_worker(results, solver, *args):
+    try:
+        results.put((args[1], SOLVERS[solver](*args), None))
+    except Exception as e:
+        results.put((args[1], None, e))
+
+
+def _cut_solution(circuit, max_subcircuit_width, result):
+    positions = _cuts_parser(result["cut_edges"], circuit)
+    subcircuits, complete_path_map = _subcircuits_parser(
+        subcircuit_gates=result["subcircuit_gates"], circuit=circuit
+    )
+    counter = _get_counter(
+        subcircuits=subcircuits,
+        O_rho_pairs=_get_pairs(complete_path_map=complete_path_map),
+    )
+    return {
+        "max_subcircuit_width": max_subcircuit_width,
+        "subcircuits": subcircuits,
+        "complete_path_map": complete_path_map,
+        "num_cuts": len(positions),
+        "counter": counter,
+        "classical_cost": _cost_estimate(counter=counter),
+        "mip_gap": result["mip_gap"],
+    }
+
+
+def objective_value(cut_solution, objective: str):
+    """
+    Evaluate the objective of the search for a cut
+
+    Args:
+        cut_solution: The cut as returned by :func:`find_wire_cuts`
+        objective: "classical_cost", the estimated cost of the reconstruction, "num_instances", the
+            number of subcircuit instances to execute, or "num_cuts"
+    """
+    if objective == "num_instances":
+        return sum(
+            4 ** c["rho"] * 3 ** c["O"] for c in cut_solution["counter"].values()
+        )
+    return cut_solution[objective]
+
+
+def _lower_bound(num_subcircuit, num_qubits, num_components, objective):
+    """
+    Lower bound of the objective of any cut into ``num_subcircuit`` non-empty subcircuits
+
+    Each subcircuit beyond the number of connected components of the circuit requires a cut. The
+    effective qubits of the subcircuits add up to the width of the circuit, so the largest
+    Kronecker product of the reconstruction has ``2 ** num_qubits`` entries. A single subcircuit
+    needs no reconstruction, its classical cost is zero.
+
+    Every subcircuit has at least one instance. A cut measures a qubit of one subcircuit, which then
+    has at least three instances, and initializes a qubit of another one, which then has at least
+    four. If the circuit is connected and cut, every subcircuit has a cut qubit, so all but the
+    initializing one have at least three instances.
+    """
+    min_cuts = max(num_subcircuit - num_components, 0)
+    if objective == "classical_cost":
+        return 0 if num_subcircuit == 1 else 4 ** min_cuts * 2 ** num_qubits
+    if objective == "num_instances":
+        if min_cuts == 0:
+            return num_subcircuit
+        if num_components == 1:
+            return 3 * (num_subcircuit - 1) + 4
+        return (num_subcircuit - 2) + 3 + 4
+    return min_cuts
+
+
+def find_wire_cuts(
+    circuit,
+    max_subcircuit_width: int,
+    max_cuts: int,
+    num_subcircuits,
+    time_limit: float = None,
+    mip_gap: float = None,
+    objective: str = "classical_cost",
+    num_workers: int = 1,
+    solver: str = "cplex",
+    warm_start: bool = False,
+):
+    """
+    Find the wire cuts minimizing an objective over the given numbers of subcircuits
+
+    Like ``find_wire_cuts`` of circuit-knitting-toolbox, one MIP is solved for each number of
+    subcircuits, by CPLEX or HiGHS. A time limit applies to the whole search: if it is reached, the
+    best cut found so far is returned. Without a time limit, each MIP is solved for at most
+    :data:`DEFAULT_SOLVER_TIME_LIMIT` seconds like in circuit-knitting-toolbox. If ``num_workers`` is larger than one, the MIPs are solved in parallel
+    worker processes, and workers solving numbers of subcircuits that provably cannot improve on
+    the best cut found so far are stopped. Ties are broken in favor of fewer subcircuits, so the
+    result does not depend on the number of workers.
+
+    Args:
+        circuit: The circuit to cut
+        max_subcircuit_width: The maximum number of qubits of a subcircuit
+        max_cuts: The maximum number of cuts
+        num_subcircuits: The numbers of subcircuits to try
+        time_limit: The time limit of the search in seconds, or None to limit each MIP solve to
+            :data:`DEFAULT_SOLVER_TIME_LIMIT` seconds
+        mip_gap: The relative gap at which a solution is accepted as optimal, the solver's default
+            if None
+        objective: The objective as accepted by :func:`objective_value`
+        num_workers: The maximum number of MIPs solved in parallel
+        solver: The name of the MIP solver in :data:`SOLVERS`
+        warm_start: Whether to start the solver from a KaHyPar partition of the circuit, which is
+            then returned if the solver finds no better cut within the time limit
+
+    Returns:
+        The cut solution as returned by ``cut_circuit_wires`` with the additional keys
+        "solver_status", which is "optimal" if the cut is proven to be optimal within the gap and
+        "feasible" otherwise, and "mip_gap", the relative gap of the returned cut. It is empty if
+        no cut was found.
+    """
+    deadline = math.inf if time_limit is None else time.monotonic() + time_limit
+    graph = _read_cut_graph(circuit)
+    num_qubits = circuit.num_qubits
+    num_components = _num_components(graph)
+    candidates = [
+        num_subcircuit
+        for num_subcircuit in sorted(set(num_subcircuits))
+        if num_subcircuit * max_subcircuit_width - (num_subcircuit - 1) >= num_qubits
+        and num_subcircuit <= num_qubits
+        and max_cuts + 1 >= num_subcircuit
+    ]
+
+    best = None
+    proven = True
+
+    def dominated(num_subcircuit):
+        return (
+            best is not None
+            and (
+                _lower_bound(num_subcircuit, num_qubits, num_components, objective),
+                num_subcircuit,
+            )
+            >= (best[0], best[1])
+        )
+
+    def add_result(result):
+        nonlocal best, proven
+        proven = proven and not result["timed_out"]
+        if result["cut_edges"] is None:
+            return
+        cut_solution = _cut_solution(circuit, max_subcircuit_width, result)
+        key = (objective_value(cut_solution, objective), result["num_subcircuit"])
+        if best is None or key < (best[0], best[1]):
+            best = (*key, cut_solution)
+
+    def solve_time_limit():
+        if time_limit is None:
+            return DEFAULT_SOLVER_TIME_LIMIT
+        return deadline - time.monotonic()
+
+    def solve_args(num_subcircuit):
+        return (
+            graph,
+            num_subcircuit,
+            max_subcircuit_width,
+            max_cuts,
+            num_qubits,
+            solve_time_limit(),
+            mip_gap,
+            _warm_start(graph, num_subcircuit, max_subcircuit_width, max_cuts)
+            if warm_start
+            else None,
+        )
+
+    if num_workers <= 1 or len(candidates) <= 1:
+        for num_subcircuit in candidates:
+            if dominated(num_subcircuit):
+                continue
+            if time.monotonic() >= deadline:
+                proven = False
+                break
+            add_result(SOLVERS[solver](*solve_args(num_subcircuit)))
+    else:
+        # spawn, as forking a process with running threads is unsafe
+        context = mp.get_context("spawn")
+        results = context.Queue()
+        pending = list(candidates)
+        running = {}
+        # time by which each running worker has to report its result
+        worker_deadlines = {}
+        try:
+            while pending or running:
+                while pending and len(running) < num_workers:
+                    num_subcircuit = pending.pop(0)
+                    if dominated(num_subcircuit):
+                        continue
+                    args = solve_args(num_subcircuit)
+                    worker = context.Process(
+                        target=_solve_in_worker,
+                        args=(results, solver, *args),
+                        daemon=True,
+                    )
+                    worker.start()
+                    running[num_subcircuit] = worker
+                    worker_deadlines[num_subcircuit] = time.monotonic() + args[5]
+                if not running:
+                    break
+                try:
+                    num_subcircuit, result, error = results.get(
+                        timeout=max(
+                            min(worker_deadlines[n] for n in running)
+                            - time.monotonic(),
+                            0,
+                        )
+                        + _WORKER_GRACE_PERIOD
+                    )
+                except queue.Empty:
+                    proven = False
+                    break
+                running.pop(num_subcircuit).join()
+                if error is not None:
+                    raise error
+                add_result(result)
+                for num_subcircuit in [n for n in running if dominated(n)]:
+                    worker = running.pop(num_subcircuit)
+                    worker.terminate()
+                    worker.join()
+        finally:
+            for worker in running.values():
+                worker.terminate()
+                worker.join()
+            results.close()
+
+    if best is None:
+        return {}
+    cut_solution = best[2]
+    cut_solution["solver_status"] = OPTIMAL if proven else FEASIBLE
+    return cut_solution
+
+
+def _partitions(graph, num_subcircuit, max_cuts):
+    """
+    Generate the distinct KaHyPar partitions of the cut graph with at most ``max_cuts`` cut edges
+
+    The blocks are numbered in the order of their first vertex, which satisfies the symmetry
+    breaking constraints of the MIP.
+    """
+    if num_subcircuit > graph["n_vertices"]:
+        return
+    seen = set()
+    for epsilon in HEURISTIC_EPSILONS:
+        for seed in HEURISTIC_SEEDS:
+            blocks = partition_graph(
+                graph["n_vertices"], graph["edges"], num_subcircuit, epsilon, seed
+            )
+            labels = {}
+            blocks = tuple(labels.setdefault(block, len(labels)) for block in blocks)
+            # every cut edge of the graph is a cut, so partitions with too many can be skipped
+            num_cut_edges = sum(blocks[u] != blocks[v] for u, v in graph["edges"])
+            if num_cut_edges > max_cuts or blocks in seen:
+                continue
+            seen.add(blocks)
+            yield list(blocks)
+
+
+def _warm_start(graph, num_subcircuit, max_subcircuit_width, max_cuts):
+    """
+    Find a KaHyPar partition that is a feasible solution of the MIP, to start the solver from
+
+    The qubits are counted like in the MIP, on the cut edges of the graph.
+
+    Returns:
+        The block of every vertex of the partition with the fewest cut edges, or None if no
+        partition is feasible
+    """
+    best = None
+    for blocks in _partitions(graph, num_subcircuit, max_cuts):
+        counter = [{"d": 0, "O": 0} for _ in range(num_subcircuit)]
+        for vertex, block in enumerate(blocks):
+            counter[block]["d"] += sum(
+                int(qarg.split("]")[1]) == 0
+                for qarg in graph["id_vertices"][vertex].split(" ")
+            )
+        num_cut_edges = 0
+        for u, v in graph["edges"]:
+            if blocks[u] != blocks[v]:
+                num_cut_edges += 1
+                counter[blocks[u]]["O"] += 1
+                counter[blocks[v]]["d"] += 1
+        if len(set(blocks)) < num_subcircuit or any(
+            max(c.values()) > max_subcircuit_width for c in counter
+        ):
+            continue
+        if best is None or num_cut_edges < best[0]:
+            best = num_cut_edges, blocks
+    return None if best is None else best[1]
+
+
+def _evaluate_partition(circuit, graph, blocks, num_subcircuit):
+    """
+    Evaluate the cut a partition of the cut graph results in
+
+    The cuts and qubits are counted on the subcircuits circuit-knitting-toolbox actually builds,
+    which may differ from the cut edges of the graph, as a wire can pass through a subcircuit
+    several times.
+
+    Returns:
+        A dict with the "counter", "num_cuts", "classical_cost" and the "width" of the widest
+        subcircuit, or None if a subcircuit is empty
+    """
+    subcircuit_gates = [[] for _ in range(num_subcircuit)]
+    for vertex, block in enumerate(blocks):
+        subcircuit_gates[block].append(graph["id_vertices"][vertex])
+    if not all(subcircuit_gates):
+        return None
+    subcircuits, complete_path_map = _subcircuits_parser(
+        subcircuit_gates=subcircuit_gates, circuit=circuit
+    )
+    O_rho_pairs = _get_pairs(complete_path_map=complete_path_map)
+    counter = _get_counter(subcircuits=subcircuits, O_rho_pairs=O_rho_pairs)
+    return {
+        "counter": counter,
+        "num_cuts": len(O_rho_pairs),
+        "classical_cost": _cost_estimate(counter=counter),
+        "width": max(c["d"] for c in counter.values()),
+    }
+
+
+def find_wire_cuts_heuristic(
+    circuit,
+    max_subcircuit_width: int,
+    max_cuts: int,
+    num_subcircuits,
+    objective: str = "classical_cost",
+):
+    """
+    Find wire cuts by partitioning the two-qubit gates of the circuit with KaHyPar
+
+    Partitions minimizing the number of cut wires are computed for every number of subcircuits and
+    several imbalances and seeds. Of those satisfying the width and cut limits, the one with the
+    lowest objective is returned. The result is not necessarily optimal, but is found in a fraction
+    of the time of the MIP.
+
+    Args:
+        circuit: The circuit to cut
+        max_subcircuit_width: The maximum number of qubits of a subcircuit
+        max_cuts: The maximum number of cuts
+        num_subcircuits: The numbers of subcircuits to try
+        objective: The objective as accepted by :func:`objective_value`
+
+    Returns:
+        The subcircuit_vertices for the manual method of ``cut_circuit_wires``, or None if no
+        partition satisfies the limits
+    """
+    graph = _read_cut_graph(circuit)
+    best = None
+    for num_subcircuit in sorted(set(num_subcircuits)):
+        for blocks in _partitions(graph, num_subcircuit, max_cuts):
+            candidate = _evaluate_partition(circuit, graph, blocks, num_subcircuit)
+            if (
+                candidate is None
+                or candidate["width"] > max_subcircuit_width
+                or candidate["num_cuts"] > max_cuts
+            ):
+                continue
+            key = (objective_value(candidate, objective), num_subcircuit)
+            if best is None or key < best[0]:
+                best = key, blocks, num_subcircuit
+    if best is None:
+        return None
+    _, blocks, num_subcircuit = best
+    return [
+        [vertex for vertex, block in enumerate(blocks) if block == i]
+        for i in range(num_subcircuit)
+    ]
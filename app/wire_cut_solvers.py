@@ -0,0 +1,355 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import numpy as np
+import scipy.sparse
+from circuit_knitting.cutting.cutqc.mip_model import MIPModel
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+# Status of scipy.optimize.milp if the time limit was reached
+_MILP_LIMIT_REACHED = 1
+
+
+def _solution(graph, num_subcircuit, vertex_values, edge_values, mip_gap, timed_out):
+    """
+    Read the subcircuits and cut edges from the values of the vertex and edge variables
+
+    Args:
+        graph: The cut graph of the circuit
+        num_subcircuit: The number of subcircuits
+        vertex_values: Array of shape (num_subcircuit, n_vertices) of the vertex variables, or None
+            if no solution was found
+        edge_values: Array of shape (num_subcircuit, n_edges) of the edge variables
+        mip_gap: The relative gap of the solution
+        timed_out: Whether the solver stopped at the time limit
+
+    Returns:
+        The result of a solver as described in :func:`solve_cplex`
+    """
+    result = {
+        "num_subcircuit": num_subcircuit,
+        "subcircuit_gates": None,
+        "cut_edges": None,
+        "mip_gap": mip_gap,
+        "timed_out": timed_out,
+    }
+    if vertex_values is None:
+        return result
+
+    id_vertices = graph["id_vertices"]
+    result["subcircuit_gates"] = [
+        [id_vertices[v] for v in np.flatnonzero(np.abs(values) > 1e-4)]
+        for values in vertex_values
+    ]
+    cut = np.flatnonzero((np.abs(edge_values) > 1e-4).any(axis=0))
+    result["cut_edges"] = [
+        (id_vertices[graph["edges"][e][0]], id_vertices[graph["edges"][e][-1]])
+        for e in cut
+    ]
+    return result
+
+
+def _partition_values(graph, num_subcircuit, blocks):
+    """
+    Compute the values of the vertex and edge variables of a partition of the cut graph
+
+    Returns:
+        The arrays of the vertex and edge variables as read by :func:`_solution`
+    """
+    blocks = np.asarray(blocks)
+    edges = np.array(graph["edges"], dtype=np.int64).reshape(-1, 2)
+    subcircuits = np.arange(num_subcircuit)[:, None]
+    vertex_values = (blocks == subcircuits).astype(float)
+    edge_values = (
+        vertex_values[:, edges[:, 0]] != vertex_values[:, edges[:, 1]]
+    ).astype(float)
+    return vertex_values, edge_values
+
+
+def solve_cplex(
+    graph,
+    num_subcircuit,
+    max_subcircuit_width,
+    max_cuts,
+    num_qubits,
+    time_limit,
+    mip_gap,
+    initial_blocks=None,
+):
+    """
+    Solve the wire-cut MIP for one number of subcircuits with CPLEX
+
+    The model is the ``MIPModel`` of circuit-knitting-toolbox. Unlike ``MIPModel.solve``, the time
+    limit and gap are configurable and no LP file is exported.
+
+    Args:
+        graph: The cut graph of the circuit, i.e., the vertices, edges and their ids as read by
+            ``_read_circuit`` of circuit-knitting-toolbox
+        num_subcircuit: The number of subcircuits
+        max_subcircuit_width: The maximum number of qubits of a subcircuit
+        max_cuts: The maximum number of cuts
+        num_qubits: The number of qubits of the circuit
+        time_limit: The time limit in seconds
+        mip_gap: The relative gap at which the solver stops, the solver's default if None
+        initial_blocks: The subcircuit of every vertex of a feasible solution to start from, or None
+
+    Returns:
+        A dict of the gates of the subcircuits and the cut edges, which are None if no solution was
+        found, the relative gap and whether the solver stopped at the time limit
+    """
+    mip_model = MIPModel(
+        **graph,
+        num_subcircuit=num_subcircuit,
+        max_subcircuit_width=max_subcircuit_width,
+        max_subcircuit_cuts=None,
+        max_subcircuit_size=None,
+        num_qubits=num_qubits,
+        max_cuts=max_cuts,
+    )
+    model = mip_model.model
+    model.set_time_limit(max(time_limit, 0))
+    if mip_gap is not None:
+        model.parameters.mip.tolerances.mipgap = mip_gap
+    if initial_blocks is not None:
+        initial_values = _partition_values(graph, num_subcircuit, initial_blocks)
+        start = model.new_solution()
+        for variables, values in zip(
+            (mip_model.vertex_var, mip_model.edge_var), initial_values
+        ):
+            for row_variables, row_values in zip(variables, values):
+                for var, value in zip(row_variables, row_values):
+                    start.add_var_value(var, value)
+        start.add_var_value(mip_model.num_cuts, initial_values[1].sum() / 2)
+        model.add_mip_start(start)
+    try:
+        solved = model.solve()
+        details = model.solve_details
+        if solved is None and initial_blocks is not None:
+            vertex_values, edge_values = initial_values
+        elif solved is None:
+            vertex_values = edge_values = None
+        else:
+            vertex_values = np.array(
+                [[var.solution_value for var in row] for row in mip_model.vertex_var]
+            )
+            edge_values = np.array(
+                [[var.solution_value for var in row] for row in mip_model.edge_var]
+            )
+        return _solution(
+            graph,
+            num_subcircuit,
+            vertex_values,
+            edge_values,
+            details.mip_relative_gap,
+            "time limit" in details.status,
+        )
+    finally:
+        model.end()
+
+
+class _ConstraintBuilder:
+    """
+    Collects the rows of a sparse constraint matrix, a row being given by equal-length index arrays
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.cols = []
+        self.vals = []
+        self.lb = []
+        self.ub = []
+        self.num_rows = 0
+
+    def add(self, terms, lb, ub):
+        """
+        Add constraints ``lb <= sum(coefficient * variable) <= ub``, one for each entry of the arrays
+
+        Args:
+            terms: List of (coefficient, variable index array) pairs, the arrays have one entry for
+                each constraint
+            lb: The lower bound of the constraints
+            ub: The upper bound of the constraints
+        """
+        num = len(terms[0][1])
+        rows = np.arange(self.num_rows, self.num_rows + num)
+        for coefficient, variables in terms:
+            self.rows.append(rows)
+            self.cols.append(np.asarray(variables))
+            self.vals.append(np.broadcast_to(np.asarray(coefficient, float), (num,)))
+        self.lb.append(np.broadcast_to(np.asarray(lb, float), (num,)))
+        self.ub.append(np.broadcast_to(np.asarray(ub, float), (num,)))
+        self.num_rows += num
+
+    def add_sum(self, variables, coefficients, lb, ub):
+        """
+        Add the single constraint ``lb <= sum(coefficients * variables) <= ub``
+        """
+        variables = np.asarray(variables)
+        self.rows.append(np.full(len(variables), self.num_rows))
+        self.cols.append(variables)
+        self.vals.append(
+            np.broadcast_to(np.asarray(coefficients, float), variables.shape)
+        )
+        self.lb.append([lb])
+        self.ub.append([ub])
+        self.num_rows += 1
+
+    def build(self, num_variables):
+        matrix = scipy.sparse.csr_array(
+            (
+                np.concatenate(self.vals),
+                (np.concatenate(self.rows), np.concatenate(self.cols)),
+            ),
+            shape=(self.num_rows, num_variables),
+        )
+        return LinearConstraint(
+            matrix, np.concatenate(self.lb), np.concatenate(self.ub)
+        )
+
+
+def solve_highs(
+    graph,
+    num_subcircuit,
+    max_subcircuit_width,
+    max_cuts,
+    num_qubits,
+    time_limit,
+    mip_gap,
+    initial_blocks=None,
+):
+    """
+    Solve the wire-cut MIP for one number of subcircuits with HiGHS through ``scipy.optimize.milp``
+
+    The model is the same as the ``MIPModel`` of circuit-knitting-toolbox, with the logical AND of
+    binary variables linearized as ``z <= x``, ``z <= y`` and ``z >= x + y - 1``. HiGHS has no
+    problem size limits.
+
+    Args and returns as for :func:`solve_cplex`.
+    """
+    K = num_subcircuit
+    V = graph["n_vertices"]
+    edges = np.array(graph["edges"], dtype=np.int64).reshape(-1, 2)
+    E = len(edges)
+    id_vertices = graph["id_vertices"]
+    weights = np.array(
+        [
+            sum(int(qarg.split("]")[1]) == 0 for qarg in id_vertices[v].split(" "))
+            for v in range(V)
+        ]
+    )
+
+    # variable indices
+    vertex_var = np.arange(K * V).reshape(K, V)
+    edge_var = K * V + np.arange(K * E).reshape(K, E)
+    rho_product = K * V + K * E + np.arange(K * E).reshape(K, E)
+    O_product = K * V + 2 * K * E + np.arange(K * E).reshape(K, E)
+    num_cuts = K * V + 3 * K * E
+    counters = num_cuts + 1 + np.arange(4 * K).reshape(K, 4)
+    original_input, rho, O, d = counters.T
+    build_cost_exponent = num_cuts + 1 + 4 * K + np.arange(K - 1)
+    num_variables = num_cuts + 1 + 4 * K + K - 1
+
+    lb = np.zeros(num_variables)
+    ub = np.ones(num_variables)
+    ub[num_cuts] = max_cuts
+    if initial_blocks is not None:
+        # scipy.optimize.milp takes no initial solution, so only better ones are searched for
+        initial_values = _partition_values(graph, K, initial_blocks)
+        ub[num_cuts] = min(max_cuts, initial_values[1].sum() / 2)
+    ub[counters] = max_subcircuit_width
+    lb[d] = 1
+    ub[build_cost_exponent] = num_qubits + 2 * max_cuts + 1
+
+    constraints = _ConstraintBuilder()
+    # each vertex in exactly one subcircuit
+    for v in range(V):
+        constraints.add_sum(vertex_var[:, v], 1, 1, 1)
+    # edge_var = vertex_var[u] XOR vertex_var[v]
+    x = edge_var.ravel()
+    u = vertex_var[:, edges[:, 0]].ravel()
+    v = vertex_var[:, edges[:, 1]].ravel()
+    constraints.add([(1, x), (-1, u), (-1, v)], -np.inf, 0)
+    constraints.add([(1, x), (-1, u), (1, v)], 0, np.inf)
+    constraints.add([(1, x), (1, u), (-1, v)], 0, np.inf)
+    constraints.add([(1, x), (1, u), (1, v)], -np.inf, 2)
+    # symmetry breaking, vertex i is in one of the first i + 1 subcircuits
+    for vertex in range(min(K, V)):
+        constraints.add_sum(vertex_var[: vertex + 1, vertex], 1, 1, 1)
+    # every cut edge is counted by the subcircuits at both of its ends
+    constraints.add_sum(
+        np.append(x, num_cuts), np.append(np.full(len(x), 0.5), -1), 0, 0
+    )
+    # products of the edge variables with the variables of their downstream and upstream vertex
+    for product, vertex in ((rho_product.ravel(), v), (O_product.ravel(), u)):
+        constraints.add([(1, product), (-1, x)], -np.inf, 0)
+        constraints.add([(1, product), (-1, vertex)], -np.inf, 0)
+        constraints.add([(1, product), (-1, x), (-1, vertex)], -1, np.inf)
+    effective = []
+    for i in range(K):
+        constraints.add_sum(
+            np.append(vertex_var[i], original_input[i]), np.append(weights, -1), 0, 0
+        )
+        constraints.add_sum(
+            np.append(rho_product[i], rho[i]), np.append(np.ones(E), -1), 0, 0
+        )
+        constraints.add_sum(
+            np.append(O_product[i], O[i]), np.append(np.ones(E), -1), 0, 0
+        )
+        constraints.add_sum([d[i], original_input[i], rho[i]], [1, -1, -1], 0, 0)
+        effective += [(d[i], 1), (O[i], -1)]
+        if i > 0:
+            variables, coefficients = zip(*effective)
+            constraints.add_sum(
+                [build_cost_exponent[i - 1], *variables, num_cuts],
+                [1, *(-c for c in coefficients), -2],
+                0,
+                0,
+            )
+
+    objective = np.zeros(num_variables)
+    objective[num_cuts] = 1
+    options = {"time_limit": max(time_limit, 0), "disp": False}
+    if mip_gap is not None:
+        options["mip_rel_gap"] = mip_gap
+    res = milp(
+        objective,
+        integrality=np.ones(num_variables),
+        bounds=Bounds(lb, ub),
+        constraints=constraints.build(num_variables),
+        options=options,
+    )
+    if res.x is None and initial_blocks is not None:
+        vertex_values, edge_values = initial_values
+    elif res.x is None:
+        vertex_values = edge_values = None
+    else:
+        vertex_values = res.x[vertex_var]
+        edge_values = res.x[edge_var]
+    return _solution(
+        graph,
+        num_subcircuit,
+        vertex_values,
+        edge_values,
+        getattr(res, "mip_gap", None),
+        res.status == _MILP_LIMIT_REACHED,
+    )
+
+
+# Backends solving the wire-cut MIP for one number of subcircuits
+SOLVERS = {"cplex": solve_cplex, "highs": solve_highs}
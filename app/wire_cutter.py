@@ -18,36 +18,186 @@
 # ******************************************************************************
 
 import codecs
+import functools
+import hashlib
+import math
 import pickle
+from collections import defaultdict
 
 import jsonpickle
+import numpy as np
 from circuit_knitting.cutting.cutqc import (
     generate_summation_terms,
     cut_circuit_wires,
-    reconstruct_full_distribution,
 )
+from circuit_knitting.cutting.cutqc.wire_cutting_post_processing import naive_compute
 from circuit_knitting.cutting.cutqc.wire_cutting_evaluation import (
-    modify_subcircuit_instance,
     mutate_measurement_basis,
-    measure_prob,
 )
-from qiskit import QuantumCircuit, qasm3
+from qiskit import ClassicalRegister, QuantumCircuit, qasm3
+from qiskit.circuit import Barrier, CircuitInstruction, Measure
+from qiskit.circuit.library import HGate, SdgGate, SGate, XGate
 from qiskit.transpiler.passes import RemoveBarriers
 
+from app.cache import ExpiringLRUCache, cut_request_key, get_cached_cuts
 from app.model.request_combine_results import CombineResultsRequest
 from app.model.request_cut_circuits import CutCircuitsRequest
 from app.model.response_combine_results import CombineResultsResponse
 from app.model.response_cut_circuits import CutCircuitsResponse
 
-from app.utils import array_to_counts, counts_to_array, normalize_array
+from app.utils import (
+    DEFAULT_MAX_CHUNK_SIZE,
+    PARALLEL_NUM_PARTS,
+    PRECISIONS,
+    CompensatedSum,
+    array_to_counts,
+    counts_to_array,
+    counts_to_indices,
+    indices_to_bitstrings,
+    normalize_array,
+    parallel_sum,
+    reorder_qubit_axes,
+    split_evenly,
+)
+from app.wire_cut_finding import find_wire_cuts, find_wire_cuts_heuristic
+from app.wire_cutting_reconstruct_distribution import (
+    attribute_shots,
+    measure_sparse_prob,
+    output_qubit_order,
+    reconstruct_distribution_dd,
+    reconstruct_distribution_sparse,
+)
+
+# Number of parts the summation terms are split into by a serial reconstruction, as done by
+# circuit-knitting-toolbox, which keeps the results bit-identical
+SERIAL_NUM_PARTS = 5
+
+# Summation terms of the most recently used cuts, shared by the cut and combine requests
+_summation_terms_cache = ExpiringLRUCache(max_size=32, ttl=math.inf)
+
+
+def summation_terms_key(subcircuits, complete_path_map, num_cuts):
+    """
+    Compute a stable hash of everything the summation terms of a cut depend on
+
+    The summation terms only depend on the widths of the subcircuits and on the path of every input
+    qubit, given by the subcircuit indices and the positions of the qubits within the subcircuits.
+    Hence, the key is the same for a cut and its parsed copy in a combine request.
+
+    Args:
+        subcircuits: The list of subcircuits
+        complete_path_map: The paths of all the qubits through the subcircuits
+        num_cuts: The number of cuts
+
+    Returns:
+        The hexadecimal SHA-256 digest of the cut structure
+    """
+    paths = [
+        [
+            (
+                item["subcircuit_idx"],
+                subcircuits[item["subcircuit_idx"]].qubits.index(
+                    item["subcircuit_qubit"]
+                ),
+            )
+            for item in path
+        ]
+        for path in complete_path_map.values()
+    ]
+    widths = [subcircuit.num_qubits for subcircuit in subcircuits]
+    return hashlib.sha256(repr((widths, paths, num_cuts)).encode()).hexdigest()
+
+
+def get_summation_terms(subcircuits, complete_path_map, num_cuts):
+    """
+    Memoized :func:`circuit_knitting.cutting.cutqc.generate_summation_terms`
+
+    The returned structures are shared between calls and must not be modified.
+    """
+    key = summation_terms_key(subcircuits, complete_path_map, num_cuts)
+    summation_terms = _summation_terms_cache.get(key)
+    if summation_terms is None:
+        summation_terms = generate_summation_terms(
+            subcircuits, complete_path_map, num_cuts
+        )
+        _summation_terms_cache.put(key, summation_terms)
+    return summation_terms
+
 
+# Gates preparing the initial states and rotating the measurement bases of the subcircuit
+# instances, in the order modify_subcircuit_instance of circuit-knitting-toolbox applies them
+_INIT_GATES = {
+    "zero": (),
+    "one": (XGate(),),
+    "plus": (HGate(),),
+    "minus": (XGate(), HGate()),
+    "plusI": (HGate(), SGate()),
+    "minusI": (XGate(), HGate(), SGate()),
+}
+_MEAS_GATES = {"I": (), "comp": (), "X": (HGate(),), "Y": (SdgGate(), HGate())}
 
-def _create_individual_subcircuits(subcircuits, complete_path_map, num_cuts):
+
+class _SubcircuitInstanceTemplate:
+    """
+    Generates the instances of a subcircuit for different initializations and measurement bases
+
+    Equivalent to ``modify_subcircuit_instance`` of circuit-knitting-toolbox, but the instructions of
+    the subcircuit and the measurements are prepared once, and every instance only adds its
+    initialization and basis rotation gates to them. The operations are shared between the
+    instances instead of being copied, which is safe as they are not modified. If ``measure`` is set, all qubits of the
+    instances are measured like by ``measure_all``.
+    """
+
+    def __init__(self, subcircuit: QuantumCircuit, measure: bool = False):
+        self.subcircuit = subcircuit
+        self.body = list(subcircuit.data)
+        self.measurement_register = None
+        self.measurements = []
+        if measure:
+            qubits = tuple(subcircuit.qubits)
+            self.measurement_register = ClassicalRegister(len(qubits), "meas")
+            self.measurements = [
+                CircuitInstruction(Barrier(len(qubits)), qubits),
+                *(
+                    CircuitInstruction(Measure(), (qubit,), (clbit,))
+                    for qubit, clbit in zip(qubits, self.measurement_register)
+                ),
+            ]
+
+    def instance(self, init, meas) -> QuantumCircuit:
+        """
+        Create the instance of the subcircuit for an initialization and measurement basis
+
+        Args:
+            init: The initial state of every qubit, "zero", "one", "plus", "minus", "plusI" or
+                "minusI"
+            meas: The measurement basis of every qubit, "I", "comp", "X" or "Y"
+        """
+        qubits = self.subcircuit.qubits
+        circuit = self.subcircuit.copy_empty_like()
+        for qubit, x in zip(qubits, init):
+            for gate in _INIT_GATES[x]:
+                circuit._append(CircuitInstruction(gate, (qubit,)))
+        for instruction in self.body:
+            circuit._append(instruction)
+        for qubit, x in zip(qubits, meas):
+            for gate in _MEAS_GATES[x]:
+                circuit._append(CircuitInstruction(gate, (qubit,)))
+        if self.measurement_register is not None:
+            circuit.add_register(self.measurement_register)
+            for instruction in self.measurements:
+                circuit._append(instruction)
+        return circuit
+
+
+def _create_individual_subcircuits(
+    subcircuits, complete_path_map, num_cuts, measure=False
+):
     (
         summation_terms,
         subcircuit_entries,
         subcircuit_instances,
-    ) = generate_summation_terms(subcircuits, complete_path_map, num_cuts)
+    ) = get_summation_terms(subcircuits, complete_path_map, num_cuts)
     individual_subcircuits = []
     init_meas_subcircuit_map = {}
 
@@ -55,12 +205,11 @@ def _create_individual_subcircuits(subcircuits, complete_path_map, num_cuts):
         _init_meas_subcircuit_map = {}
         subcircuit_instance = subcircuit_instances[subcircuit_idx]
         subcircuit_idx_set = set()
+        template = _SubcircuitInstanceTemplate(subcircuit, measure)
         for init_meas, subcircuit_instance_idx in subcircuit_instance.items():
             if subcircuit_instance_idx not in subcircuit_idx_set:
-                modified_subcircuit_instance = modify_subcircuit_instance(
-                    subcircuit=subcircuit,
-                    init=init_meas[0],
-                    meas=tuple(init_meas[1]),
+                modified_subcircuit_instance = template.instance(
+                    init=init_meas[0], meas=init_meas[1]
                 )
                 i = len(individual_subcircuits)
                 individual_subcircuits.append(modified_subcircuit_instance)
@@ -104,16 +253,107 @@ def _get_circuit(cutting_request):
     return RemoveBarriers()(circuit)
 
 
-def cut_circuit(cutting_request: CutCircuitsRequest):
+def validate_parameter_bindings(circuit, parameter_bindings):
+    """
+    Check that every binding assigns a value to exactly the parameters of the circuit
+
+    Raises:
+        ValueError: If a binding misses a parameter or contains an unknown one
+    """
+    names = {parameter.name for parameter in circuit.parameters}
+    for i, binding in enumerate(parameter_bindings):
+        if binding.keys() != names:
+            raise ValueError(
+                f"Parameter binding {i} must assign exactly the parameters {sorted(names)}, "
+                f"missing: {sorted(names - binding.keys())}, unknown: {sorted(binding.keys() - names)}"
+            )
+
+
+def bind_parameters(circuits, parameter_bindings):
+    """
+    Assign each set of parameter values to the parameterized circuits
+
+    Args:
+        circuits: The circuits, e.g., the individual subcircuits of a parameterized template
+        parameter_bindings: List of dicts mapping the parameter names to their values
+
+    Returns:
+        For each binding, the list of bound circuits
+    """
+    return [
+        [
+            circuit.assign_parameters(
+                {parameter: binding[parameter.name] for parameter in circuit.parameters}
+            )
+            for circuit in circuits
+        ]
+        for binding in parameter_bindings
+    ]
+
+
+def cut_circuit(
+    cutting_request: CutCircuitsRequest,
+    cut_cache=None,
+    cut_result_cache=None,
+    num_workers=1,
+):
     circuit = _get_circuit(cutting_request)
+    if cutting_request.parameter_bindings is not None:
+        validate_parameter_bindings(circuit, cutting_request.parameter_bindings)
+
+    cached = None
+    if cut_result_cache is not None:
+        key = cut_request_key(circuit, cutting_request)
+        cached = cut_result_cache.get(key)
+    if cached is None:
+        cached = circuit, _cut_circuit(circuit, cutting_request, num_workers)
+        if cut_result_cache is not None:
+            cut_result_cache.put(key, cached)
+    # the complete_path_map refers to the qubits of the circuit that was cut
+    circuit, res = cached[0], dict(cached[1])
+    if cutting_request.parameter_bindings is not None:
+        res["bound_individual_subcircuits"] = bind_parameters(
+            res["individual_subcircuits"], cutting_request.parameter_bindings
+        )
+
+    if cut_cache is not None:
+        res["cut_id"] = cut_cache.add({"circuit": circuit, **res})
+
+    return CutCircuitsResponse(format=cutting_request.circuit_format, **res)
+
 
+def _cut_circuit(circuit, cutting_request: CutCircuitsRequest, num_workers=1):
     if cutting_request.method == "automatic":
-        res = cut_circuit_wires(
+        res = find_wire_cuts(
             circuit,
-            method=cutting_request.method,
             max_subcircuit_width=cutting_request.max_subcircuit_width,
             max_cuts=cutting_request.max_cuts,
             num_subcircuits=cutting_request.num_subcircuits,
+            time_limit=cutting_request.solver_time_limit,
+            mip_gap=cutting_request.mip_gap,
+            objective=cutting_request.objective,
+            num_workers=num_workers if cutting_request.parallel_search else 1,
+            solver=cutting_request.solver,
+            warm_start=cutting_request.warm_start,
+        )
+        if not res:
+            raise ValueError(
+                "No cut was found within max_subcircuit_width, max_cuts and the solver_time_limit"
+            )
+    elif cutting_request.method == "heuristic":
+        subcircuit_vertices = find_wire_cuts_heuristic(
+            circuit,
+            max_subcircuit_width=cutting_request.max_subcircuit_width,
+            max_cuts=cutting_request.max_cuts,
+            num_subcircuits=cutting_request.num_subcircuits,
+            objective=cutting_request.objective,
+        )
+        if subcircuit_vertices is None:
+            raise ValueError(
+                "No cut was found within max_subcircuit_width and max_cuts"
+            )
+        res = cut_circuit_wires(
+            circuit, method="manual", subcircuit_vertices=subcircuit_vertices
         )
     else:
         res = cut_circuit_wires(
@@ -122,81 +362,269 @@ def cut_circuit(cutting_request: CutCircuitsRequest):
             subcircuit_vertices=cutting_request.subcircuit_vertices,
         )
     individual_subcircuits, init_meas_subcircuit_map = _create_individual_subcircuits(
-        res["subcircuits"], res["complete_path_map"], res["num_cuts"]
+        res["subcircuits"], res["complete_path_map"], res["num_cuts"], measure=True
     )
-
-    for individual_subcircuit in individual_subcircuits:
-        individual_subcircuit.measure_all()
     res["individual_subcircuits"] = individual_subcircuits
     res["init_meas_subcircuit_map"] = init_meas_subcircuit_map
+    return res
 
-    return CutCircuitsResponse(format=cutting_request.circuit_format, **res)
 
+def reconstruct_full_distribution(
+    circuit,
+    subcircuit_instance_probabilities,
+    cuts,
+    executor=None,
+    dtype=np.float64,
+    out=None,
+):
+    """
+    Reconstruct the full probability distribution from the subcircuit results
 
-def reconstruct_result(input_dict: CombineResultsRequest, quokka_format=False):
-    if input_dict.circuit_format == "openqasm2":
-        try:
-            circuit = QuantumCircuit.from_qasm_str(input_dict.circuit)
-            input_dict.cuts["subcircuits"] = [
-                QuantumCircuit.from_qasm_str(qasm)
-                for qasm in input_dict.cuts["subcircuits"]
-            ]
-            input_dict.cuts["individual_subcircuits"] = [
-                QuantumCircuit.from_qasm_str(qasm)
-                for qasm in input_dict.cuts["individual_subcircuits"]
+    Equivalent to :func:`circuit_knitting.cutting.cutqc.reconstruct_full_distribution`, but the summation
+    terms are evaluated in the current process if no ``executor`` is given, split into the same five
+    parts as by circuit-knitting-toolbox. Otherwise, they are split into :data:`PARALLEL_NUM_PARTS`
+    parts which are evaluated in the process pool and added in a fixed order, so that the result does
+    not depend on the number of workers. It may differ in the last bits from the serial result.
+
+    In float32, the summation terms and the partial results are added by compensated summation.
+
+    Args:
+        circuit: The original full circuit
+        subcircuit_instance_probabilities: The measured probabilities of the subcircuit instances
+        cuts: Results from the cutting step
+        executor: The process pool, or None to evaluate the summation terms in the current process
+        dtype: The floating-point type of the reconstruction
+        out: Vector the distribution is written to, e.g. a memory-mapped file, a new one if None
+
+    Returns:
+        The reconstructed probability vector
+    """
+    summation_terms, subcircuit_entries, _ = get_summation_terms(
+        cuts["subcircuits"], cuts["complete_path_map"], cuts["num_cuts"]
+    )
+    subcircuit_instance_probabilities = {
+        subcircuit_idx: {
+            instance_idx: np.asarray(prob, dtype=dtype)
+            for instance_idx, prob in (
+                instance_probs.items()
+                if isinstance(instance_probs, dict)
+                else enumerate(instance_probs)
+            )
+        }
+        for subcircuit_idx, instance_probs in subcircuit_instance_probabilities.items()
+    }
+    subcircuit_entry_probs = attribute_shots(
+        subcircuit_entries, subcircuit_instance_probabilities
+    )
+    compensated = np.dtype(dtype) == np.float32
+
+    smart_order = sorted(
+        subcircuit_entry_probs.keys(),
+        key=lambda subcircuit_idx: len(subcircuit_entry_probs[subcircuit_idx][0]),
+    )
+    num_parts = SERIAL_NUM_PARTS if executor is None else PARALLEL_NUM_PARTS
+    args_list = [
+        (
+            smart_order,
+            summation_terms[part.start : part.stop],
+            subcircuit_entry_probs,
+            compensated,
+        )
+        for part in split_evenly(len(summation_terms), num_parts)
+    ]
+    unordered_probability = parallel_sum(
+        _compute_terms, args_list, executor, compensated=compensated
+    )
+    unordered_probability /= 2 ** cuts["num_cuts"]
+
+    unordered_qubits = output_qubit_order(
+        circuit, cuts["subcircuits"], smart_order, cuts["complete_path_map"]
+    )
+    return reorder_qubit_axes(unordered_probability, unordered_qubits, out=out)
+
+
+def _compute_terms(
+    subcircuit_order, summation_terms, subcircuit_entry_probs, compensated=False
+):
+    if not compensated:
+        reconstructed_prob, _ = naive_compute(
+            subcircuit_order, summation_terms, subcircuit_entry_probs
+        )
+        return reconstructed_prob
+
+    total = CompensatedSum()
+    for summation_term in summation_terms:
+        summation_term_prob = None
+        for subcircuit_idx in subcircuit_order:
+            subcircuit_entry_prob = subcircuit_entry_probs[subcircuit_idx][
+                summation_term[subcircuit_idx]
             ]
-        except Exception as e:
-            return "Provided invalid OpenQASM 2.0 string"
-    elif input_dict.circuit_format == "openqasm3":
-        try:
-            circuit = qasm3.loads(input_dict.circuit)
-            input_dict.cuts["subcircuits"] = [
-                qasm3.loads(qasm) for qasm in input_dict.cuts["subcircuits"]
+            if summation_term_prob is None:
+                summation_term_prob = subcircuit_entry_prob
+            else:
+                summation_term_prob = np.kron(
+                    summation_term_prob, subcircuit_entry_prob
+                )
+        total.add(summation_term_prob)
+    return total.result
+
+
+def reconstruct_result(
+    input_dict: CombineResultsRequest,
+    quokka_format=False,
+    max_chunk_size=DEFAULT_MAX_CHUNK_SIZE,
+    executor=None,
+    cut_cache=None,
+    result_store=None,
+):
+    if input_dict.persist and result_store is None:
+        raise ValueError("Persisting results is not enabled")
+    if input_dict.persist and input_dict.dynamic_definition:
+        raise ValueError("Dynamic definition results cannot be persisted")
+
+    cuts = get_cached_cuts(input_dict, cut_cache)
+    if cuts is None:
+        cuts = dict(input_dict.cuts)
+        if input_dict.circuit_format == "openqasm2":
+            try:
+                cuts["circuit"] = QuantumCircuit.from_qasm_str(input_dict.circuit)
+                cuts["subcircuits"] = [
+                    QuantumCircuit.from_qasm_str(qasm) for qasm in cuts["subcircuits"]
+                ]
+                cuts["individual_subcircuits"] = [
+                    QuantumCircuit.from_qasm_str(qasm)
+                    for qasm in cuts["individual_subcircuits"]
+                ]
+            except Exception as e:
+                return "Provided invalid OpenQASM 2.0 string"
+        elif input_dict.circuit_format == "openqasm3":
+            try:
+                cuts["circuit"] = qasm3.loads(input_dict.circuit)
+                cuts["subcircuits"] = [
+                    qasm3.loads(qasm) for qasm in cuts["subcircuits"]
+                ]
+                cuts["individual_subcircuits"] = [
+                    qasm3.loads(qasm) for qasm in cuts["individual_subcircuits"]
+                ]
+            except Exception as e:
+                return "Provided invalid OpenQASM 3.0 string"
+        elif input_dict.circuit_format == "qiskit":
+            cuts["circuit"] = pickle.loads(
+                codecs.decode(input_dict.circuit.encode(), "base64")
+            )
+            cuts["subcircuits"] = [
+                pickle.loads(codecs.decode(subcirc.encode(), "base64"))
+                for subcirc in cuts["subcircuits"]
             ]
-            input_dict.cuts["individual_subcircuits"] = [
-                qasm3.loads(qasm) for qasm in input_dict.cuts["individual_subcircuits"]
+            cuts["individual_subcircuits"] = [
+                pickle.loads(codecs.decode(ind_circ.encode(), "base64"))
+                for ind_circ in cuts["individual_subcircuits"]
             ]
+        else:
+            return 'format must be "openqasm2", "openqasm3" or "qiskit"'
+
+        try:
+            cuts["complete_path_map"] = jsonpickle.decode(
+                cuts["complete_path_map"], keys=True
+            )
+            cuts["init_meas_subcircuit_map"] = jsonpickle.decode(
+                cuts["init_meas_subcircuit_map"], keys=True
+            )
         except Exception as e:
-            return "Provided invalid OpenQASM 3.0 string"
-    elif input_dict.circuit_format == "qiskit":
-        circuit = pickle.loads(codecs.decode(input_dict.circuit.encode(), "base64"))
-        input_dict.cuts["subcircuits"] = [
-            pickle.loads(codecs.decode(subcirc.encode(), "base64"))
-            for subcirc in input_dict.cuts["subcircuits"]
-        ]
-        input_dict.cuts["individual_subcircuits"] = [
-            pickle.loads(codecs.decode(ind_circ.encode(), "base64"))
-            for ind_circ in input_dict.cuts["individual_subcircuits"]
-        ]
-    else:
-        return 'format must be "openqasm2", "openqasm3" or "qiskit"'
+            # TODO refine exception
+            return "The quantum circuit has to be provided as an OpenQASM 2.0 String"
 
-    try:
-        input_dict.cuts["complete_path_map"] = jsonpickle.decode(
-            input_dict.cuts["complete_path_map"], keys=True
-        )
-        input_dict.cuts["init_meas_subcircuit_map"] = jsonpickle.decode(
-            input_dict.cuts["init_meas_subcircuit_map"], keys=True
+    if input_dict.dynamic_definition and input_dict.sparse:
+        raise ValueError(
+            "Dynamic definition and sparse reconstruction cannot be combined"
         )
-    except Exception as e:
-        # TODO refine exception
-        return "The quantum circuit has to be provided as an OpenQASM 2.0 String"
 
     normalize = input_dict.unnormalized_results
+    dtype = PRECISIONS[input_dict.precision]
 
     subcircuit_results = process_subcircuit_results(
         input_dict.subcircuit_results,
-        input_dict.cuts["init_meas_subcircuit_map"],
-        input_dict.cuts["subcircuits"],
-        input_dict.cuts["complete_path_map"],
-        input_dict.cuts["num_cuts"],
+        cuts["init_meas_subcircuit_map"],
+        cuts["subcircuits"],
+        cuts["complete_path_map"],
+        cuts["num_cuts"],
         quokka_format,
         normalize,
+        input_dict.sparse,
+        dtype,
     )
 
-    res = reconstruct_full_distribution(circuit, subcircuit_results, input_dict.cuts)
+    if input_dict.dynamic_definition:
+        summation_terms, subcircuit_entries, _ = get_summation_terms(
+            cuts["subcircuits"], cuts["complete_path_map"], cuts["num_cuts"]
+        )
+        bins = reconstruct_distribution_dd(
+            cuts["circuit"],
+            subcircuit_results,
+            cuts,
+            summation_terms,
+            subcircuit_entries,
+            max_active_qubits=input_dict.dd_max_active_qubits,
+            recursion_depth=input_dict.dd_recursion_depth,
+        )
+        if input_dict.shot_scaling_factor is not None:
+            bins = {
+                label: prob * input_dict.shot_scaling_factor
+                for label, prob in bins.items()
+            }
+        return CombineResultsResponse(result=None, bins=bins)
+
+    if input_dict.sparse:
+        summation_terms, subcircuit_entries, _ = get_summation_terms(
+            cuts["subcircuits"], cuts["complete_path_map"], cuts["num_cuts"]
+        )
+        indices, values = reconstruct_distribution_sparse(
+            cuts["circuit"],
+            subcircuit_results,
+            cuts,
+            summation_terms,
+            subcircuit_entries,
+            max_chunk_size=max_chunk_size,
+        )
+        values = values.astype(dtype, copy=False)
+        if input_dict.shot_scaling_factor is not None:
+            values = values * input_dict.shot_scaling_factor
+
+        num_qubits = cuts["circuit"].num_qubits
+        if input_dict.persist:
+            result_id = result_store.save_sparse(indices, values, 2 ** num_qubits)
+            return CombineResultsResponse(result=None, result_id=result_id)
+        if quokka_format:
+            nonzero = values != 0
+            res = dict(
+                zip(
+                    indices_to_bitstrings(indices[nonzero], num_qubits),
+                    values[nonzero].tolist(),
+                )
+            )
+        else:
+            res = np.zeros(2 ** num_qubits, dtype=dtype)
+            res[indices] = values
+        return CombineResultsResponse(result=res)
+
+    # a persisted distribution is written to its memory-mapped file directly
+    result_id, out = None, None
+    if input_dict.persist:
+        result_id, out = result_store.create(2 ** cuts["circuit"].num_qubits, dtype)
+    res = reconstruct_full_distribution(
+        cuts["circuit"],
+        subcircuit_results,
+        cuts,
+        executor=executor,
+        dtype=dtype,
+        out=out,
+    )
     if input_dict.shot_scaling_factor is not None:
-        res = res * input_dict.shot_scaling_factor
+        res *= input_dict.shot_scaling_factor
+
+    if input_dict.persist:
+        res.flush()
+        return CombineResultsResponse(result=None, result_id=result_id)
 
     if quokka_format:
         res = array_to_counts(res)
@@ -215,6 +643,70 @@ def convert_subcircuit_results(subcircuit_results, subcircuits):
     return converted_result
 
 
+@functools.lru_cache(maxsize=256)
+def _measurement_plan(meas):
+    """
+    Precompute how the measured probabilities follow from the probabilities of a subcircuit instance
+
+    Args:
+        meas: The measurement basis of every qubit of the subcircuit
+
+    Returns:
+        The axis permutation moving the axes of the "comp" qubits to the front and the sign of
+        every outcome of the remaining qubits
+    """
+    # axis k of a probability vector reshaped to (2,) * n corresponds to qubit n - 1 - k
+    bases = meas[::-1]
+    comp_axes = [k for k, basis in enumerate(bases) if basis == "comp"]
+    reduced_bases = [basis for basis in bases if basis != "comp"]
+
+    outcomes = np.arange(2 ** len(reduced_bases))
+    signs = np.ones(len(outcomes))
+    for position, basis in enumerate(reduced_bases):
+        if basis != "I":
+            bit = (outcomes >> (len(reduced_bases) - 1 - position)) & 1
+            signs[bit == 1] *= -1
+    reduced_axes = [k for k, basis in enumerate(bases) if basis != "comp"]
+    return tuple(comp_axes + reduced_axes), signs
+
+
+def measure_probs(unmeasured_probs: np.ndarray, meas) -> np.ndarray:
+    """
+    Batched :func:`circuit_knitting.cutting.cutqc.wire_cutting_evaluation.measure_prob`
+
+    All instances share the same measurement basis, so the qubits measured in the computational basis
+    are moved to the front and the outcomes of the other qubits are added up with their signs. The
+    outcomes are added in the same order as by ``measure_prob``, which keeps the results bit-identical.
+
+    Args:
+        unmeasured_probs: Array of shape (number of instances, 2 ** number of qubits), computed in
+            float32 if given in float32 and in float64 otherwise
+        meas: The measurement basis of every qubit
+
+    Returns:
+        Array of shape (number of instances, 2 ** number of "comp" measurements)
+    """
+    unmeasured_probs = np.asarray(unmeasured_probs)
+    if unmeasured_probs.dtype != np.float32:
+        unmeasured_probs = np.asarray(unmeasured_probs, dtype=np.float64)
+    if all(basis == "comp" for basis in meas):
+        return np.array(unmeasured_probs)
+
+    axes, signs = _measurement_plan(tuple(meas))
+    num_instances = unmeasured_probs.shape[0]
+    tensor = unmeasured_probs.reshape((num_instances,) + (2,) * len(meas))
+    tensor = tensor.transpose((0,) + tuple(axis + 1 for axis in axes)).reshape(
+        num_instances, -1, len(signs)
+    )
+    measured_probs = np.zeros(tensor.shape[:2], dtype=unmeasured_probs.dtype)
+    for outcome, sign in enumerate(signs):
+        if sign > 0:
+            measured_probs += tensor[:, :, outcome]
+        else:
+            measured_probs -= tensor[:, :, outcome]
+    return measured_probs
+
+
 def process_subcircuit_results(
     subcircuit_results,
     init_meas_subcircuit_map,
@@ -223,26 +715,89 @@ def process_subcircuit_results(
     num_cuts,
     quokka_format=False,
     normalize=False,
+    sparse=False,
+    dtype=np.float64,
 ):
+    """
+    Compute the measured probabilities of all subcircuit instances from the subcircuit results
+
+    Args:
+        subcircuit_results: The results of the individual subcircuits
+        init_meas_subcircuit_map: The individual subcircuit of every initialization and measurement
+        subcircuits: The list of subcircuits
+        complete_path_map: The paths of all the qubits through the subcircuits
+        num_cuts: The number of cuts
+        quokka_format: Whether the results are counts dictionaries instead of probability vectors
+        normalize: Whether the results have to be normalized
+        sparse: If ``True``, every probability vector is a tuple of the observed outcomes and their
+            values instead of a dense array of length 2 ** width
+        dtype: The floating-point type of the probabilities
+
+    Returns:
+        The list of measured probabilities of every subcircuit instance for each subcircuit
+    """
     (
         summation_terms,
         subcircuit_entries,
         subcircuit_instances,
-    ) = generate_summation_terms(subcircuits, complete_path_map, num_cuts)
+    ) = get_summation_terms(subcircuits, complete_path_map, num_cuts)
 
     results = {}
     for circuit_fragment_idx, circuit_fragment in enumerate(subcircuits):
         subcircuit_instance = subcircuit_instances[circuit_fragment_idx]
-        fragment_results = []
+
+        # instances with the same measurement basis are measured together
+        instances_by_meas = defaultdict(list)
         for init_meas, subcircuit_instance_idx in subcircuit_instance.items():
-            res = subcircuit_results[
-                init_meas_subcircuit_map[circuit_fragment_idx][init_meas]
-            ]
+            instances_by_meas[tuple(init_meas[1])].append(
+                (subcircuit_instance_idx, init_meas)
+            )
+
+        # mutated measurement bases share the result of the same individual subcircuit
+        unmeasured_results = {}
+        for result_idx in set(init_meas_subcircuit_map[circuit_fragment_idx].values()):
+            res = subcircuit_results[result_idx]
+            if sparse:
+                if quokka_format:
+                    indices, values = counts_to_indices(res)
+                    values = values.astype(dtype, copy=False)
+                else:
+                    res = np.asarray(res, dtype=dtype)
+                    indices = np.flatnonzero(res)
+                    values = res[indices]
+                if normalize:
+                    values = values / np.sum(values)
+                unmeasured_results[result_idx] = (indices, values)
+                continue
             if quokka_format:
-                res = counts_to_array(res, circuit_fragment.num_qubits)
+                res = counts_to_array(res, circuit_fragment.num_qubits, dtype=dtype)
+            else:
+                res = np.asarray(res, dtype=dtype)
             if normalize:
                 res = normalize_array(res)
-            measured_prob = measure_prob(unmeasured_prob=res, meas=init_meas[1])
-            fragment_results.append(measured_prob)
+            unmeasured_results[result_idx] = res
+
+        fragment_results = [None] * len(subcircuit_instance)
+        for meas, instances in instances_by_meas.items():
+            if sparse:
+                for subcircuit_instance_idx, init_meas in instances:
+                    fragment_results[subcircuit_instance_idx] = measure_sparse_prob(
+                        *unmeasured_results[
+                            init_meas_subcircuit_map[circuit_fragment_idx][init_meas]
+                        ],
+                        meas,
+                    )
+                continue
+            unmeasured_probs = [
+                unmeasured_results[
+                    init_meas_subcircuit_map[circuit_fragment_idx][init_meas]
+                ]
+                for _, init_meas in instances
+            ]
+            measured_probs = measure_probs(np.stack(unmeasured_probs), meas)
+            for (subcircuit_instance_idx, _), measured_prob in zip(
+                instances, measured_probs
+            ):
+                fragment_results[subcircuit_instance_idx] = measured_prob
         results[circuit_fragment_idx] = fragment_results
     return results
@@ -0,0 +1,429 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import heapq
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from circuit_knitting.cutting.cutqc.dynamic_definition import _distribute_load
+from circuit_knitting.cutting.cutqc.wire_cutting_post_processing import naive_compute
+from qiskit import QuantumCircuit
+
+from app.utils import DEFAULT_MAX_CHUNK_SIZE, merge_sparse
+
+# A sparse probability vector given by its outcome indices and the corresponding values
+SparseVector = Tuple[np.ndarray, np.ndarray]
+
+# Character of a qubit whose outcomes are merged into a bin of the dynamic definition
+MERGED_QUBIT = "x"
+
+
+def measure_sparse_prob(indices: np.ndarray, values: np.ndarray, meas) -> SparseVector:
+    """
+    Sparse :func:`circuit_knitting.cutting.cutqc.wire_cutting_evaluation.measure_prob`
+
+    The outcome of every qubit measured in the computational basis is kept, the outcomes of the other
+    qubits only determine the sign of the value.
+
+    Args:
+        indices: The outcomes of the subcircuit instance, qubit i being bit i
+        values: The probabilities of the outcomes
+        meas: The measurement basis of every qubit
+
+    Returns:
+        The sparse measured probability vector over the "comp" qubits
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if all(basis == "comp" for basis in meas):
+        return indices, values
+
+    measured_indices = np.zeros_like(indices)
+    signs = np.ones(len(indices))
+    position = 0
+    for qubit, basis in enumerate(meas):
+        bit = (indices >> qubit) & 1
+        if basis == "comp":
+            measured_indices |= bit << position
+            position += 1
+        elif basis != "I":
+            signs[bit == 1] *= -1
+    return merge_sparse([measured_indices], [signs * values])
+
+
+def attribute_shots(
+    subcircuit_entries, subcircuit_instance_probs
+) -> Dict[int, Dict[int, np.ndarray]]:
+    """
+    Combine the probabilities of the subcircuit instances into the probabilities of the subcircuit entries
+
+    Equivalent to the private ``_attribute_shots`` of circuit-knitting-toolbox.
+
+    Args:
+        subcircuit_entries: The entries of every subcircuit, as generated by ``generate_summation_terms``
+        subcircuit_instance_probs: The measured probabilities of the subcircuit instances
+
+    Returns:
+        The probability vector of every subcircuit entry
+    """
+    subcircuit_entry_probs = {}
+    for subcircuit_idx, entries in subcircuit_entries.items():
+        subcircuit_entry_probs[subcircuit_idx] = {}
+        for subcircuit_entry_idx, kronecker_term in entries.values():
+            subcircuit_entry_prob = None
+            for coefficient, subcircuit_instance_idx in kronecker_term:
+                term = (
+                    coefficient
+                    * subcircuit_instance_probs[subcircuit_idx][subcircuit_instance_idx]
+                )
+                if subcircuit_entry_prob is None:
+                    subcircuit_entry_prob = term
+                else:
+                    subcircuit_entry_prob += term
+            if subcircuit_entry_prob is None:
+                raise ValueError(
+                    f"Entry {subcircuit_entry_idx} of subcircuit {subcircuit_idx} has no instances"
+                )
+            subcircuit_entry_probs[subcircuit_idx][
+                subcircuit_entry_idx
+            ] = subcircuit_entry_prob
+    return subcircuit_entry_probs
+
+
+def attribute_shots_sparse(
+    subcircuit_entries, subcircuit_instance_probs: Dict[int, List[SparseVector]]
+) -> Dict[int, Dict[int, SparseVector]]:
+    """
+    Sparse :func:`attribute_shots`
+
+    Args:
+        subcircuit_entries: The entries of every subcircuit, as generated by ``generate_summation_terms``
+        subcircuit_instance_probs: The sparse measured probabilities of the subcircuit instances
+
+    Returns:
+        The sparse probability vector of every subcircuit entry
+    """
+    subcircuit_entry_probs = {}
+    for subcircuit_idx, entries in subcircuit_entries.items():
+        subcircuit_entry_probs[subcircuit_idx] = {}
+        for subcircuit_entry_idx, kronecker_term in entries.values():
+            instance_probs = [
+                subcircuit_instance_probs[subcircuit_idx][subcircuit_instance_idx]
+                for _, subcircuit_instance_idx in kronecker_term
+            ]
+            subcircuit_entry_probs[subcircuit_idx][subcircuit_entry_idx] = merge_sparse(
+                [indices for indices, _ in instance_probs],
+                [
+                    coefficient * values
+                    for (coefficient, _), (_, values) in zip(
+                        kronecker_term, instance_probs
+                    )
+                ],
+            )
+    return subcircuit_entry_probs
+
+
+def output_qubit_order(
+    circuit: QuantumCircuit, subcircuits, subcircuit_order, complete_path_map
+) -> List[int]:
+    """
+    Determine which qubit of the full circuit every bit of an unordered reconstructed outcome belongs to
+
+    Follows :func:`circuit_knitting.cutting.cutqc.wire_cutting_verification.generate_reconstructed_output`.
+
+    Args:
+        circuit: The original full circuit
+        subcircuits: The cut subcircuits
+        subcircuit_order: The order in which the subcircuit entries are combined
+        complete_path_map: The paths of all the qubits through the subcircuits
+
+    Returns:
+        The qubit of every bit of an unordered outcome, most significant bit first
+    """
+    subcircuit_out_qubits = {subcircuit_idx: [] for subcircuit_idx in subcircuit_order}
+    for input_qubit, path in complete_path_map.items():
+        output_qubit = path[-1]
+        subcircuit_out_qubits[output_qubit["subcircuit_idx"]].append(
+            (output_qubit["subcircuit_qubit"], circuit.qubits.index(input_qubit))
+        )
+
+    unordered_qubits = []
+    for subcircuit_idx in subcircuit_order:
+        out_qubits = sorted(
+            subcircuit_out_qubits[subcircuit_idx],
+            key=lambda x: subcircuits[subcircuit_idx].qubits.index(x[0]),
+            reverse=True,
+        )
+        unordered_qubits += [qubit for _, qubit in out_qubits]
+    return unordered_qubits
+
+
+def reorder_indices(indices: np.ndarray, unordered_qubits: Sequence[int]) -> np.ndarray:
+    """
+    Map unordered reconstructed outcomes to outcomes of the full circuit by permuting their bits
+
+    Args:
+        indices: The unordered outcomes
+        unordered_qubits: The qubit of every bit, most significant bit first
+
+    Returns:
+        The outcomes of the full circuit, qubit i being bit i
+    """
+    num_bits = len(unordered_qubits)
+    ordered = np.zeros_like(indices)
+    for position, qubit in enumerate(unordered_qubits):
+        ordered |= ((indices >> (num_bits - 1 - position)) & 1) << qubit
+    return ordered
+
+
+def _output_widths(complete_path_map) -> Dict[int, int]:
+    """The number of output qubits of every subcircuit, i.e., the width of its measured entries"""
+    return Counter(path[-1]["subcircuit_idx"] for path in complete_path_map.values())
+
+
+def reconstruct_distribution_sparse(
+    circuit: QuantumCircuit,
+    subcircuit_instance_probs: Dict[int, List[SparseVector]],
+    cuts,
+    summation_terms,
+    subcircuit_entries,
+    max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE,
+) -> SparseVector:
+    """
+    Reconstruct the probability distribution of the full circuit from sparse subcircuit results
+
+    Every summation term is the Kronecker product of one entry per subcircuit. Its sparse form only
+    contains the products of the outcomes observed in the entries, so memory scales with the support of
+    the subcircuit results instead of the widths of the subcircuits.
+
+    Args:
+        circuit: The original full circuit
+        subcircuit_instance_probs: The sparse measured probabilities of the subcircuit instances
+        cuts: Results from the cutting step
+        summation_terms: The summation terms, as generated by ``generate_summation_terms``
+        subcircuit_entries: The subcircuit entries, as generated by ``generate_summation_terms``
+        max_chunk_size: The buffered contributions are merged whenever they exceed this size
+
+    Returns:
+        The sorted outcomes of the full circuit and their probabilities
+    """
+    subcircuit_entry_probs = attribute_shots_sparse(
+        subcircuit_entries, subcircuit_instance_probs
+    )
+    widths = _output_widths(cuts["complete_path_map"])
+    # same order as the dense reconstruction
+    subcircuit_order = sorted(
+        subcircuit_entry_probs.keys(), key=lambda subcircuit_idx: widths[subcircuit_idx]
+    )
+    unordered_qubits = output_qubit_order(
+        circuit, cuts["subcircuits"], subcircuit_order, cuts["complete_path_map"]
+    )
+
+    indices_list = [np.zeros(0, dtype=np.int64)]
+    values_list = [np.zeros(0)]
+    num_buffered = 0
+    for summation_term in summation_terms:
+        term_indices = np.zeros(1, dtype=np.int64)
+        term_values = np.ones(1)
+        for subcircuit_idx in subcircuit_order:
+            indices, values = subcircuit_entry_probs[subcircuit_idx][
+                summation_term[subcircuit_idx]
+            ]
+            term_indices = (
+                (term_indices[:, None] << widths[subcircuit_idx]) | indices
+            ).ravel()
+            term_values = np.outer(term_values, values).ravel()
+            if len(term_indices) == 0:
+                break
+        indices_list.append(term_indices)
+        values_list.append(term_values)
+        num_buffered += len(term_indices)
+        if num_buffered > max_chunk_size:
+            merged_indices, merged_values = merge_sparse(indices_list, values_list)
+            indices_list, values_list = [merged_indices], [merged_values]
+            num_buffered = 0
+
+    indices, values = merge_sparse(indices_list, values_list)
+    values /= 2 ** cuts["num_cuts"]
+    indices = reorder_indices(indices, unordered_qubits)
+    order = np.argsort(indices)
+    return indices[order], values[order]
+
+
+def _merge_entry_prob(prob: np.ndarray, qubit_states: Sequence) -> np.ndarray:
+    """
+    Sum a subcircuit entry over its merged qubits and select the outcomes of its fixed qubits
+
+    Args:
+        prob: The dense probability vector of the entry
+        qubit_states: "active", "merged", 0 or 1 for every bit of the entry, most significant bit first
+
+    Returns:
+        The probability vector over the active qubits
+    """
+    tensor = prob.reshape((2,) * len(qubit_states))
+    tensor = tensor[
+        tuple(
+            slice(None) if state in ("active", "merged") else state
+            for state in qubit_states
+        )
+    ]
+    remaining = [state for state in qubit_states if state in ("active", "merged")]
+    merged_axes = tuple(k for k, state in enumerate(remaining) if state == "merged")
+    return np.sum(tensor, axis=merged_axes).ravel()
+
+
+def _activate_merged_qubits(subcircuit_states, max_active_qubits):
+    """Turn merged qubits into active ones, distributing them over the subcircuits"""
+    active_qubits = _distribute_load(
+        capacities={
+            subcircuit_idx: states.count("merged")
+            for subcircuit_idx, states in subcircuit_states.items()
+        },
+        mem_limit=max_active_qubits,
+    )
+    for subcircuit_idx, states in subcircuit_states.items():
+        num_active = active_qubits[subcircuit_idx]
+        for position, state in enumerate(states):
+            if state == "merged" and num_active > 0:
+                states[position] = "active"
+                num_active -= 1
+    return subcircuit_states
+
+
+def _fix_active_qubits(subcircuit_states, subcircuit_order, bin_id):
+    """Copy the qubit states, fixing the active qubits to the outcome of a bin"""
+    num_active = sum(states.count("active") for states in subcircuit_states.values())
+    next_states = {
+        subcircuit_idx: list(states)
+        for subcircuit_idx, states in subcircuit_states.items()
+    }
+    position = num_active - 1
+    for subcircuit_idx in subcircuit_order:
+        states = next_states[subcircuit_idx]
+        for qubit_ctr, state in enumerate(states):
+            if state == "active":
+                states[qubit_ctr] = (bin_id >> position) & 1
+                position -= 1
+    return next_states
+
+
+def _bin_label(subcircuit_states, subcircuit_order, unordered_qubits, bin_id):
+    """Format a bin as bitstring of the full circuit, with merged qubits as MERGED_QUBIT"""
+    states = _fix_active_qubits(subcircuit_states, subcircuit_order, bin_id)
+    unordered_states = [
+        state for subcircuit_idx in subcircuit_order for state in states[subcircuit_idx]
+    ]
+    label = [MERGED_QUBIT] * len(unordered_qubits)
+    for qubit, state in zip(unordered_qubits, unordered_states):
+        if state != "merged":
+            label[len(label) - 1 - qubit] = str(state)
+    return "".join(label)
+
+
+def reconstruct_distribution_dd(
+    circuit: QuantumCircuit,
+    subcircuit_instance_probs: Dict[int, List[np.ndarray]],
+    cuts,
+    summation_terms,
+    subcircuit_entries,
+    max_active_qubits: int,
+    recursion_depth: int,
+) -> Dict[str, float]:
+    """
+    Reconstruct the probability distribution of the full circuit by dynamic definition
+
+    Follows the dynamic definition of CutQC: the first recursion reconstructs the probabilities of bins
+    over ``max_active_qubits`` active qubits, summing over the outcomes of all other, merged qubits. Every
+    further recursion zooms into the bin with the highest probability found so far by fixing its active
+    qubits and activating up to ``max_active_qubits`` of its merged qubits. Thus, at most
+    ``2 ** max_active_qubits`` probabilities are reconstructed at once, independent of the width of the
+    circuit.
+
+    Args:
+        circuit: The original full circuit
+        subcircuit_instance_probs: The measured probabilities of the subcircuit instances
+        cuts: Results from the cutting step
+        summation_terms: The summation terms, as generated by ``generate_summation_terms``
+        subcircuit_entries: The subcircuit entries, as generated by ``generate_summation_terms``
+        max_active_qubits: The number of active qubits of every recursion
+        recursion_depth: The maximum number of recursions
+
+    Returns:
+        The probability of every bin that was not zoomed into, keyed by a bitstring of the full circuit in
+        which merged qubits are given as MERGED_QUBIT
+    """
+    subcircuit_entry_probs = attribute_shots(
+        subcircuit_entries, subcircuit_instance_probs
+    )
+    widths = _output_widths(cuts["complete_path_map"])
+    subcircuit_order = sorted(
+        subcircuit_entry_probs.keys(), key=lambda subcircuit_idx: widths[subcircuit_idx]
+    )
+    unordered_qubits = output_qubit_order(
+        circuit, cuts["subcircuits"], subcircuit_order, cuts["complete_path_map"]
+    )
+
+    subcircuit_states = _activate_merged_qubits(
+        {
+            subcircuit_idx: ["merged"] * widths[subcircuit_idx]
+            for subcircuit_idx in subcircuit_order
+        },
+        max_active_qubits,
+    )
+    layers = []
+    largest_bins = []
+    for recursion_layer in range(recursion_depth):
+        if recursion_layer > 0:
+            if not largest_bins:
+                break
+            _, upper_layer, bin_id = heapq.heappop(largest_bins)
+            layers[upper_layer][2].add(bin_id)
+            subcircuit_states = _activate_merged_qubits(
+                _fix_active_qubits(layers[upper_layer][0], subcircuit_order, bin_id),
+                max_active_qubits,
+            )
+
+        merged_entry_probs = {
+            subcircuit_idx: {
+                entry_idx: _merge_entry_prob(prob, subcircuit_states[subcircuit_idx])
+                for entry_idx, prob in entry_probs.items()
+            }
+            for subcircuit_idx, entry_probs in subcircuit_entry_probs.items()
+        }
+        bins = naive_compute(subcircuit_order, summation_terms, merged_entry_probs)[0]
+        bins /= 2 ** cuts["num_cuts"]
+        layers.append((subcircuit_states, bins, set()))
+
+        if any("merged" in states for states in subcircuit_states.values()):
+            for bin_id in np.flatnonzero(bins > 0):
+                heapq.heappush(
+                    largest_bins, (-bins[bin_id], recursion_layer, int(bin_id))
+                )
+
+    result = {}
+    for subcircuit_states, bins, expanded_bins in layers:
+        for bin_id in np.flatnonzero(bins):
+            if bin_id not in expanded_bins:
+                label = _bin_label(
+                    subcircuit_states, subcircuit_order, unordered_qubits, int(bin_id)
+                )
+                result[label] = float(bins[bin_id])
+    return result
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -19,6 +20,42 @@ class Config:
         "license": {"name": "Apache v2 License"},
     }
 
+    # Maximum number of partial results materialized at once during reconstruction
+    RECONSTRUCTION_MAX_CHUNK_SIZE = int(
+        os.getenv("RECONSTRUCTION_MAX_CHUNK_SIZE", 2 ** 22)
+    )
+
+    # Number of entries of a reconstructed distribution converted at a time by a streamed response
+    RESPONSE_CHUNK_SIZE = int(os.getenv("RESPONSE_CHUNK_SIZE", 2 ** 16))
+
+    # Number of worker processes of the pool shared by all reconstructions, 1 reconstructs in the
+    # request process
+    RECONSTRUCTION_WORKERS = int(os.getenv("RECONSTRUCTION_WORKERS", 1))
+
+    # Parsed cuts are kept for repeated combine requests referencing their cut_id
+    CUT_CACHE_MAX_SIZE = int(os.getenv("CUT_CACHE_MAX_SIZE", 128))
+    CUT_CACHE_TTL = float(os.getenv("CUT_CACHE_TTL", 3600))
+
+    # Number of worker processes solving the cut MIPs of requests with parallel_search, each of them
+    # is spawned for the request and pays the import of the solver
+    CUT_SEARCH_WORKERS = int(os.getenv("CUT_SEARCH_WORKERS", 2))
+
+    # Cuts found for a circuit are reused by cut requests for the same circuit and cutting parameters
+    CUT_RESULT_CACHE_MAX_SIZE = int(os.getenv("CUT_RESULT_CACHE_MAX_SIZE", 256))
+    CUT_RESULT_CACHE_TTL = float(os.getenv("CUT_RESULT_CACHE_TTL", 24 * 3600))
+
+    # Directory of the reconstructed distributions persisted as memory-mapped files
+    RESULT_DIRECTORY = os.getenv(
+        "RESULT_DIRECTORY",
+        os.path.join(tempfile.gettempdir(), "circuit-cutting-results"),
+    )
+
+    # Persisted distributions are deleted this many seconds after they were stored
+    RESULT_TTL = float(os.getenv("RESULT_TTL", 24 * 3600))
+
+    # Maximum number of probabilities returned by one slice query of a persisted distribution
+    RESULT_SLICE_MAX_SIZE = int(os.getenv("RESULT_SLICE_MAX_SIZE", 2 ** 16))
+
     @staticmethod
     def init_app(app):
         pass
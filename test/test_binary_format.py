@@ -0,0 +1,67 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import io
+import unittest
+
+import numpy as np
+
+from app.binary_format import npy_frombuffer
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+class NpyFromBufferTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        for array in (
+            rng.random(16),
+            rng.random(8).astype(np.float32),
+            np.asfortranarray(rng.random((3, 4))),
+            np.zeros(0),
+        ):
+            actual = npy_frombuffer(_npy_bytes(array))
+            self.assertEqual(array.dtype, actual.dtype)
+            self.assertTrue(np.array_equal(array, actual))
+
+    def test_format_versions(self):
+        array = np.arange(8, dtype=np.float64)
+        for version in ((1, 0), (2, 0)):
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, array, version=version)
+            self.assertTrue(np.array_equal(array, npy_frombuffer(buffer.getvalue())))
+
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, array, version=(3, 0))
+        with self.assertRaises(ValueError):
+            npy_frombuffer(buffer.getvalue())
+
+    def test_does_not_copy(self):
+        buffer = _npy_bytes(np.arange(8, dtype=np.float64))
+        array = npy_frombuffer(buffer)
+        self.assertFalse(array.flags.owndata)
+        self.assertFalse(array.flags.writeable)
+
+    def test_rejects_objects(self):
+        with self.assertRaises(ValueError):
+            npy_frombuffer(_npy_bytes(np.array([{}, None], dtype=object)))
@@ -0,0 +1,115 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+
+from qiskit import QuantumCircuit, QuantumRegister
+
+from app.cache import ExpiringLRUCache, circuit_fingerprint, cut_request_key
+from app.model.request_cut_circuits import CutCircuitsRequest
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ExpiringLRUCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = ExpiringLRUCache(max_size=2, ttl=10, timer=self.timer)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.cache.put("c", 3)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("c"), 3)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_entries_expire(self):
+        self.cache.put("a", 1)
+        self.timer.now = 5
+        self.cache.put("b", 2)
+        self.timer.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), 2)
+        self.assertEqual(len(self.cache), 1)
+        self.timer.now = 15
+        self.assertEqual(self.cache.get("b", "missing"), "missing")
+        self.assertEqual(len(self.cache), 0)
+
+    def test_add_returns_new_keys(self):
+        key_a = self.cache.add(1)
+        key_b = self.cache.add(2)
+        self.assertNotEqual(key_a, key_b)
+        self.assertEqual(self.cache.get(key_a), 1)
+        self.assertEqual(self.cache.get(key_b), 2)
+
+    def test_disabled_cache(self):
+        cache = ExpiringLRUCache(max_size=0, ttl=10)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+def _ghz_circuit(register_name, angle=0.5):
+    circuit = QuantumCircuit(QuantumRegister(3, register_name))
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.cx(1, 2)
+    circuit.ry(angle, 2)
+    return circuit
+
+
+class CircuitFingerprintTestCase(unittest.TestCase):
+    def test_registers_are_distinguished(self):
+        self.assertEqual(
+            circuit_fingerprint(_ghz_circuit("q")),
+            circuit_fingerprint(_ghz_circuit("q")),
+        )
+        self.assertNotEqual(
+            circuit_fingerprint(_ghz_circuit("q")),
+            circuit_fingerprint(_ghz_circuit("a")),
+        )
+
+    def test_operations_are_distinguished(self):
+        fingerprint = circuit_fingerprint(_ghz_circuit("q"))
+        self.assertNotEqual(fingerprint, circuit_fingerprint(_ghz_circuit("q", 0.25)))
+        circuit = _ghz_circuit("q")
+        circuit.cx(2, 0)
+        self.assertNotEqual(fingerprint, circuit_fingerprint(circuit))
+
+    def test_cut_request_key(self):
+        circuit = _ghz_circuit("q")
+        request = CutCircuitsRequest("", "automatic", max_subcircuit_width=2)
+        same_request = CutCircuitsRequest(
+            "", "automatic", max_subcircuit_width=2, circuit_format="openqasm3"
+        )
+        other_request = CutCircuitsRequest("", "automatic", max_subcircuit_width=3)
+        self.assertEqual(
+            cut_request_key(circuit, request), cut_request_key(circuit, same_request)
+        )
+        self.assertNotEqual(
+            cut_request_key(circuit, request), cut_request_key(circuit, other_request)
+        )
@@ -5,7 +5,12 @@ import pickle
 import sys
 import unittest
 
-from qiskit import qasm3
+from qiskit import QuantumCircuit, qasm3, transpile
+from qiskit.circuit.library import EfficientSU2
+from qiskit_aer import AerSimulator
+
+from app import wire_cutter
+from app.model.request_cut_circuits import CutCircuitsRequest
 
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
@@ -58,6 +63,48 @@ class FlaskClientTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         print(response.get_json())
 
+    def test_solver_limits(self):
+        for solver in ("cplex", "highs"):
+            response = self.client.post(
+                "/cutCircuits",
+                data=json.dumps(
+                    {
+                        "solver": solver,
+                        "circuit": 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\n',
+                        "method": "automatic",
+                        "max_subcircuit_width": 3,
+                        "max_num_subcircuits": 2,
+                        "max_cuts": 2,
+                        "solver_time_limit": 10,
+                        "mip_gap": 0.1,
+                        "objective": "num_instances",
+                        "parallel_search": True,
+                    }
+                ),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual("optimal", response.get_json()["solver_status"])
+            self.assertLessEqual(response.get_json()["mip_gap"], 0.1)
+
+    def test_heuristic_cutting(self):
+        response = self.client.post(
+            "/cutCircuits",
+            data=json.dumps(
+                {
+                    "circuit": 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\n',
+                    "method": "heuristic",
+                    "max_subcircuit_width": 3,
+                    "max_num_subcircuits": 2,
+                    "max_cuts": 2,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(1, response.get_json()["num_cuts"])
+        self.assertEqual(2, len(response.get_json()["subcircuits"]))
+
     def test_automatic_cutting_qiskit(self):
         circuit = qasm3.loads(
             'OPENQASM 3;\ninclude "stdgates.inc";\nbit[4] meas;\nqubit[4] _all_qubits;\nlet q = _all_qubits[0:3];\nh q[0];\ncx q[0], q[1];\ncx q[1], q[2];\ncx q[2], q[3];\nmeas[0] = measure q[0];\nmeas[1] = measure q[1];\nmeas[2] = measure q[2];\nmeas[3] = measure q[3];\n'
@@ -79,3 +126,131 @@ class FlaskClientTestCase(unittest.TestCase):
         )
         self.assertEqual(200, response.status_code)
         print(response.get_json())
+
+    def test_cut_result_cache(self):
+        request = {
+            "method": "automatic",
+            "max_subcircuit_width": 3,
+            "max_num_subcircuits": 2,
+            "max_cuts": 2,
+            "circuit_format": "openqasm2",
+        }
+        circuits = [
+            'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\ncreg meas[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\nmeasure q[0] -> meas[0];\n',
+            'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\nh q[0];\ncx q[0], q[1];\ncx q[1], q[2];\ncx q[2], q[3];\n',
+        ]
+        responses = []
+        for circuit in circuits:
+            response = self.client.post(
+                "/cutCircuits",
+                data=json.dumps({**request, "circuit": circuit}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            responses.append(response.get_json())
+        self.assertEqual(1, len(self.app.extensions["cut_result_cache"]))
+        self.assertNotEqual(responses[0].pop("cut_id"), responses[1].pop("cut_id"))
+        self.assertEqual(responses[0], responses[1])
+
+    def test_cut_result_cache_register_names(self):
+        request = {
+            "method": "automatic",
+            "max_subcircuit_width": 3,
+            "max_num_subcircuits": 2,
+            "max_cuts": 2,
+            "circuit_format": "openqasm2",
+        }
+        simulator = AerSimulator()
+        results = []
+        for register in ["q", "r"]:
+            circuit = f'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg {register}[4];\nh {register}[0];\ncx {register}[0],{register}[1];\ncx {register}[1],{register}[2];\ncx {register}[2],{register}[3];\n'
+            response = self.client.post(
+                "/cutCircuits",
+                data=json.dumps({**request, "circuit": circuit}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            cuts = response.get_json()
+            counts = simulator.run(
+                [
+                    transpile(QuantumCircuit.from_qasm_str(subcircuit), simulator)
+                    for subcircuit in cuts["individual_subcircuits"]
+                ],
+                shots=1000,
+                seed_simulator=0,
+            ).result()
+            response = self.client.post(
+                "/combineResultsQuokka",
+                data=json.dumps(
+                    {
+                        "circuit": circuit,
+                        "subcircuit_results": [
+                            counts.get_counts(i)
+                            for i in range(len(cuts["individual_subcircuits"]))
+                        ],
+                        "cuts": cuts,
+                    }
+                ),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            results.append(response.get_json()["result"])
+        self.assertEqual(2, len(self.app.extensions["cut_result_cache"]))
+        self.assertEqual(results[0], results[1])
+
+    def test_parameter_bindings(self):
+        template = qasm3.dumps(
+            EfficientSU2(4, reps=1, entanglement="linear", su2_gates=["ry"]).decompose()
+        )
+        circuit = qasm3.loads(template)
+        bindings = [
+            {
+                parameter.name: 0.1 * i + j
+                for i, parameter in enumerate(circuit.parameters)
+            }
+            for j in range(3)
+        ]
+        request = {
+            "method": "automatic",
+            "max_subcircuit_width": 3,
+            "max_num_subcircuits": 2,
+            "max_cuts": 2,
+            "circuit_format": "openqasm3",
+        }
+        response = self.client.post(
+            "/cutCircuits",
+            data=json.dumps(
+                {**request, "circuit": template, "parameter_bindings": bindings}
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        bound_individual_subcircuits = response.get_json()[
+            "bound_individual_subcircuits"
+        ]
+        self.assertEqual(len(bindings), len(bound_individual_subcircuits))
+        for binding, individual_subcircuits in zip(
+            bindings, bound_individual_subcircuits
+        ):
+            response = self.client.post(
+                "/cutCircuits",
+                data=json.dumps(
+                    {
+                        **request,
+                        "circuit": qasm3.dumps(circuit.assign_parameters(binding)),
+                    }
+                ),
+                content_type="application/json",
+            )
+            self.assertEqual(
+                response.get_json()["individual_subcircuits"], individual_subcircuits
+            )
+
+        with self.assertRaises(ValueError):
+            wire_cutter.cut_circuit(
+                CutCircuitsRequest(
+                    template,
+                    **request,
+                    parameter_bindings=[{"x": 1.0}],
+                )
+            )
@@ -4,15 +4,27 @@ import os
 import sys
 import unittest
 from collections import defaultdict
+from unittest import mock
 
 import numpy as np
-from circuit_knitting.cutting import partition_problem, generate_cutting_experiments
+from circuit_knitting.cutting import (
+    partition_problem,
+    generate_cutting_experiments,
+    reconstruct_expectation_values,
+)
+from circuit_knitting.cutting.cutting_decomposition import decompose_observables
+from circuit_knitting.cutting.qpd import WeightType
 from qiskit import qasm3, qasm2
 from qiskit.circuit.library import EfficientSU2
+from qiskit.primitives import SamplerResult
 from qiskit.quantum_info import PauliList
 from qiskit_aer.primitives import Sampler
 
-from app.gate_cutting_reconstruct_distribution import reconstruct_distribution
+from app.gate_cutting_reconstruct_distribution import (
+    reconstruct_distribution,
+    reconstruct_distribution_factorized,
+)
+from app import gate_cutter
 from app.utils import counts_to_array
 from test.test_reconstruction import NumpyEncoder
 
@@ -87,6 +99,38 @@ def _generate_reconstruction_test(num_qubits=4, partition_labels=None, reps=2):
     )
 
 
+class FactorizedReconstructionTestCase(unittest.TestCase):
+    def _assert_matches_baseline(self, num_qubits, partition_labels, reps=1):
+        (
+            _,
+            _,
+            subcircuit_labels,
+            expected,
+            results,
+            coefficients,
+            partition_labels,
+        ) = _generate_reconstruction_test(num_qubits, partition_labels, reps)
+
+        results_dict = defaultdict(list)
+        for label, res in zip(subcircuit_labels, results):
+            results_dict[label].append({int(key, 2): val for key, val in res.items()})
+
+        actual = reconstruct_distribution_factorized(
+            results_dict, coefficients, partition_labels
+        )
+        self.assertEqual(actual.shape, (2 ** num_qubits,))
+        self.assertTrue(np.allclose(expected, actual, rtol=0, atol=1e-12))
+
+    def test_two_partitions(self):
+        self._assert_matches_baseline(4, "AABB", reps=2)
+
+    def test_interleaved_partitions(self):
+        self._assert_matches_baseline(4, "ABBA")
+
+    def test_three_partitions(self):
+        self._assert_matches_baseline(5, "ABBCC")
+
+
 class FlaskClientGateCuttingTestCase(unittest.TestCase):
     def setUp(self):
         self.app = create_app("testing")
@@ -119,6 +163,42 @@ class FlaskClientGateCuttingTestCase(unittest.TestCase):
         self.assertIn("individual_subcircuits", response.get_json())
         print(response.get_json())
 
+    def test_parameter_bindings(self):
+        template = qasm3.dumps(
+            EfficientSU2(4, reps=1, entanglement="linear", su2_gates=["ry"]).decompose()
+        )
+        parameters = qasm3.loads(template).parameters
+        bindings = [
+            {parameter.name: 0.1 * i + j for i, parameter in enumerate(parameters)}
+            for j in range(2)
+        ]
+        response = self.client.post(
+            "gate-cutting/cutCircuits",
+            data=json.dumps(
+                {
+                    "circuit": template,
+                    "method": "automatic_gate_cutting",
+                    "max_subcircuit_width": 3,
+                    "max_num_subcircuits": 2,
+                    "max_cuts": 2,
+                    "circuit_format": "openqasm3",
+                    "parameter_bindings": bindings,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = response.get_json()
+        self.assertEqual(len(bindings), len(response["bound_individual_subcircuits"]))
+        for binding, individual_subcircuits in zip(
+            bindings, response["bound_individual_subcircuits"]
+        ):
+            self.assertEqual(
+                len(response["individual_subcircuits"]), len(individual_subcircuits)
+            )
+            for subcircuit in individual_subcircuits:
+                self.assertEqual(0, qasm3.loads(subcircuit).num_parameters)
+
     def test_reconstruction(self):
         (
             circuit,
@@ -153,6 +233,256 @@ class FlaskClientGateCuttingTestCase(unittest.TestCase):
         )
         self.assertTrue((expected == actual).all())
 
+        # the payload of a cache miss is not stored under the client's cut_id
+        request = {
+            "circuit": qasm2.dumps(circuit),
+            "subcircuit_results": results,
+            "cuts": {
+                "subcircuit_labels": subcircuit_labels,
+                "coefficients": [(c, w.value) for c, w in coefficients],
+                "partition_labels": partition_labels,
+            },
+            "cut_id": "unknown",
+        }
+        response = self.client.post(
+            "/gate-cutting/combineResultsQuokka",
+            data=json.dumps(request, cls=NumpyEncoder),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        del request["cuts"]
+        with self.assertRaises(ValueError):
+            self.client.post(
+                "/gate-cutting/combineResultsQuokka",
+                data=json.dumps(request, cls=NumpyEncoder),
+                content_type="application/json",
+            )
+
+    def test_reconstruction_top_k(self):
+        self._check_reconstruction_top_k()
+
+    def test_reconstruction_top_k_above_dense_threshold(self):
+        with mock.patch.object(gate_cutter, "MAX_DENSE_QUBITS", 4):
+            self._check_reconstruction_top_k()
+
+    def _check_reconstruction_top_k(self):
+        (
+            circuit,
+            subcircuits,
+            subcircuit_labels,
+            expected,
+            results,
+            coefficients,
+            partition_labels,
+        ) = _generate_reconstruction_test(6, reps=1)
+
+        request = {
+            "circuit": qasm2.dumps(circuit),
+            "subcircuit_results": results,
+            "cuts": {
+                "subcircuit_labels": subcircuit_labels,
+                "coefficients": [(c, w.value) for c, w in coefficients],
+                "partition_labels": partition_labels,
+            },
+            "top_k": 3,
+        }
+        response = self.client.post(
+            "/gate-cutting/combineResultsQuokka",
+            data=json.dumps(request, cls=NumpyEncoder),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()["result"]
+        self.assertEqual(len(result), 3)
+        for key, val in result.items():
+            self.assertAlmostEqual(expected[int(key, 2)], val)
+
+        # the array endpoint returns the pruned entries as pairs of index and probability
+        response = self.client.post(
+            "/gate-cutting/combineResults",
+            data=json.dumps(request, cls=NumpyEncoder),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = response.get_json()
+        self.assertEqual(3, len(response["result"]))
+        self.assertEqual(sorted(response["indices"]), response["indices"])
+        self.assertEqual(
+            sorted(int(key, 2) for key in result.keys()), response["indices"]
+        )
+        for index, val in zip(response["indices"], response["result"]):
+            self.assertAlmostEqual(expected[index], val)
+
+        request["min_abs_probability"] = 1.1
+        response = self.client.post(
+            "/gate-cutting/combineResults",
+            data=json.dumps(request, cls=NumpyEncoder),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([], response.get_json()["result"])
+        self.assertEqual([], response.get_json()["indices"])
+
+    def test_expectation_values(self):
+        circuit_qasm = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\n'
+        observables = ["ZZZZ", "XXXX", "IIZZ", "YIYI"]
+
+        response = self.client.post(
+            "gate-cutting/cutCircuits",
+            data=json.dumps(
+                {
+                    "circuit": circuit_qasm,
+                    "method": "automatic_gate_cutting",
+                    "max_subcircuit_width": 2,
+                    "max_num_subcircuits": 2,
+                    "max_cuts": 2,
+                    "observables": observables,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        cuts = response.get_json()
+        self.assertEqual(cuts["observables"], observables)
+
+        subcircuits = [
+            qasm2.loads(qasm_circ, custom_instructions=qasm2.LEGACY_CUSTOM_INSTRUCTIONS)
+            for qasm_circ in cuts["individual_subcircuits"]
+        ]
+        sampler = Sampler(run_options={"shots": 2 ** 12})
+        quasi_dists = sampler.run(subcircuits).result().quasi_dists
+
+        response2 = self.client.post(
+            "/gate-cutting/combineExpectationValues",
+            data=json.dumps(
+                {
+                    "circuit": circuit_qasm,
+                    "subcircuit_results": [
+                        {"{0:b}".format(key): val for key, val in res.items()}
+                        for res in quasi_dists
+                    ],
+                    "cuts": {
+                        "subcircuit_labels": cuts["subcircuit_labels"],
+                        "coefficients": cuts["coefficients"],
+                        "partition_labels": cuts["partition_labels"],
+                    },
+                    "observables": observables,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response2.status_code, 200)
+        actual = response2.get_json()["expectation_values"]
+
+        response3 = self.client.post(
+            "/gate-cutting/combineExpectationValues",
+            data=json.dumps(
+                {
+                    "subcircuit_results": [
+                        {"{0:b}".format(key): val for key, val in res.items()}
+                        for res in quasi_dists
+                    ],
+                    "cut_id": cuts["cut_id"],
+                    "observables": observables,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response3.status_code, 200)
+        self.assertEqual(actual, response3.get_json()["expectation_values"])
+
+        results = defaultdict(list)
+        for label, res in zip(cuts["subcircuit_labels"], quasi_dists):
+            results[label].append(res)
+        expected = reconstruct_expectation_values(
+            {
+                label: SamplerResult(quasi_dists=res, metadata=[{}] * len(res))
+                for label, res in results.items()
+            },
+            [(c, WeightType(w)) for c, w in cuts["coefficients"]],
+            decompose_observables(PauliList(observables), cuts["partition_labels"]),
+        )
+        self.assertTrue(np.allclose(expected, actual, rtol=0, atol=1e-12))
+
+    def test_observable_cuts_are_rejected_for_distributions(self):
+        circuit_qasm = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\n'
+        observables = ["ZZZZ", "XXXX"]
+        response = self.client.post(
+            "gate-cutting/cutCircuits",
+            data=json.dumps(
+                {
+                    "circuit": circuit_qasm,
+                    "method": "automatic_gate_cutting",
+                    "max_subcircuit_width": 2,
+                    "max_num_subcircuits": 2,
+                    "max_cuts": 2,
+                    "observables": observables,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        cuts = response.get_json()
+        subcircuit_results = [{"0": 1.0}] * len(cuts["subcircuit_labels"])
+        cut_payload = {
+            "subcircuit_labels": cuts["subcircuit_labels"],
+            "coefficients": cuts["coefficients"],
+            "partition_labels": cuts["partition_labels"],
+        }
+
+        for route in ["combineResults", "combineResultsQuokka"]:
+            # by the cached observables, by the observables of the cut and by the number of
+            # subcircuits of each partition if the observables are missing
+            for reference in [
+                {"cut_id": cuts["cut_id"]},
+                {"cuts": {**cut_payload, "observables": observables}},
+                {"cuts": cut_payload},
+            ]:
+                with self.assertRaises(ValueError):
+                    self.client.post(
+                        "/gate-cutting/" + route,
+                        data=json.dumps(
+                            {"subcircuit_results": subcircuit_results, **reference}
+                        ),
+                        content_type="application/json",
+                    )
+
+        # the number of results must match the number of subcircuits
+        with self.assertRaises(ValueError):
+            self.client.post(
+                "/gate-cutting/combineExpectationValues",
+                data=json.dumps(
+                    {
+                        "subcircuit_results": subcircuit_results[:-1],
+                        "cut_id": cuts["cut_id"],
+                    }
+                ),
+                content_type="application/json",
+            )
+
+        # the observables are taken from the cut and must not differ from it
+        response = self.client.post(
+            "/gate-cutting/combineExpectationValues",
+            data=json.dumps(
+                {"subcircuit_results": subcircuit_results, "cut_id": cuts["cut_id"]}
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(2, len(response.get_json()["expectation_values"]))
+        with self.assertRaises(ValueError):
+            self.client.post(
+                "/gate-cutting/combineExpectationValues",
+                data=json.dumps(
+                    {
+                        "subcircuit_results": subcircuit_results,
+                        "cut_id": cuts["cut_id"],
+                        "observables": ["ZZZZ", "YYYY"],
+                    }
+                ),
+                content_type="application/json",
+            )
+
     def test_all_gate_cutting(self):
 
         # circuit_qasm = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\ncreg meas[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\nmeasure q[0] -> meas[0];\nmeasure q[1] -> meas[1];\nmeasure q[2] -> meas[2];\nmeasure q[3] -> meas[3];\n'
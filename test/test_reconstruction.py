@@ -1,33 +1,48 @@
+import io
 import json
 import os
 import sys
 import time
 import unittest
+from unittest import mock
 
 import jsonpickle
 import numpy as np
 from circuit_knitting.cutting.cutqc import (
     cut_circuit_wires,
     evaluate_subcircuits,
+    generate_summation_terms,
     reconstruct_full_distribution,
 )
 from circuit_knitting.cutting.cutqc.wire_cutting_evaluation import (
+    measure_prob,
+    modify_subcircuit_instance,
     run_subcircuits,
 )
+from docplex.mp.model import Model
 from qiskit import QuantumCircuit, transpile, qasm2
 from qiskit.circuit.library import EfficientSU2
 from qiskit.providers import JobError, JobTimeoutError
 from qiskit.providers.jobstatus import JOB_FINAL_STATES
+from qiskit.quantum_info import Operator
 from qiskit_aer import AerSimulator
 
+from app import wire_cutter, wire_cutting_reconstruct_distribution
 from app.wire_cutter import _create_individual_subcircuits
-from app.utils import array_to_counts
+from app.utils import array_to_counts, create_process_pool
+from app.wire_cutting_reconstruct_distribution import measure_sparse_prob
 
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 from app import create_app
 
 
+def cut_circuit_wires_without_lp(*args, **kwargs):
+    # the MIP model of circuit-knitting-toolbox writes docplex_cutter.lp to the working directory
+    with mock.patch.object(Model, "export_as_lp"):
+        return cut_circuit_wires(*args, **kwargs)
+
+
 class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.ndarray):
@@ -47,7 +62,7 @@ def generate_su2_test(num_qubits):
 
     params = [(np.pi * i) / 16 for i in range(len(circuit.parameters))]
     circuit = circuit.assign_parameters(params)
-    cuts = cut_circuit_wires(
+    cuts = cut_circuit_wires_without_lp(
         circuit=circuit,
         method="automatic",
         max_subcircuit_width=5,
@@ -87,6 +102,190 @@ def convert_subcircuit_probabilites(subcircuit_probabilities):
         ]
 
 
+class ParallelReconstructionTestCase(unittest.TestCase):
+    def test_parallel_reconstruction(self):
+        circuit = EfficientSU2(
+            num_qubits=8, reps=2, entanglement="linear", su2_gates=["ry"]
+        ).decompose()
+        params = [(np.pi * i) / 16 for i in range(len(circuit.parameters))]
+        circuit = circuit.assign_parameters(params)
+        cuts = cut_circuit_wires_without_lp(
+            circuit=circuit,
+            method="automatic",
+            max_subcircuit_width=5,
+            max_cuts=2,
+            num_subcircuits=[2],
+        )
+        subcircuit_instance_probs = evaluate_subcircuits(cuts)
+        expected = reconstruct_full_distribution(
+            circuit, subcircuit_instance_probs, cuts
+        )
+
+        serial = wire_cutter.reconstruct_full_distribution(
+            circuit, subcircuit_instance_probs, cuts
+        )
+        self.assertTrue(np.array_equal(expected, serial))
+
+        with create_process_pool(2) as executor:
+            parallel = wire_cutter.reconstruct_full_distribution(
+                circuit, subcircuit_instance_probs, cuts, executor=executor
+            )
+            parallel_single = wire_cutter.reconstruct_full_distribution(
+                circuit,
+                subcircuit_instance_probs,
+                cuts,
+                executor=executor,
+                dtype=np.float32,
+            )
+        self.assertTrue(np.allclose(expected, parallel, rtol=0, atol=1e-12))
+        with create_process_pool(3) as executor:
+            self.assertTrue(
+                np.array_equal(
+                    parallel,
+                    wire_cutter.reconstruct_full_distribution(
+                        circuit, subcircuit_instance_probs, cuts, executor=executor
+                    ),
+                )
+            )
+
+        for single in (
+            parallel_single,
+            wire_cutter.reconstruct_full_distribution(
+                circuit, subcircuit_instance_probs, cuts, dtype=np.float32
+            ),
+        ):
+            self.assertEqual(single.dtype, np.float32)
+            self.assertTrue(np.allclose(expected, single, rtol=0, atol=1e-6))
+
+
+class MeasureProbsTestCase(unittest.TestCase):
+    def test_matches_measure_prob(self):
+        rng = np.random.default_rng(0)
+        for meas in [
+            ("comp", "comp", "comp"),
+            ("comp", "comp", "X"),
+            ("I", "comp", "Z"),
+            ("Y", "I", "comp", "X"),
+            ("Z", "X", "Y", "I"),
+        ]:
+            unmeasured_probs = rng.random((5, 2 ** len(meas)))
+            expected = np.stack(
+                [measure_prob(unmeasured_prob=p, meas=meas) for p in unmeasured_probs]
+            )
+            actual = wire_cutter.measure_probs(unmeasured_probs, meas)
+            self.assertTrue(np.array_equal(expected, actual), msg=str(meas))
+
+    def test_sparse_matches_measure_prob(self):
+        rng = np.random.default_rng(0)
+        for meas in [
+            ("comp", "comp", "comp"),
+            ("comp", "comp", "X"),
+            ("I", "comp", "Z"),
+            ("Y", "I", "comp", "X"),
+            ("Z", "X", "Y", "I"),
+        ]:
+            unmeasured_prob = rng.random(2 ** len(meas))
+            unmeasured_prob[rng.random(len(unmeasured_prob)) < 0.5] = 0
+            expected = measure_prob(unmeasured_prob=unmeasured_prob, meas=meas)
+            indices = np.flatnonzero(unmeasured_prob)
+            actual_indices, actual_values = measure_sparse_prob(
+                indices, unmeasured_prob[indices], meas
+            )
+            actual = np.zeros(len(expected))
+            actual[actual_indices] = actual_values
+            self.assertTrue(np.allclose(expected, actual, rtol=0, atol=1e-12))
+
+
+class SummationTermsTestCase(unittest.TestCase):
+    def test_summation_terms_are_memoized(self):
+        circuit = EfficientSU2(
+            num_qubits=6, reps=2, entanglement="linear", su2_gates=["ry"]
+        ).decompose()
+        circuit = circuit.assign_parameters([0.1] * circuit.num_parameters)
+        cuts = cut_circuit_wires_without_lp(
+            circuit=circuit,
+            method="automatic",
+            max_subcircuit_width=4,
+            max_cuts=3,
+            num_subcircuits=[2],
+        )
+        summation_terms = wire_cutter.get_summation_terms(
+            cuts["subcircuits"], cuts["complete_path_map"], cuts["num_cuts"]
+        )
+        self.assertEqual(
+            summation_terms,
+            generate_summation_terms(
+                cuts["subcircuits"], cuts["complete_path_map"], cuts["num_cuts"]
+            ),
+        )
+
+        # the parsed cut of a combine request shares the summation terms of the cut
+        subcircuits = [
+            QuantumCircuit.from_qasm_str(qasm2.dumps(sc)) for sc in cuts["subcircuits"]
+        ]
+        complete_path_map = jsonpickle.decode(
+            jsonpickle.encode(cuts["complete_path_map"], keys=True), keys=True
+        )
+        self.assertIs(
+            summation_terms,
+            wire_cutter.get_summation_terms(
+                subcircuits, complete_path_map, cuts["num_cuts"]
+            ),
+        )
+
+
+class AttributeShotsTestCase(unittest.TestCase):
+    def test_matches_circuit_knitting_toolbox(self):
+        from circuit_knitting.cutting.cutqc.wire_cutting import _attribute_shots
+
+        circuit, subcircuit_instance_probabilities, cuts, _ = generate_su2_test(6)
+        subcircuits = [QuantumCircuit.from_qasm_str(sc) for sc in cuts["subcircuits"]]
+        complete_path_map = jsonpickle.decode(cuts["complete_path_map"], keys=True)
+        _, subcircuit_entries, subcircuit_instances = generate_summation_terms(
+            subcircuits, complete_path_map, cuts["num_cuts"]
+        )
+        rng = np.random.default_rng(0)
+        instance_probs = {
+            subcircuit_idx: {
+                instance_idx: rng.random(2 ** subcircuits[subcircuit_idx].num_qubits)
+                for instance_idx in instances.values()
+            }
+            for subcircuit_idx, instances in subcircuit_instances.items()
+        }
+        expected = _attribute_shots(subcircuit_entries, instance_probs)
+        actual = wire_cutting_reconstruct_distribution.attribute_shots(
+            subcircuit_entries, instance_probs
+        )
+        self.assertEqual(expected.keys(), actual.keys())
+        for subcircuit_idx, entry_probs in expected.items():
+            self.assertEqual(entry_probs.keys(), actual[subcircuit_idx].keys())
+            for entry_idx, prob in entry_probs.items():
+                self.assertTrue(np.array_equal(prob, actual[subcircuit_idx][entry_idx]))
+
+
+class SubcircuitInstancesTestCase(unittest.TestCase):
+    def test_matches_modify_subcircuit_instance(self):
+        subcircuit = EfficientSU2(
+            num_qubits=3, reps=1, entanglement="linear"
+        ).decompose()
+        subcircuit = subcircuit.assign_parameters([0.1] * subcircuit.num_parameters)
+        template = wire_cutter._SubcircuitInstanceTemplate(subcircuit)
+        inits = ["zero", "one", "plus", "minus", "plusI", "minusI"]
+        for i, init in enumerate(inits):
+            init = (init, inits[(i + 1) % 6], inits[(i + 2) % 6])
+            for meas in [("I", "X", "Y"), ("Y", "comp", "X")]:
+                expected = modify_subcircuit_instance(subcircuit, init, meas)
+                actual = template.instance(init, meas)
+                self.assertTrue(Operator(expected).equiv(Operator(actual)))
+
+        measured = wire_cutter._SubcircuitInstanceTemplate(subcircuit, measure=True)
+        expected = subcircuit.measure_all(inplace=False)
+        actual = measured.instance(("zero",) * 3, ("I",) * 3)
+        self.assertEqual(expected, actual)
+        # the instances share the operations of the subcircuit
+        self.assertIs(subcircuit.data[0].operation, actual.data[0].operation)
+
+
 class FlaskClientTestCase(unittest.TestCase):
     def setUp(self):
         self.app = create_app("testing")
@@ -141,6 +340,273 @@ class FlaskClientTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         print(response.get_json())
 
+    def test_reconstruction_float32(self):
+        circuit, subcircuit_instance_probabilities, cuts, expected = generate_su2_test(
+            8
+        )
+        response = self.client.post(
+            "/combineResults",
+            data=json.dumps(
+                {
+                    "circuit": qasm2.dumps(circuit),
+                    "subcircuit_results": subcircuit_instance_probabilities,
+                    "cuts": cuts,
+                    "precision": "float32",
+                },
+                cls=NumpyEncoder,
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            np.allclose(expected, response.get_json()["result"], rtol=0, atol=1e-6)
+        )
+
+    def test_streamed_reconstruction(self):
+        circuit, subcircuit_instance_probabilities, cuts, expected = generate_su2_test(
+            8
+        )
+        request = {
+            "circuit": qasm2.dumps(circuit),
+            "subcircuit_results": subcircuit_instance_probabilities,
+            "cuts": cuts,
+        }
+        response = self.client.post(
+            "/combineResults",
+            data=json.dumps({**request, "stream": "json"}, cls=NumpyEncoder),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue((expected == np.array(response.get_json()["result"])).all())
+
+        response = self.client.post(
+            "/combineResults",
+            data=json.dumps({**request, "stream": "npy"}, cls=NumpyEncoder),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(np.array_equal(expected, np.load(io.BytesIO(response.data))))
+
+    def test_reconstruction_npy(self):
+        circuit, subcircuit_instance_probabilities, cuts, expected = generate_su2_test(
+            8
+        )
+        files = []
+        for i, probabilities in enumerate(subcircuit_instance_probabilities):
+            buffer = io.BytesIO()
+            np.save(buffer, np.asarray(probabilities))
+            buffer.seek(0)
+            files.append((buffer, f"{i}.npy"))
+
+        response = self.client.post(
+            "/combineResults",
+            data={
+                "json": json.dumps(
+                    {"circuit": qasm2.dumps(circuit), "cuts": cuts, "stream": "npy"}
+                ),
+                "subcircuit_results": files,
+            },
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(np.array_equal(expected, np.load(io.BytesIO(response.data))))
+
+    def test_sparse_reconstruction(self):
+        circuit, subcircuit_instance_probabilities, cuts, expected = generate_su2_test(
+            8
+        )
+        response = self.client.post(
+            "/combineResults",
+            data=json.dumps(
+                {
+                    "circuit": qasm2.dumps(circuit),
+                    "subcircuit_results": subcircuit_instance_probabilities,
+                    "cuts": cuts,
+                    "sparse": True,
+                },
+                cls=NumpyEncoder,
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            np.allclose(expected, response.get_json()["result"], rtol=0, atol=1e-12)
+        )
+
+        circuit_qasm = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\n'
+        response = self.client.post(
+            "/cutCircuits",
+            data=json.dumps(
+                {
+                    "circuit": circuit_qasm,
+                    "method": "automatic",
+                    "max_subcircuit_width": 3,
+                    "max_num_subcircuits": 2,
+                    "max_cuts": 2,
+                }
+            ),
+            content_type="application/json",
+        )
+        cut_id = response.get_json()["cut_id"]
+        individual_subcircuits = response.get_json()["individual_subcircuits"]
+        simulator = AerSimulator()
+        counts = simulator.run(
+            [
+                transpile(QuantumCircuit.from_qasm_str(circ), simulator)
+                for circ in individual_subcircuits
+            ],
+            shots=1000,
+            seed_simulator=0,
+        ).result()
+        request = {
+            "subcircuit_results": [
+                counts.get_counts(i) for i in range(len(individual_subcircuits))
+            ],
+            "cut_id": cut_id,
+            "unnormalized_results": True,
+        }
+        dense = self.client.post(
+            "/combineResultsQuokka",
+            data=json.dumps(request),
+            content_type="application/json",
+        ).get_json()["result"]
+        response = self.client.post(
+            "/combineResultsQuokka",
+            data=json.dumps({**request, "sparse": True}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        sparse = response.get_json()["result"]
+        for outcome in set(dense) | set(sparse):
+            self.assertAlmostEqual(
+                dense.get(outcome, 0), sparse.get(outcome, 0), places=12
+            )
+
+    def test_dynamic_definition(self):
+        circuit, subcircuit_instance_probabilities, cuts, expected = generate_su2_test(
+            8
+        )
+        outcomes = np.arange(len(expected))
+        for max_active_qubits, recursion_depth in [(8, 1), (3, 1), (3, 5)]:
+            response = self.client.post(
+                "/combineResults",
+                data=json.dumps(
+                    {
+                        "circuit": qasm2.dumps(circuit),
+                        "subcircuit_results": subcircuit_instance_probabilities,
+                        "cuts": cuts,
+                        "dynamic_definition": True,
+                        "dd_max_active_qubits": max_active_qubits,
+                        "dd_recursion_depth": recursion_depth,
+                    },
+                    cls=NumpyEncoder,
+                ),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            bins = response.get_json()["bins"]
+            self.assertAlmostEqual(sum(bins.values()), 1)
+            for label, prob in bins.items():
+                self.assertLessEqual(
+                    label.count("x"), circuit.num_qubits - max_active_qubits
+                )
+                in_bin = np.ones(len(expected), dtype=bool)
+                for position, bit in enumerate(label):
+                    if bit != "x":
+                        qubit = len(label) - 1 - position
+                        in_bin &= (outcomes >> qubit) & 1 == int(bit)
+                self.assertAlmostEqual(expected[in_bin].sum(), prob, places=12)
+            if recursion_depth > 1:
+                self.assertTrue(any(label.count("x") < 5 for label in bins))
+
+    def test_reconstruction_with_cut_id(self):
+        circuit_qasm = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[4];\nh q[0];\ncx q[0],q[1];\ncx q[1],q[2];\ncx q[2],q[3];\n'
+        response = self.client.post(
+            "/cutCircuits",
+            data=json.dumps(
+                {
+                    "circuit": circuit_qasm,
+                    "method": "automatic",
+                    "max_subcircuit_width": 3,
+                    "max_num_subcircuits": 2,
+                    "max_cuts": 2,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        cuts = response.get_json()
+        cut_id = cuts.pop("cut_id")
+
+        simulator = AerSimulator()
+        counts = simulator.run(
+            [
+                transpile(QuantumCircuit.from_qasm_str(circ), simulator)
+                for circ in cuts["individual_subcircuits"]
+            ],
+            shots=1000,
+            seed_simulator=0,
+        ).result()
+        subcircuit_results = [
+            counts.get_counts(i) for i in range(len(cuts["individual_subcircuits"]))
+        ]
+
+        request = {
+            "circuit": circuit_qasm,
+            "subcircuit_results": subcircuit_results,
+            "cuts": cuts,
+            "unnormalized_results": True,
+        }
+        response = self.client.post(
+            "/combineResultsQuokka",
+            data=json.dumps(request),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        expected = response.get_json()["result"]
+
+        response = self.client.post(
+            "/combineResultsQuokka",
+            data=json.dumps(
+                {
+                    "subcircuit_results": subcircuit_results,
+                    "cut_id": cut_id,
+                    "unnormalized_results": True,
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(expected, response.get_json()["result"])
+
+        # a cache miss falls back to the full payload
+        response = self.client.post(
+            "/combineResultsQuokka",
+            data=json.dumps({**request, "cut_id": "unknown"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(expected, response.get_json()["result"])
+
+        # the payload of a cache miss is not stored under the client's cut_id
+        with self.assertRaises(ValueError):
+            self.client.post(
+                "/combineResultsQuokka",
+                data=json.dumps(
+                    {"subcircuit_results": subcircuit_results, "cut_id": "unknown"}
+                ),
+                content_type="application/json",
+            )
+
+        with self.assertRaises(ValueError):
+            self.client.post(
+                "/combineResultsQuokka",
+                data=json.dumps(
+                    {"subcircuit_results": subcircuit_results, "cut_id": "expired"}
+                ),
+                content_type="application/json",
+            )
+
     def test_based_on_cutting_request(self):
         cutting_response_json = {
             "classical_cost": 64,
@@ -0,0 +1,78 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+
+import numpy as np
+from circuit_knitting.cutting import (
+    partition_problem,
+    generate_cutting_experiments,
+    reconstruct_expectation_values as reconstruct_expectation_values_reference,
+)
+from qiskit.circuit.library import EfficientSU2
+from qiskit.quantum_info import PauliList
+from qiskit_aer.primitives import Sampler
+
+from app.gate_cutting_reconstruct_expectation_values import (
+    reconstruct_expectation_values,
+)
+
+
+class ExpectationValuesReconstructionTestCase(unittest.TestCase):
+    def test_matches_reference(self):
+        circuit = EfficientSU2(
+            num_qubits=4, reps=2, entanglement="linear", su2_gates=["ry", "rz"]
+        ).decompose()
+        params = [np.random.random() * 2 * np.pi for _ in circuit.parameters]
+        circuit = circuit.assign_parameters(params)
+        observables = PauliList(["ZZZZ", "ZIIZ", "XXII", "IYZI", "IIII"])
+
+        partitioned_problem = partition_problem(
+            circuit=circuit, partition_labels="AABB", observables=observables
+        )
+        subexperiments, coefficients = generate_cutting_experiments(
+            circuits=partitioned_problem.subcircuits,
+            observables=partitioned_problem.subobservables,
+            num_samples=np.inf,
+        )
+        sampler = Sampler(run_options={"shots": 2 ** 12})
+        results = {
+            label: sampler.run(subexperiments[label]).result()
+            for label in subexperiments.keys()
+        }
+
+        actual = reconstruct_expectation_values(
+            results, coefficients, partitioned_problem.subobservables
+        )
+        expected = reconstruct_expectation_values_reference(
+            results, coefficients, partitioned_problem.subobservables
+        )
+        self.assertTrue(np.allclose(expected, actual, rtol=0, atol=1e-12))
+
+        quasi_dists = {
+            label: [
+                {"{0:b}".format(key): val for key, val in quasi_dist.items()}
+                for quasi_dist in result.quasi_dists
+            ]
+            for label, result in results.items()
+        }
+        actual = reconstruct_expectation_values(
+            quasi_dists, coefficients, partitioned_problem.subobservables
+        )
+        self.assertTrue(np.allclose(expected, actual, rtol=0, atol=1e-12))
@@ -29,8 +29,45 @@ from qiskit.circuit.library import EfficientSU2
 from qiskit.quantum_info import PauliList
 from qiskit_aer.primitives import Sampler
 
-from app.gate_cutting_reconstruct_distribution import reconstruct_distribution
-from app.utils import counts_to_array
+from app.gate_cutting_reconstruct_distribution import (
+    reconstruct_distribution,
+    reconstruct_distribution_factorized,
+    reconstruct_distribution_parallel,
+    reconstruct_distribution_pruned,
+    reconstruct_distribution_vectorized,
+)
+from app.utils import counts_to_array, create_process_pool
+
+
+def _run_subexperiments(num_qubits, partition_labels, reps):
+    circuit = EfficientSU2(
+        num_qubits=num_qubits,
+        reps=reps,
+        entanglement="linear",
+        su2_gates=["ry"],
+    )
+
+    circuit = circuit.decompose()
+
+    params = [np.random.random() * 2 * np.pi for _ in circuit.parameters]
+    circuit = circuit.assign_parameters(params)
+
+    partitioned_problem = partition_problem(
+        circuit=circuit,
+        partition_labels=partition_labels,
+        observables=PauliList(["Z" * num_qubits]),
+    )
+    subexperiments, coefficients = generate_cutting_experiments(
+        circuits=partitioned_problem.subcircuits,
+        observables=partitioned_problem.subobservables,
+        num_samples=np.inf,
+    )
+    sampler = Sampler(run_options={"shots": 2 ** 12})
+    results = {
+        label: sampler.run(subexperiments[label]).result()
+        for label in subexperiments.keys()
+    }
+    return results, coefficients
 
 
 def _generate_reconstruction_test(num_qubits=4, partition_labels=None, reps=2):
@@ -130,3 +167,152 @@ class ReconstructionTestCase(unittest.TestCase):
             np.allclose(exact_distribution, reconstructed_dist, atol=0.025),
             msg=f"\nExact distribution: {exact_distribution}\nReconstruced distribution: {reconstructed_dist}\nDiff: {np.abs(exact_distribution- reconstructed_dist)}",
         )
+
+
+class VectorizedReconstructionTestCase(unittest.TestCase):
+    def _assert_matches_reference(self, num_qubits, partition_labels, reps=1):
+        results, coefficients = _run_subexperiments(num_qubits, partition_labels, reps)
+        expected = counts_to_array(
+            reconstruct_distribution(results, coefficients, partition_labels),
+            num_qubits,
+        )
+
+        dense = reconstruct_distribution_vectorized(
+            results, coefficients, partition_labels
+        )
+        self.assertEqual(dense.shape, (2 ** num_qubits,))
+        self.assertTrue(np.allclose(expected, dense, rtol=0, atol=1e-12))
+
+        indices, values = reconstruct_distribution_vectorized(
+            results, coefficients, partition_labels, sparse=True
+        )
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        sparse = np.zeros(2 ** num_qubits)
+        sparse[indices] = values
+        self.assertTrue(np.allclose(expected, sparse, rtol=0, atol=1e-12))
+
+        factorized = reconstruct_distribution_factorized(
+            results, coefficients, partition_labels
+        )
+        self.assertTrue(np.allclose(expected, factorized, rtol=0, atol=1e-12))
+
+    def test_two_partitions(self):
+        self._assert_matches_reference(4, "AABB", reps=2)
+
+    def test_interleaved_partitions(self):
+        self._assert_matches_reference(4, "ABBA")
+
+    def test_three_partitions(self):
+        self._assert_matches_reference(5, "ABBCC")
+
+    def test_chunked_reconstruction(self):
+        num_qubits = 5
+        partition_labels = "ABBCC"
+        results, coefficients = _run_subexperiments(num_qubits, partition_labels, 1)
+        expected = reconstruct_distribution_vectorized(
+            results, coefficients, partition_labels
+        )
+        for max_chunk_size in (1, 3, 8):
+            reference = counts_to_array(
+                reconstruct_distribution(
+                    results, coefficients, partition_labels, max_chunk_size
+                ),
+                num_qubits,
+            )
+            self.assertTrue(np.allclose(expected, reference, rtol=0, atol=1e-12))
+
+            dense = reconstruct_distribution_vectorized(
+                results, coefficients, partition_labels, max_chunk_size=max_chunk_size
+            )
+            self.assertTrue(np.allclose(expected, dense, rtol=0, atol=1e-12))
+
+            indices, values = reconstruct_distribution_vectorized(
+                results,
+                coefficients,
+                partition_labels,
+                sparse=True,
+                max_chunk_size=max_chunk_size,
+            )
+            self.assertTrue(np.allclose(expected[indices], values, rtol=0, atol=1e-12))
+
+    def test_parallel_reconstruction(self):
+        num_qubits = 5
+        partition_labels = "ABBCC"
+        results, coefficients = _run_subexperiments(num_qubits, partition_labels, 1)
+        expected = reconstruct_distribution_factorized(
+            results, coefficients, partition_labels
+        )
+        serial = reconstruct_distribution_parallel(
+            results, coefficients, partition_labels
+        )
+        self.assertTrue(np.allclose(expected, serial, rtol=0, atol=1e-12))
+        for num_workers in (2, 3):
+            with create_process_pool(num_workers) as executor:
+                parallel = reconstruct_distribution_parallel(
+                    results, coefficients, partition_labels, executor=executor
+                )
+            self.assertTrue(np.array_equal(serial, parallel))
+
+    def test_float32_reconstruction(self):
+        num_qubits = 5
+        partition_labels = "ABBCC"
+        results, coefficients = _run_subexperiments(num_qubits, partition_labels, 1)
+        expected = reconstruct_distribution_factorized(
+            results, coefficients, partition_labels
+        )
+        factorized = reconstruct_distribution_factorized(
+            results, coefficients, partition_labels, dtype=np.float32
+        )
+        parallel = reconstruct_distribution_parallel(
+            results, coefficients, partition_labels, dtype=np.float32
+        )
+        indices, values = reconstruct_distribution_pruned(
+            results, coefficients, partition_labels, top_k=8, dtype=np.float32
+        )
+        for actual in (factorized, parallel, values):
+            self.assertEqual(actual.dtype, np.float32)
+        self.assertTrue(np.allclose(expected, factorized, rtol=0, atol=1e-6))
+        self.assertTrue(np.allclose(expected, parallel, rtol=0, atol=1e-6))
+        self.assertTrue(np.allclose(expected[indices], values, rtol=0, atol=1e-6))
+
+
+class PrunedReconstructionTestCase(unittest.TestCase):
+    def _assert_pruned(self, num_qubits, partition_labels, max_chunk_size):
+        results, coefficients = _run_subexperiments(num_qubits, partition_labels, 1)
+        expected = reconstruct_distribution_factorized(
+            results, coefficients, partition_labels
+        )
+
+        threshold = np.median(np.abs(expected))
+        indices, values = reconstruct_distribution_pruned(
+            results,
+            coefficients,
+            partition_labels,
+            min_abs_probability=threshold,
+            max_chunk_size=max_chunk_size,
+        )
+        self.assertTrue(
+            np.array_equal(indices, np.flatnonzero(np.abs(expected) >= threshold))
+        )
+        self.assertTrue(np.allclose(expected[indices], values, rtol=0, atol=1e-12))
+
+        indices, values = reconstruct_distribution_pruned(
+            results,
+            coefficients,
+            partition_labels,
+            top_k=5,
+            max_chunk_size=max_chunk_size,
+        )
+        self.assertEqual(len(indices), 5)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertTrue(np.allclose(expected[indices], values, rtol=0, atol=1e-12))
+        self.assertAlmostEqual(
+            np.sort(np.abs(values))[0], np.sort(np.abs(expected))[-5], places=12
+        )
+
+    def test_two_partitions(self):
+        self._assert_pruned(4, "AABB", max_chunk_size=4)
+
+    def test_three_partitions(self):
+        for max_chunk_size in (1, 8, 2 ** 10):
+            self._assert_pruned(5, "ABBCC", max_chunk_size)
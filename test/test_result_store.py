@@ -0,0 +1,238 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from qiskit import qasm2
+
+from app import create_app, result_store
+from app.result_store import ResultStore
+from test.test_gate_cutting import _generate_reconstruction_test
+from test.test_reconstruction import NumpyEncoder, generate_su2_test
+
+
+class ResultStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ResultStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        array = np.random.default_rng(0).random(16).astype(np.float32)
+        result_id = self.store.save(array)
+        loaded = self.store.load(result_id)
+        self.assertIsInstance(loaded, np.memmap)
+        self.assertEqual(loaded.dtype, np.float32)
+        self.assertTrue(np.array_equal(array, loaded))
+
+        result_id = self.store.save_sparse(np.array([1, 5]), np.array([0.25, 0.75]), 8)
+        self.assertEqual(
+            [0, 0.25, 0, 0, 0, 0.75, 0, 0], self.store.load(result_id).tolist()
+        )
+
+        self.store.delete(result_id)
+        for invalid in (result_id, "../" + result_id, "a" * 32):
+            with self.assertRaises(KeyError):
+                self.store.load(invalid)
+
+    def test_ttl(self):
+        offset = [0.0]
+        store = ResultStore(
+            self.directory.name, ttl=10, timer=lambda: time.time() + offset[0]
+        )
+        result_id = store.save(np.zeros(4))
+        offset[0] = 5
+        self.assertEqual(4, len(store.load(result_id)))
+        offset[0] = 20
+        with self.assertRaises(KeyError):
+            store.load(result_id)
+        self.assertEqual([], os.listdir(self.directory.name))
+
+        # expired distributions are deleted when a new one is stored
+        store.save(np.zeros(4))
+        offset[0] = 40
+        result_id = store.save(np.zeros(4))
+        self.assertEqual([result_id + ".npy"], os.listdir(self.directory.name))
+
+    def test_queries(self):
+        rng = np.random.default_rng(0)
+        array = rng.random(2 ** 6) - 0.2
+        for chunk_size in (1, 7, 2 ** 6):
+            indices, values = result_store.top_k(array, 5, chunk_size)
+            expected = np.argsort(-np.abs(array), kind="stable")[:5]
+            self.assertEqual(expected.tolist(), indices.tolist())
+            self.assertTrue(np.array_equal(array[expected], values))
+
+            indices, values = result_store.threshold(array, 0.5, chunk_size)
+            expected = np.flatnonzero(np.abs(array) >= 0.5)
+            self.assertEqual(expected.tolist(), indices.tolist())
+            self.assertTrue(np.array_equal(array[expected], values))
+            indices, _ = result_store.threshold(
+                array, 0.5, chunk_size, max_count=len(expected)
+            )
+            self.assertEqual(expected.tolist(), indices.tolist())
+            with self.assertRaises(ValueError):
+                result_store.threshold(
+                    array, 0.5, chunk_size, max_count=len(expected) - 1
+                )
+
+            tensor = array.reshape((2,) * 6)
+            # axis k of the tensor belongs to qubit 5 - k
+            expected = tensor.sum(axis=(0, 2, 4, 5)).T.ravel()
+            actual = result_store.marginal(array, [4, 2], chunk_size)
+            self.assertTrue(np.allclose(expected, actual))
+
+        with self.assertRaises(ValueError):
+            result_store.marginal(array, [1, 1])
+        with self.assertRaises(ValueError):
+            result_store.marginal(array, [6])
+
+
+class PersistedResultTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = create_app("testing")
+        self.app.extensions["result_store"] = ResultStore(self.directory.name)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client(use_cookies=True)
+
+    def tearDown(self):
+        self.app_context.pop()
+        self.directory.cleanup()
+
+    def test_persisted_reconstruction(self):
+        circuit, subcircuit_instance_probabilities, cuts, expected = generate_su2_test(
+            8
+        )
+        request = {
+            "circuit": qasm2.dumps(circuit),
+            "subcircuit_results": subcircuit_instance_probabilities,
+            "cuts": cuts,
+            "persist": True,
+        }
+        for sparse in (False, True):
+            response = self.client.post(
+                "/combineResults",
+                data=json.dumps({**request, "sparse": sparse}, cls=NumpyEncoder),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            self.assertIsNone(body.get("result"))
+            result_id = body["result_id"]
+
+            response = self.client.get(f"/results/{result_id}/slice?start=3&stop=10")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(8, response.get_json()["num_qubits"])
+            self.assertTrue(
+                np.allclose(expected[3:10], response.get_json()["result"], atol=1e-12)
+            )
+
+            # slices are limited to RESULT_SLICE_MAX_SIZE probabilities
+            self.app.config["RESULT_SLICE_MAX_SIZE"] = 16
+            response = self.client.get(f"/results/{result_id}/slice")
+            self.assertEqual(response.status_code, 400)
+            response = self.client.get(f"/results/{result_id}/slice?start=250")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(6, len(response.get_json()["result"]))
+
+            response = self.client.get(f"/results/{result_id}/top-k?k=3")
+            top = np.argsort(-np.abs(expected))[:3]
+            self.assertEqual(
+                {format(i, "08b") for i in top}, set(response.get_json()["result"])
+            )
+            response = self.client.get(f"/results/{result_id}/top-k?k=17")
+            self.assertEqual(response.status_code, 400)
+
+            min_abs_probability = np.sort(np.abs(expected))[-16]
+            response = self.client.get(
+                f"/results/{result_id}/sparse?min_abs_probability={min_abs_probability!r}"
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                {
+                    format(i, "08b")
+                    for i in np.flatnonzero(np.abs(expected) >= min_abs_probability)
+                },
+                set(response.get_json()["result"]),
+            )
+            response = self.client.get(
+                f"/results/{result_id}/sparse?min_abs_probability=0"
+            )
+            self.assertEqual(response.status_code, 400)
+            self.app.config["RESULT_SLICE_MAX_SIZE"] = 2 ** 16
+
+            response = self.client.get(f"/results/{result_id}/marginal?qubits=0")
+            self.assertTrue(
+                np.allclose(
+                    [expected[0::2].sum(), expected[1::2].sum()],
+                    response.get_json()["result"],
+                )
+            )
+            response = self.client.get(f"/results/{result_id}/marginal?qubits=8")
+            self.assertEqual(response.status_code, 422)
+
+            response = self.client.delete(f"/results/{result_id}")
+            self.assertEqual(response.status_code, 204)
+            response = self.client.get(f"/results/{result_id}/slice")
+            self.assertEqual(response.status_code, 404)
+
+    def test_persisted_gate_reconstruction(self):
+        (
+            circuit,
+            _,
+            subcircuit_labels,
+            expected,
+            results,
+            coefficients,
+            partition_labels,
+        ) = _generate_reconstruction_test(6, reps=1)
+        request = {
+            "circuit": qasm2.dumps(circuit),
+            "subcircuit_results": results,
+            "cuts": {
+                "subcircuit_labels": subcircuit_labels,
+                "coefficients": [(c, w.value) for c, w in coefficients],
+                "partition_labels": partition_labels,
+            },
+            "persist": True,
+        }
+        for route in ("combineResults", "combineResultsQuokka"):
+            response = self.client.post(
+                "/gate-cutting/" + route,
+                data=json.dumps(request, cls=NumpyEncoder),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            result_id = response.get_json()["result_id"]
+            self.assertIn(result_id + ".npy", os.listdir(self.directory.name))
+            response = self.client.get(f"/results/{result_id}/slice")
+            self.assertTrue(
+                np.allclose(expected, response.get_json()["result"], atol=1e-12)
+            )
+        # the distributions are written to their files directly, no further files are stored
+        self.assertEqual(2, len(os.listdir(self.directory.name)))
@@ -0,0 +1,70 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import io
+import json
+import unittest
+
+import numpy as np
+
+from app.model.response_combine_results import CombineResultsResponse
+from app.streaming import stream_result
+
+
+def _body(response):
+    return b"".join(
+        chunk.encode() if isinstance(chunk, str) else chunk
+        for chunk in response.response
+    )
+
+
+class StreamResultTestCase(unittest.TestCase):
+    def test_json_array(self):
+        array = np.random.default_rng(0).random(37)
+        for chunk_size in (1, 5, 37, 100):
+            response = stream_result(CombineResultsResponse(array), "json", chunk_size)
+            self.assertEqual(response.mimetype, "application/json")
+            self.assertEqual(
+                array.tolist(), json.loads(_body(response).decode())["result"]
+            )
+
+    def test_json_dict(self):
+        counts = {format(i, "05b"): i / 10 for i in range(13)}
+        for chunk_size in (1, 4, 13, 20):
+            response = stream_result(CombineResultsResponse(counts), "json", chunk_size)
+            self.assertEqual(counts, json.loads(_body(response).decode())["result"])
+        response = stream_result(CombineResultsResponse({}), "json", 4)
+        self.assertEqual({}, json.loads(_body(response).decode())["result"])
+
+    def test_npy(self):
+        for dtype in (np.float64, np.float32):
+            array = np.random.default_rng(0).random(37).astype(dtype)
+            response = stream_result(CombineResultsResponse(array), "npy", 8)
+            actual = np.load(io.BytesIO(_body(response)))
+            self.assertEqual(actual.dtype, dtype)
+            self.assertTrue(np.array_equal(array, actual))
+
+        with self.assertRaises(ValueError):
+            stream_result(CombineResultsResponse({"0": 1.0}), "npy", 8)
+
+    def test_no_stream(self):
+        response = CombineResultsResponse(np.zeros(4))
+        self.assertIs(response, stream_result(response, None, 8))
+        response = CombineResultsResponse(None, bins={"x": 1.0})
+        self.assertIs(response, stream_result(response, "json", 8))
@@ -0,0 +1,208 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+from collections import defaultdict
+
+import numpy as np
+
+from app.utils import (
+    ScatterPlan,
+    accumulate_product_dicts,
+    array_to_counts,
+    counts_to_array,
+    counts_to_indices,
+    find_character_in_string,
+    indices_to_bitstrings,
+    parallel_sum,
+    create_process_pool,
+    shift_bits_by_index,
+    split_evenly,
+)
+
+
+class AccumulateProductDictsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dicts = [
+            {0: 0.5, 1: 0.25},
+            {0: 0.125, 4: -1.0, 8: 2.0},
+            {0: 3.0, 16: 0.75},
+        ]
+        self.expected = defaultdict(float)
+        for k0, v0 in self.dicts[0].items():
+            for k1, v1 in self.dicts[1].items():
+                for k2, v2 in self.dicts[2].items():
+                    self.expected[k0 + k1 + k2] += 2.0 * v0 * v1 * v2
+
+    def test_accumulate(self):
+        result = accumulate_product_dicts(defaultdict(float), *self.dicts, weight=2.0)
+        self.assertEqual(dict(self.expected), dict(result))
+
+    def test_accumulate_in_chunks(self):
+        for max_chunk_size in (1, 2, 6, 12):
+            result = accumulate_product_dicts(
+                defaultdict(float),
+                *self.dicts,
+                weight=2.0,
+                max_chunk_size=max_chunk_size,
+            )
+            self.assertEqual(self.expected.keys(), result.keys())
+            for key, val in self.expected.items():
+                self.assertAlmostEqual(val, result[key])
+
+    def test_accumulate_into_existing_dict(self):
+        result = defaultdict(float, {0: 1.0})
+        accumulate_product_dicts(result, {0: 0.5}, {0: 0.5})
+        self.assertEqual({0: 1.25}, dict(result))
+
+
+class ScatterPlanTestCase(unittest.TestCase):
+    def test_scatter_matches_shift_bits_by_index(self):
+        partition_labels = "ABBACCBAAAAAABBBBBBBBBBC"
+        for chunk_bits in (3, 8, 16):
+            plan = ScatterPlan(partition_labels, chunk_bits=chunk_bits)
+            for label in plan.labels:
+                idx_list = list(find_character_in_string(partition_labels, label))
+                local_outcomes = np.arange(2 ** len(idx_list))
+                expected = [shift_bits_by_index(o, idx_list) for o in local_outcomes]
+                self.assertEqual(expected, plan.scatter(label, local_outcomes).tolist())
+                self.assertEqual(
+                    expected,
+                    [plan.scatter_int(label, int(o)) for o in local_outcomes],
+                )
+
+    def test_to_bitstrings(self):
+        plan = ScatterPlan("AABAB")
+        global_outcomes = plan.scatter("A", [0b011]) | plan.scatter("B", [0b10])
+        self.assertEqual(["10011"], plan.to_bitstrings(global_outcomes))
+
+    def test_kron_to_global(self):
+        partition_labels = "ABBACCBAA"
+        plan = ScatterPlan(partition_labels)
+        for label_order in (["A", "B", "C"], ["C", "A", "B"]):
+            vector = np.random.random(2 ** len(partition_labels))
+            kron_indices = np.zeros(1, dtype=np.int64)
+            for label in label_order:
+                local = np.arange(2 ** plan.num_local_qubits[label])
+                kron_indices = (
+                    kron_indices[:, None] | plan.scatter(label, local)[None, :]
+                ).ravel()
+            expected = np.zeros_like(vector)
+            expected[kron_indices] = vector
+            self.assertTrue(
+                np.array_equal(expected, plan.kron_to_global(vector, label_order))
+            )
+
+    def test_indices_to_bitstrings(self):
+        self.assertEqual(
+            ["000", "101", "111"], indices_to_bitstrings(np.array([0, 5, 7]), 3)
+        )
+        self.assertEqual([], indices_to_bitstrings(np.array([], dtype=int), 3))
+
+    def test_array_to_counts(self):
+        self.assertEqual(
+            {"01": 0.25, "11": 0.75}, array_to_counts(np.array([0, 0.25, 0, 0.75]))
+        )
+
+
+class ParallelSumTestCase(unittest.TestCase):
+    def test_split_evenly(self):
+        self.assertEqual(split_evenly(7, 3), [range(0, 3), range(3, 5), range(5, 7)])
+        self.assertEqual(split_evenly(2, 4), [range(0, 1), range(1, 2)])
+        self.assertEqual(split_evenly(0, 4), [])
+
+    def test_parallel_sum_is_reproducible(self):
+        rng = np.random.default_rng(0)
+        args_list = [(rng.random(16) * 10.0 ** e,) for e in range(-8, 8)]
+        expected = parallel_sum(np.copy, args_list)
+        for num_workers in (2, 3):
+            with create_process_pool(num_workers) as executor:
+                actual = parallel_sum(np.copy, args_list, executor)
+                # the workers of the pool are reused by further sums
+                self.assertTrue(
+                    np.array_equal(actual, parallel_sum(np.copy, args_list, executor))
+                )
+            self.assertTrue(np.array_equal(expected, actual))
+        self.assertIsNone(create_process_pool(1))
+
+    def test_parallel_sum_of_nothing(self):
+        for compensated in (False, True):
+            with self.assertRaises(ValueError):
+                parallel_sum(np.copy, [], compensated=compensated)
+
+    def test_compensated_sum(self):
+        rng = np.random.default_rng(0)
+        summands = (rng.random((1000, 16)) - 0.5).astype(np.float32)
+        summands[0] += 1e4
+        expected = summands.astype(np.float64).sum(axis=0)
+
+        naive = np.zeros(16, dtype=np.float32)
+        for summand in summands:
+            naive += summand
+        compensated = parallel_sum(
+            np.copy, [(summand,) for summand in summands], compensated=True
+        )
+        self.assertEqual(compensated.dtype, np.float32)
+        self.assertLess(
+            np.abs(compensated - expected).max(), np.abs(naive - expected).max()
+        )
+        self.assertTrue(np.allclose(expected, compensated, rtol=1e-7, atol=0))
+
+
+class CountsToIndicesTestCase(unittest.TestCase):
+    def test_binary_keys(self):
+        rng = np.random.default_rng(0)
+        outcomes = rng.choice(2 ** 12, size=100, replace=False)
+        counts = {format(outcome, "012b"): i for i, outcome in enumerate(outcomes)}
+        indices, values = counts_to_indices(counts)
+        self.assertTrue(np.array_equal(indices, outcomes))
+        self.assertTrue(np.array_equal(values, np.arange(100)))
+
+    def test_mixed_keys(self):
+        counts = {"101": 1, "0x1f": 2, 3: 3, "0b11": 4, "1 01": 5, "1": 6, "0XA": 7}
+        with self.assertRaises(ValueError):
+            counts_to_indices(counts)
+        del counts["0XA"]
+        indices, values = counts_to_indices(counts)
+        self.assertEqual(indices.tolist(), [5, 31, 3, 3, 5, 1])
+        self.assertEqual(values.tolist(), [1, 2, 3, 4, 5, 6])
+
+    def test_invalid_keys(self):
+        with self.assertRaises(ValueError):
+            counts_to_indices({"a1": 1})
+        with self.assertRaises(ValueError):
+            counts_to_indices({"012": 1})
+        with self.assertRaises(ValueError):
+            counts_to_indices({"0x1g": 1})
+        with self.assertRaises(TypeError):
+            counts_to_indices({1.5: 1})
+
+    def test_wide_keys(self):
+        # keys of 64 or more digits are decoded exactly if their value fits into int64
+        indices, _ = counts_to_indices(
+            {"0" * 10 + "1" * 60: 1, "0x000" + "f" * 15: 2, "0b" + "1" * 63: 3}
+        )
+        self.assertEqual(indices.tolist(), [2 ** 60 - 1, 2 ** 60 - 1, 2 ** 63 - 1])
+        for key in ("1" + "0" * 63, "0x8" + "0" * 15, "1" * 70):
+            with self.assertRaises(ValueError):
+                counts_to_indices({key: 1, "01": 1})
+
+    def test_counts_to_array(self):
+        array = counts_to_array({"011": 0.25, "0x4": 0.5, 7: 0.25}, 3)
+        self.assertEqual(array.tolist(), [0, 0, 0, 0.25, 0.5, 0, 0, 0.25])
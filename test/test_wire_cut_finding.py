@@ -0,0 +1,194 @@
+# ******************************************************************************
+#  Copyright (c) 2023 University of Stuttgart
+#
+#  See the NOTICE file(s) distributed with this work for additional
+#  information regarding copyright ownership.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+
+import unittest
+from unittest import mock
+
+from circuit_knitting.cutting.cutqc import cut_circuit_wires
+from qiskit.circuit.library import EfficientSU2
+
+from app.wire_cut_finding import (
+    DEFAULT_SOLVER_TIME_LIMIT,
+    FEASIBLE,
+    OBJECTIVES,
+    OPTIMAL,
+    _lower_bound,
+    _num_components,
+    _read_cut_graph,
+    _warm_start,
+    find_wire_cuts,
+    find_wire_cuts_heuristic,
+    objective_value,
+)
+from app.wire_cut_solvers import SOLVERS
+from test.test_reconstruction import cut_circuit_wires_without_lp
+
+
+def _su2_circuit(num_qubits):
+    circuit = EfficientSU2(
+        num_qubits, reps=2, entanglement="linear", su2_gates=["ry"]
+    ).decompose()
+    return circuit.assign_parameters([0.1] * circuit.num_parameters)
+
+
+class FindWireCutsTestCase(unittest.TestCase):
+    def test_matches_circuit_knitting_toolbox(self):
+        circuit = _su2_circuit(8)
+        expected = cut_circuit_wires_without_lp(
+            circuit,
+            method="automatic",
+            max_subcircuit_width=5,
+            max_cuts=10,
+            num_subcircuits=[2, 3],
+            verbose=False,
+        )
+        actual = find_wire_cuts(circuit, 5, 10, [2, 3])
+        self.assertEqual(OPTIMAL, actual.pop("solver_status"))
+        self.assertAlmostEqual(0, actual.pop("mip_gap"))
+        self.assertEqual(expected["classical_cost"], actual["classical_cost"])
+        self.assertEqual(expected["num_cuts"], actual["num_cuts"])
+        self.assertEqual(expected["counter"], actual["counter"])
+        self.assertEqual(
+            [str(subcircuit) for subcircuit in expected["subcircuits"]],
+            [str(subcircuit) for subcircuit in actual["subcircuits"]],
+        )
+
+    def test_time_limit(self):
+        circuit = _su2_circuit(10)
+        result = find_wire_cuts(circuit, 6, 10, [2, 3], time_limit=1e-6)
+        if result:
+            self.assertEqual(FEASIBLE, result["solver_status"])
+
+        # without a time limit, each MIP is solved with the default time limit
+        time_limits = []
+
+        def solve(*args):
+            time_limits.append(args[5])
+            return SOLVERS["cplex"](*args)
+
+        with mock.patch.dict(SOLVERS, {"recording": solve}):
+            result = find_wire_cuts(circuit, 6, 10, [2, 3], solver="recording")
+        self.assertEqual(OPTIMAL, result["solver_status"])
+        self.assertEqual({DEFAULT_SOLVER_TIME_LIMIT}, set(time_limits))
+
+        # the HiGHS MIP of this circuit takes several seconds to solve, the search is stopped at
+        # the deadline with the cut it started from
+        large_circuit = EfficientSU2(
+            30, reps=4, entanglement="linear", su2_gates=["ry"]
+        ).decompose()
+        large_circuit = large_circuit.assign_parameters(
+            [0.1] * large_circuit.num_parameters
+        )
+        result = find_wire_cuts(
+            large_circuit, 18, 30, [2], time_limit=1, solver="highs", warm_start=True
+        )
+        self.assertEqual(FEASIBLE, result["solver_status"])
+
+        result = find_wire_cuts(circuit, 6, 10, [2, 3], mip_gap=0.5)
+        self.assertIn(result["solver_status"], (OPTIMAL, FEASIBLE))
+        self.assertLessEqual(result["mip_gap"], 0.5)
+
+    def test_objectives(self):
+        circuit = _su2_circuit(8)
+        # each number of subcircuits on its own, without pruning by the lower bounds
+        cuts = [find_wire_cuts(circuit, 5, 10, [n]) for n in (2, 3)]
+        for objective in OBJECTIVES:
+            expected = min(cuts, key=lambda cut: objective_value(cut, objective))
+            for num_workers in (1, 2):
+                actual = find_wire_cuts(
+                    circuit, 5, 10, [2, 3], objective=objective, num_workers=num_workers
+                )
+                self.assertEqual(OPTIMAL, actual["solver_status"])
+                self.assertEqual(
+                    objective_value(expected, objective),
+                    objective_value(actual, objective),
+                )
+                self.assertEqual(
+                    len(expected["subcircuits"]), len(actual["subcircuits"])
+                )
+
+    def test_lower_bounds(self):
+        circuit = _su2_circuit(4)
+        num_components = _num_components(_read_cut_graph(circuit))
+        for num_subcircuit in (1, 2, 3):
+            cut = find_wire_cuts(circuit, 4, 10, [num_subcircuit])
+            for objective in OBJECTIVES:
+                self.assertLessEqual(
+                    _lower_bound(num_subcircuit, 4, num_components, objective),
+                    objective_value(cut, objective),
+                )
+
+    def test_highs(self):
+        for num_qubits, width in ((8, 5), (10, 6)):
+            circuit = _su2_circuit(num_qubits)
+            expected = find_wire_cuts(circuit, width, 10, [2, 3], solver="cplex")
+            actual = find_wire_cuts(circuit, width, 10, [2, 3], solver="highs")
+            self.assertEqual(OPTIMAL, actual["solver_status"])
+            self.assertEqual(expected["num_cuts"], actual["num_cuts"])
+            self.assertEqual(expected["classical_cost"], actual["classical_cost"])
+
+        # exceeds the problem size limits of the CPLEX community edition
+        actual = find_wire_cuts(_su2_circuit(20), 11, 10, [2], solver="highs")
+        self.assertEqual(OPTIMAL, actual["solver_status"])
+        self.assertEqual(2, actual["num_cuts"])
+
+    def test_warm_start(self):
+        for solver in SOLVERS:
+            for num_qubits, width in ((8, 5), (10, 6)):
+                circuit = _su2_circuit(num_qubits)
+                expected = find_wire_cuts(circuit, width, 10, [2, 3], solver=solver)
+                actual = find_wire_cuts(
+                    circuit, width, 10, [2, 3], solver=solver, warm_start=True
+                )
+                self.assertEqual(OPTIMAL, actual["solver_status"])
+                self.assertEqual(expected["num_cuts"], actual["num_cuts"])
+                self.assertEqual(expected["classical_cost"], actual["classical_cost"])
+
+            # without time to search, the solver returns the partition it started from
+            graph = _read_cut_graph(_su2_circuit(10))
+            initial_blocks = _warm_start(graph, 2, 6, 10)
+            result = SOLVERS[solver](graph, 2, 6, 10, 10, 0, None, initial_blocks)
+            self.assertEqual(
+                [
+                    [
+                        graph["id_vertices"][v]
+                        for v, b in enumerate(initial_blocks)
+                        if b == i
+                    ]
+                    for i in range(2)
+                ],
+                result["subcircuit_gates"],
+            )
+
+    def test_heuristic(self):
+        for num_qubits, width in ((8, 5), (10, 6)):
+            circuit = _su2_circuit(num_qubits)
+            expected = find_wire_cuts(circuit, width, 10, [2, 3])
+            subcircuit_vertices = find_wire_cuts_heuristic(circuit, width, 10, [2, 3])
+            actual = cut_circuit_wires(
+                circuit,
+                method="manual",
+                subcircuit_vertices=subcircuit_vertices,
+                verbose=False,
+            )
+            self.assertLessEqual(actual["max_subcircuit_width"], width)
+            self.assertEqual(expected["num_cuts"], actual["num_cuts"])
+            self.assertEqual(expected["classical_cost"], actual["classical_cost"])
+
+        self.assertIsNone(find_wire_cuts_heuristic(_su2_circuit(8), 5, 1, [2, 3]))